@@ -4,7 +4,7 @@
 
 import sys
 
-from aqt import mw
+from .common import mw
 
 
 def start_addon():
@@ -0,0 +1,134 @@
+# Copyright: Ajatt-Tools and contributors; https://github.com/Ajatt-Tools
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+
+"""
+Search other collections and import notes from the command line, without starting Anki.
+Progress is printed to stdout as JSON lines, one event per line.
+Anki has to be closed while a collection it uses is being written to.
+
+Examples:
+    python -m cropro.cli search --from ~/.local/share/Anki2/Bank/collection.anki2 --sort length --limit 10 猫
+    python -m cropro.cli import --from ~/.local/share/Anki2/Bank/collection.anki2 \\
+        --to ~/.local/share/Anki2/Main/collection.anki2 --terms-file words.txt --per-term 3 --to-deck Mining
+"""
+
+import argparse
+import json
+import logging
+import sys
+from collections.abc import Sequence
+from typing import Any, Optional
+
+from anki.notes import NoteId
+
+from .common import parse_term_list
+from .config import config
+from .headless import SORT_METHODS, HeadlessCroPro, new_sort_method
+from .search_results import to_chunks
+
+# How many notes are loaded and imported at once.
+IMPORT_CHUNK_SIZE = 500
+
+
+def emit(event: str, **data: Any) -> None:
+    print(json.dumps({"event": event, **data}, ensure_ascii=False), flush=True)
+
+
+def make_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="cropro", description="Cross-profile search and import without Anki's GUI.")
+    parser.add_argument("--config", help="JSON file with settings that override the add-on's defaults")
+    parser.add_argument("--verbose", action="store_true", help="print the debug log to stderr")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    search = commands.add_parser("search", help="find notes and print them")
+    import_ = commands.add_parser("import", help="find notes and import them into another collection")
+    for command in (search, import_):
+        command.add_argument("--from", dest="source", required=True, help="collection file to search in")
+        command.add_argument("--deck", help="search only this deck of the source collection")
+        command.add_argument("--sort", choices=SORT_METHODS, default="none", help="order of found notes")
+        command.add_argument("--limit", type=int, default=0, help="keep only this many best notes")
+        command.add_argument("--terms-file", help="look up each line of the file, like the batch lookup")
+        command.add_argument("--per-term", type=int, help="how many notes to keep for each term of --terms-file")
+        command.add_argument("query", nargs="?", default="", help="search text, Anki's search syntax is supported")
+    import_.add_argument("--to", dest="target", required=True, help="collection file to import notes into")
+    import_.add_argument("--to-deck", help="deck to add the notes to, created if it doesn't exist")
+    import_.add_argument("--note-type", help="note type of the imported notes")
+    return parser
+
+
+def apply_config_overrides(file_path: str) -> None:
+    with open(file_path, encoding="utf8") as f:
+        for key, value in json.load(f).items():
+            config[key] = value
+
+
+def search_groups(cropro: HeadlessCroPro, source: str, args: argparse.Namespace) -> list[tuple[str, Sequence[NoteId]]]:
+    """
+    Run the search or look up every term of the terms file. Emit an event for every search.
+    """
+    sort_method = new_sort_method(args.sort)
+    if args.terms_file:
+        with open(args.terms_file, encoding="utf8") as f:
+            terms = parse_term_list(f.read())
+        per_term = args.per_term or config.batch_results_per_term
+        found = cropro.search_per_term(source, terms, per_term, deck_name=args.deck, sort_method=sort_method)
+    else:
+        found = [(args.query, cropro.search(source, args.query, args.deck, sort_method, limit=args.limit))]
+    groups = []
+    for query, note_ids in found:
+        emit("found", query=query, count=len(note_ids))
+        groups.append((query, note_ids))
+    return groups
+
+
+def run_search(cropro: HeadlessCroPro, args: argparse.Namespace) -> None:
+    source = cropro.add_source(args.source)
+    n_notes = 0
+    for query, note_ids in search_groups(cropro, source, args):
+        for chunk in to_chunks(note_ids, IMPORT_CHUNK_SIZE):
+            for note in cropro.load_notes(source, chunk):
+                emit("note", query=query, id=note.id, fields=dict(note.items()), tags=note.tags)
+                n_notes += 1
+    emit("done", notes=n_notes)
+
+
+def run_import(cropro: HeadlessCroPro, args: argparse.Namespace) -> None:
+    source = cropro.add_source(args.source)
+    # A note that was found for several terms is imported once.
+    note_ids = list(dict.fromkeys(note_id for _query, ids in search_groups(cropro, source, args) for note_id in ids))
+    totals = {"imported": 0, "duplicates": 0, "errors": 0}
+    for chunk in to_chunks(note_ids, IMPORT_CHUNK_SIZE):
+        results = cropro.import_notes(cropro.load_notes(source, chunk), args.to_deck, args.note_type)
+        counts = {
+            "imported": len(results.successes),
+            "duplicates": len(results.duplicates),
+            "errors": len(results.errors),
+        }
+        totals = {key: totals[key] + counts[key] for key in totals}
+        emit("progress", done=sum(totals.values()), total=len(note_ids), **counts)
+    emit("done", **totals)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = make_parser().parse_args(argv)
+    if args.verbose:
+        logging.basicConfig(stream=sys.stderr, level=logging.DEBUG)
+        config["enable_debug_log"] = True
+    try:
+        if args.config:
+            apply_config_overrides(args.config)
+        if not (args.query or args.terms_file or config.allow_empty_search):
+            raise ValueError("nothing to search for.")
+        with HeadlessCroPro(target_col_path=getattr(args, "target", None)) as cropro:
+            if args.command == "search":
+                run_search(cropro, args)
+            else:
+                run_import(cropro, args)
+    except Exception as ex:
+        emit("error", message=str(ex), type=type(ex).__name__)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,54 @@
 # Copyright: Ajatt-Tools and contributors; https://github.com/Ajatt-Tools
 # License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
 
+import contextlib
+import dataclasses
+import functools
+import heapq
+import math
 import os
-from collections.abc import Iterable, Sequence
-from typing import NamedTuple, Optional
+import re
+import sys
+import threading
+import time
+from collections import defaultdict
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from concurrent.futures import Future
+from typing import Any, NamedTuple, Optional, Protocol, Union
 
 from anki.collection import Collection
-from anki.notes import NoteId
-from aqt import mw
+from anki.decks import DeckId
+from anki.errors import DBError
+from anki.models import NotetypeDict, NotetypeId
+from anki.notes import Note, NoteId
+from anki.utils import ids2str, split_fields
+
+from .common import mw
+from .config import config
+from .debug_log import LogDebug
+from .ngram_index import CjkNgramIndex
+from .note_features import NoteFeatureStore
+from .readonly_db import (
+    MIN_SCHEMA_VERSION,
+    AnyDB,
+    ReadOnlyDB,
+    plain_text_length,
+    raise_if_cancelled,
+)
+from .search_index import (
+    NoteSearchIndex,
+    is_fts_trigram_available,
+    plain_search_terms,
+    regex_search_pattern,
+    required_literals,
+)
+
+logDebug = LogDebug(config)
+
+# How many notes are loaded by one SQL query.
+LOAD_CHUNK_SIZE = 10_000
+# How many terms of a word list are looked up by one SQL query.
+TERMS_PER_QUERY = 500
 
 
 class NameId(NamedTuple):
@@ -17,6 +58,45 @@ class NameId(NamedTuple):
 
 NO_MODEL = NameId("None (create new if needed)", -1)
 WHOLE_COLLECTION = NameId("Whole collection", -1)
+# Shown in the profile selector to search all other profiles at once.
+ALL_PROFILES = "All profiles"
+
+
+class NoteSortMethod(Protocol):
+    """
+    A way to order search results. Implemented by the sort methods shown in the search options.
+    """
+
+    def __call__(self, note: "LocalNote") -> tuple:
+        """
+        Sort key of a loaded note.
+        """
+        ...
+
+    def sql_columns(self, other: "OtherCollection") -> list[str]:
+        """
+        SQL expressions over the notes table that produce the same sort key as calling the method on the note.
+        """
+        ...
+
+    def feature_columns(self) -> Optional[list[str]]:
+        """
+        Columns of the note feature store that make up the sort key, or None if the store can't be used.
+        """
+        ...
+
+    # Rank notes by how well they match the search text if the search index can handle it.
+    ranks_by_relevance: bool
+
+
+class NoteRef(NamedTuple):
+    """
+    Identifies a note in one of the other collections.
+    Note ids are only unique within a collection, e.g. when the same deck was imported into two profiles.
+    """
+
+    profile_name: str
+    note_id: NoteId
 
 
 def sorted_decks_and_ids(col: Collection) -> list[NameId]:
@@ -33,12 +113,427 @@ def get_other_profile_names() -> list[str]:
     return profiles
 
 
+def col_file_path_of(profile_name: str) -> str:
+    return os.path.join(mw.pm.base, profile_name, "collection.anki2")
+
+
+def media_dir_of(col_file_path: str) -> str:
+    return re.sub(r"\.anki2$", ".media", col_file_path)
+
+
+def run_in_background(task: Callable[[], Any], on_done: Callable[[Future], None]) -> None:
+    """
+    Run the task in Anki's background thread pool.
+    Without Anki's main window, e.g. on the command line, the task runs right away.
+    """
+    if mw:
+        mw.taskman.run_in_background(task, on_done)
+        return
+    future: Future = Future()
+    try:
+        future.set_result(task())
+    except Exception as ex:
+        future.set_exception(ex)
+    on_done(future)
+
+
+def current_rss_bytes() -> Optional[int]:
+    """
+    Resident memory of the Anki process. Only available on systems that have procfs.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class CollectionMemoryInfo(NamedTuple):
+    name: str
+    is_read_only: bool
+    file_size: int
+    # How much the process grew when the collection was opened. None if unknown.
+    opened_rss_growth: Optional[int]
+    idle_seconds: int
+
+    def describe(self) -> str:
+        mib = 1024 * 1024
+        growth = f"{self.opened_rss_growth / mib:.1f} MiB" if self.opened_rss_growth is not None else "unknown"
+        return (
+            f"{self.name}: {'read-only' if self.is_read_only else 'full'}, "
+            f"file {self.file_size / mib:.1f} MiB, memory growth on open {growth}, "
+            f"idle {self.idle_seconds} s"
+        )
+
+
+class OtherCollection:
+    """
+    The collection of another profile.
+    In search-only mode, searches and note loading go through a read-only SQLite connection.
+    The full Anki collection is opened read-write only when it's needed,
+    e.g. to run a query written in Anki's search syntax or to import notes.
+    """
+
+    def __init__(self, name: str, col_file_path: str) -> None:
+        self.name = name
+        self.path = col_file_path
+        self._lock = threading.RLock()
+        self._col: Optional[Collection] = None
+        self._ro_db: Optional[ReadOnlyDB] = None
+        self._index: Optional[NoteSearchIndex] = None
+        self._features: Optional[NoteFeatureStore] = None
+        self._ngrams: Optional[CjkNgramIndex] = None
+        self._last_used = time.monotonic()
+        self._rss_growth: Optional[int] = 0
+        rss_before = current_rss_bytes()
+        if config.read_only_search:
+            self._ro_db = ReadOnlyDB(
+                col_file_path,
+                immutable=True,
+                cache_mb=config.sqlite_cache_mb,
+                mmap_mb=config.sqlite_mmap_mb,
+            )
+            if self._ro_db.schema_version() < MIN_SCHEMA_VERSION:
+                # Legacy collections store decks and note types as json. Let Anki upgrade them.
+                self._open_full_collection()
+        else:
+            self._open_full_collection()
+        self._add_rss_growth(rss_before)
+
+    def _add_rss_growth(self, rss_before: Optional[int]) -> None:
+        if (rss_after := current_rss_bytes()) is None or rss_before is None or self._rss_growth is None:
+            self._rss_growth = None
+        else:
+            self._rss_growth += max(0, rss_after - rss_before)
+
+    def touch(self) -> None:
+        self._last_used = time.monotonic()
+
+    def idle_seconds(self) -> int:
+        return int(time.monotonic() - self._last_used)
+
+    def memory_info(self) -> CollectionMemoryInfo:
+        return CollectionMemoryInfo(
+            name=self.name,
+            is_read_only=self.is_read_only,
+            file_size=os.path.getsize(self.path),
+            opened_rss_growth=self._rss_growth,
+            idle_seconds=self.idle_seconds(),
+        )
+
+    @property
+    def is_read_only(self) -> bool:
+        return self._col is None
+
+    @property
+    def col(self) -> Collection:
+        """
+        The full collection. Opened on first access.
+        """
+        with self._lock:
+            if self._col is None:
+                rss_before = current_rss_bytes()
+                self._open_full_collection()
+                self._add_rss_growth(rss_before)
+            return self._col
+
+    @property
+    def db(self) -> AnyDB:
+        """
+        Use the read-only connection until the full collection is opened.
+        """
+        return self._col.db if self._col is not None else self._ro_db
+
+    @property
+    def media_dir(self) -> str:
+        return media_dir_of(self.path)
+
+    def _open_full_collection(self) -> None:
+        if self._ro_db is not None:
+            # Anki writes to the file from now on. The read-only connection can't assume it's immutable anymore.
+            self._ro_db.reopen(immutable=False)
+        logDebug(f"opening full collection: {self.name}")
+        self._col = Collection(self.path)
+
+    def modification_time(self) -> int:
+        """
+        Changes whenever anything in the collection is modified.
+        """
+        return self.db.scalar("SELECT mod FROM col")
+
+    def deck_names_and_ids(self) -> list[NameId]:
+        return sorted(NameId(name.replace("\x1f", "::"), deck_id) for deck_id, name in self._all_decks())
+
+    def deck_and_child_ids(self, deck: NameId) -> list[DeckId]:
+        name = deck.name.replace("::", "\x1f")
+        return [
+            DeckId(deck_id)
+            for deck_id, deck_name in self._all_decks()
+            if deck_name == name or deck_name.startswith(name + "\x1f")
+        ]
+
+    def note_ids_in_deck(self, deck: NameId) -> set[NoteId]:
+        """
+        Ids of notes that have cards in the deck or in its subdecks.
+        """
+        deck_ids = ids2str(self.deck_and_child_ids(deck))
+        return set(self.db.list(f"SELECT DISTINCT nid FROM cards WHERE did IN {deck_ids} OR odid IN {deck_ids}"))
+
+    def _all_decks(self) -> list[list]:
+        # Deck names are stored with \x1f in place of "::".
+        return self.db.all("SELECT id, name FROM decks")
+
+    def field_ords(self, mid: NotetypeId) -> dict[str, int]:
+        return {name: idx for name, idx in self.db.all("SELECT name, ord FROM fields WHERE ntid = ? ORDER BY ord", mid)}
+
+    def field_ords_by_name(self, field_name: str) -> dict[NotetypeId, int]:
+        """
+        Position of the field in each note type that has it.
+        """
+        return {
+            NotetypeId(ntid): ord_
+            for ntid, ord_, name in self.db.all("SELECT ntid, ord, name FROM fields")
+            if name == field_name
+        }
+
+    def find_plain_text(self, terms: Sequence[str], after_id: int = 0, limit: int = -1) -> Sequence[NoteId]:
+        """
+        Find notes that contain all terms, the same way Anki searches for unqualified text.
+        A large result set can be read in batches by passing the last id of the previous batch.
+        """
+        where = " AND ".join("flds LIKE ? ESCAPE '\\'" for _term in terms)
+        args = (f"%{escape_like(term)}%" for term in terms)
+        return self.db.list(
+            f"SELECT id FROM notes WHERE {where} AND id > ? ORDER BY id LIMIT ?",
+            *args,
+            after_id,
+            limit,
+        )
+
+    def find_plain_text_any(self, term_lists: Sequence[Sequence[str]]) -> Sequence[NoteId]:
+        """
+        Find notes that contain all terms of at least one of the lists, the same way find_plain_text matches them.
+        """
+        where = " OR ".join(
+            "({})".format(" AND ".join("flds LIKE ? ESCAPE '\\'" for _term in terms)) for terms in term_lists
+        )
+        args = (f"%{escape_like(term)}%" for terms in term_lists for term in terms)
+        return self.db.list(f"SELECT id FROM notes WHERE {where} ORDER BY id", *args)
+
+    def filter_plain_text(self, terms: Sequence[str], note_ids: Sequence[NoteId]) -> Sequence[NoteId]:
+        """
+        Keep notes that contain all terms, the same way find_plain_text matches them. Ids must be ascending.
+        """
+        where = " AND ".join("flds LIKE ? ESCAPE '\\'" for _term in terms)
+        args = [f"%{escape_like(term)}%" for term in terms]
+        return self.db.list(f"SELECT id FROM notes WHERE id IN {ids2str(note_ids)} AND {where} ORDER BY id", *args)
+
+    def filter_regex(self, regex: re.Pattern, note_ids: Sequence[NoteId]) -> Sequence[NoteId]:
+        """
+        Keep notes whose fields match the regular expression, like Anki's "re:" search. Ids must be ascending.
+        """
+        return [
+            note_id
+            for note_id, flds in self.db.all(f"SELECT id, flds FROM notes WHERE id IN {ids2str(note_ids)} ORDER BY id")
+            if regex.search(flds)
+        ]
+
+    def filter_by_sentence_length(
+        self,
+        field_name: str,
+        note_ids: Sequence[NoteId],
+        min_length: int = 0,
+        max_length: int = 0,
+    ) -> Sequence[NoteId]:
+        """
+        Keep notes whose field length is within the bounds, preserving their order. 0 means no bound.
+        The length of the field's text without HTML is measured, like the note feature store does.
+        Only the field is read from the database. Notes of types that don't have the field are dropped.
+        """
+        if not (field_ords := self.field_ords_by_name(field_name)):
+            return []
+        sentence = "CASE mid{} END".format(
+            "".join(f" WHEN {mid} THEN field_at_index(flds, {ord_})" for mid, ord_ in field_ords.items())
+        )
+        max_length = max_length or sys.maxsize
+        passed: set[NoteId] = set()
+        for start in range(0, len(note_ids), LOAD_CHUNK_SIZE):
+            chunk = note_ids[start : start + LOAD_CHUNK_SIZE]
+            passed.update(
+                note_id
+                for note_id, text in self.db.all(
+                    f"SELECT id, {sentence} FROM notes WHERE id IN {ids2str(chunk)} AND mid IN {ids2str(field_ords)}"
+                )
+                if min_length <= plain_text_length(text) <= max_length
+            )
+        return [note_id for note_id in note_ids if note_id in passed]
+
+    def search_index(self) -> Optional[NoteSearchIndex]:
+        if config.enable_search_index and self._index and self._index.is_ready():
+            return self._index
+        return None
+
+    def ensure_search_index(self) -> None:
+        """
+        Create the search indexes (if enabled) and bring them up to date in the background.
+        """
+        if not config.enable_search_index:
+            return
+        self._ensure_ngram_index()
+        if self._index is not None:
+            return
+        if not is_fts_trigram_available():
+            logDebug("search index is unavailable: SQLite doesn't support the trigram tokenizer.")
+            return
+        index = self._index = NoteSearchIndex(self.name, self.path)
+
+        def on_done(future: Future) -> None:
+            if exception := future.exception():
+                logDebug(f"failed to build search index: {exception}")
+            else:
+                logDebug("search index is ready.")
+
+        logDebug(f"updating search index of {self.name} in the background.")
+        # The connection is looked up when the task runs, in case the full collection has been opened since.
+        run_in_background(lambda: index.update(self.db), on_done)
+
+    def ngram_index(self) -> Optional[CjkNgramIndex]:
+        if config.enable_search_index and self._ngrams and self._ngrams.is_ready():
+            return self._ngrams
+        return None
+
+    def _ensure_ngram_index(self) -> None:
+        if self._ngrams is not None:
+            return
+
+        def on_saved(future: Future) -> None:
+            if exception := future.exception():
+                logDebug(f"failed to save n-gram index: {exception}")
+
+        ngrams = self._ngrams = CjkNgramIndex(self.name, self.path, lambda save: run_in_background(save, on_saved))
+
+        def on_done(future: Future) -> None:
+            if exception := future.exception():
+                logDebug(f"failed to build n-gram index: {exception}")
+
+        logDebug(f"updating n-gram index of {self.name} in the background.")
+        run_in_background(lambda: ngrams.update(self.db), on_done)
+
+    def note_features(self) -> Optional[NoteFeatureStore]:
+        """
+        Return the note feature store if it has been built for the current sentence field.
+        """
+        if self._features and self._features.sentence_field_name == config.sentence_field_name:
+            return self._features if self._features.is_ready() else None
+        # The sentence field has been changed in the settings.
+        self.ensure_note_features()
+        return None
+
+    def ensure_note_features(self) -> None:
+        """
+        Create the note feature store and bring it up to date in the background.
+        """
+        if self._features is not None:
+            if self._features.sentence_field_name == config.sentence_field_name:
+                return
+            self._features.close()
+        features = self._features = NoteFeatureStore(self.name, self.path, config.sentence_field_name)
+
+        def on_done(future: Future) -> None:
+            if exception := future.exception():
+                logDebug(f"failed to compute note features: {exception}")
+
+        logDebug(f"updating note features of {self.name} in the background.")
+        run_in_background(lambda: features.update(self.db), on_done)
+
+    def close(self) -> None:
+        if self._index:
+            self._index.close()
+        if self._features:
+            self._features.close()
+        if self._ngrams:
+            self._ngrams.close()
+        if self._col:
+            self._col.close()
+        if self._ro_db:
+            self._ro_db.close()
+
+
+@dataclasses.dataclass(frozen=True)
+class LocalNote:
+    """
+    A lightweight read-only view of a note stored in the other collection.
+    Provides a subset of the Note interface that is enough to list, preview and sort notes.
+    The full Note is loaded only when it's imported.
+    """
+
+    id: NoteId
+    mid: NotetypeId
+    fields: list[str]
+    tags: list[str]
+    profile_name: str
+    _manager: "CollectionManager"
+    _field_ords: dict[str, int]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._field_ords
+
+    def __getitem__(self, key: str) -> str:
+        return self.fields[self._field_ords[key]]
+
+    @property
+    def media_dir(self) -> str:
+        return media_dir_of(self._manager.col_file_path(self.profile_name))
+
+    def keys(self) -> list[str]:
+        return list(self._field_ords)
+
+    def items(self) -> list[tuple[str, str]]:
+        return [(name, self.fields[idx]) for name, idx in self._field_ords.items()]
+
+    def note_type(self) -> Optional[NotetypeDict]:
+        return self._manager.acquire(self.profile_name).col.models.get(self.mid)
+
+    def to_note(self) -> Note:
+        """
+        Load the full note from the collection. The collection is reopened if it has been closed in the meantime.
+        """
+        return self._manager.acquire(self.profile_name).col.get_note(self.id)
+
+    def pinned_collection(self) -> contextlib.AbstractContextManager[OtherCollection]:
+        """
+        Keep the note's collection open while the block runs, e.g. while the note is being imported.
+        """
+        return self._manager.pinned(self.profile_name)
+
+
+def note_media_dir(note: Union[Note, LocalNote]) -> str:
+    if isinstance(note, LocalNote):
+        return note.media_dir
+    return note.col.media.dir()
+
+
+def escape_like(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
 class CollectionManager:
-    """This class keeps other collections (profiles) open and can switch between them."""
+    """
+    This class keeps other collections (profiles) open and can switch between them.
+    Only a limited number of collections is kept open. The least recently used ones are closed first.
+    Collections that haven't been used for a while are closed as well.
+    Closed collections are reopened transparently when they're needed again.
+    Collections are named after profiles. Pass col_file_path_of to use collection files outside of Anki's profiles.
+    """
 
-    def __init__(self):
-        self._opened_cols: dict[str, Collection] = {}
+    def __init__(self, col_file_path_of: Callable[[str], str] = col_file_path_of):
+        self._col_file_path_of = col_file_path_of
+        # Ordered from the least to the most recently used.
+        self._opened_cols: dict[str, OtherCollection] = {}
         self._current_name: Optional[str] = None
+        # Collections used by running searches. They aren't closed until the searches finish.
+        self._pins: dict[str, int] = {}
+        self._lock = threading.RLock()
 
     @property
     def name(self) -> Optional[str]:
@@ -46,49 +541,560 @@ class CollectionManager:
             raise RuntimeError("Collection vanished or was never opened.")
         return self._current_name
 
+    @property
+    def current(self) -> OtherCollection:
+        return self.acquire(self.name)
+
+    def col_file_path(self, name: str) -> str:
+        return self._col_file_path_of(name)
+
+    def acquire(self, name: str) -> OtherCollection:
+        """
+        Return the collection of the profile, open it if necessary and mark it as recently used.
+        """
+        with self._lock:
+            try:
+                other = self._opened_cols[name] = self._opened_cols.pop(name)
+            except KeyError:
+                logDebug(f"opening collection: {name}")
+                other = self._opened_cols[name] = OtherCollection(name, self.col_file_path(name))
+                other.ensure_search_index()
+                other.ensure_note_features()
+                self._close_least_recently_used(keep=name)
+            other.touch()
+            return other
+
+    @contextlib.contextmanager
+    def pinned(self, name: str) -> Iterator[OtherCollection]:
+        """
+        Acquire the collection and keep it open until the block exits.
+        Lets several collections be searched at once even if the pool is smaller than the number of profiles.
+        """
+        with self._lock:
+            other = self.acquire(name)
+            self._pins[name] = self._pins.get(name, 0) + 1
+        try:
+            yield other
+        finally:
+            with self._lock:
+                if (count := self._pins.pop(name) - 1) > 0:
+                    self._pins[name] = count
+                else:
+                    self._close_least_recently_used(keep=name)
+
+    def _close_least_recently_used(self, keep: str) -> None:
+        closable = [name for name in self._opened_cols if name != keep and name not in self._pins]
+        n_extra = len(self._opened_cols) - max(1, config.max_opened_collections)
+        for name in closable[:n_extra]:
+            logDebug(f"closing least recently used collection: {name}")
+            self._opened_cols.pop(name).close()
+
+    def close_idle(self) -> None:
+        """
+        Close collections that haven't been used for longer than the configured time.
+        """
+        if (idle_minutes := config.close_idle_collections_min) <= 0:
+            return
+        with self._lock:
+            for name, other in list(self._opened_cols.items()):
+                if name not in self._pins and other.idle_seconds() > idle_minutes * 60:
+                    logDebug(f"closing idle collection: {name}")
+                    self._opened_cols.pop(name).close()
+
+    def memory_usage(self) -> list[CollectionMemoryInfo]:
+        with self._lock:
+            return [other.memory_info() for other in self._opened_cols.values()]
+
     @property
     def col(self) -> Collection:
-        ret = self._opened_cols[self.name]
-        assert ret is not mw.col, "The other collection can't be the same as the current one."
+        """
+        The full collection. Accessing it opens the collection read-write if it was opened in search-only mode.
+        """
+        ret = self.current.col
+        assert not mw or ret is not mw.col, "The other collection can't be the same as the current one."
         return ret
 
     @property
     def media_dir(self):
-        return self.col.media.dir()
+        return self.current.media_dir
 
     @property
     def is_opened(self) -> bool:
-        return (self._current_name is not None) and (self._current_name in self._opened_cols)
+        """
+        A collection has been selected. It's reopened on access if it was closed by the pool.
+        """
+        return self._current_name is not None
 
     def close(self):
-        if self.is_opened:
-            self._opened_cols.pop(self._current_name).close()
+        with self._lock:
+            if self.is_opened:
+                if other := self._opened_cols.pop(self._current_name, None):
+                    other.close()
+                self._current_name = None
+
+    def deselect(self) -> None:
+        """
+        Forget which collection is selected, e.g. when all profiles are searched at once.
+        The collection stays in the pool and can be selected again without reopening it.
+        """
+        with self._lock:
             self._current_name = None
 
+    def close_collection(self, name: str) -> None:
+        """
+        Close the collection of the profile unless it's the selected one.
+        """
+        with self._lock:
+            if name != self._current_name and name not in self._pins and (other := self._opened_cols.pop(name, None)):
+                other.close()
+
     def close_all(self):
-        for col in self._opened_cols.values():
-            col.close()
-        self._current_name = None
-        self._opened_cols.clear()
+        with self._lock:
+            for col in self._opened_cols.values():
+                col.close()
+            self._current_name = None
+            self._opened_cols.clear()
 
     def open_collection(self, name: str) -> None:
         assert name, "Name can't be empty."
-        assert name != mw.col.name(), "Can't open the current collection as other collection."
-        if name not in self._opened_cols:
-            col_file_path = os.path.join(mw.pm.base, name, "collection.anki2")
-            assert os.path.isfile(col_file_path), "Collection file must exist."
-            self._opened_cols[name] = Collection(col_file_path)
+        assert not mw or name != mw.col.name(), "Can't open the current collection as other collection."
+        assert os.path.isfile(self.col_file_path(name)), "Collection file must exist."
+        self.acquire(name)
         self._current_name = name
 
     def deck_names_and_ids(self) -> list[NameId]:
-        return sorted_decks_and_ids(self.col)
+        return self.current.deck_names_and_ids()
 
     def find_notes(self, deck: NameId, filter_text: str) -> Sequence[NoteId]:
+        return self.find_notes_in(self.name, deck, filter_text)
+
+    def find_notes_in(self, profile_name: str, deck: NameId, filter_text: str) -> Sequence[NoteId]:
+        """
+        Search notes in the collection of the profile. Safe to call for several profiles at once.
+        """
+        return [
+            note_id
+            for batch in self.iter_found_notes(profile_name, deck, filter_text, first_batch_size=LOAD_CHUNK_SIZE)
+            for note_id in batch
+        ]
+
+    def iter_found_notes(
+        self,
+        profile_name: str,
+        deck: NameId,
+        filter_text: str,
+        first_batch_size: int,
+    ) -> Iterator[Sequence[NoteId]]:
+        """
+        Search notes in the collection of the profile and yield their ids in batches,
+        so that the first results can be shown before the search completes.
+        Batches grow up to LOAD_CHUNK_SIZE. Searches that only Anki can handle return everything in one batch.
+        """
+        other = self.acquire(profile_name)
+        length_filter = self._sentence_length_filter(other)
+        for note_ids in self._iter_unfiltered_notes(other, deck, filter_text, first_batch_size):
+            if length_filter and not (note_ids := length_filter(note_ids)):
+                continue
+            yield note_ids
+
+    @staticmethod
+    def _sentence_length_filter(other: OtherCollection) -> Optional[Callable[[Sequence[NoteId]], Sequence[NoteId]]]:
+        """
+        Return a function that drops notes whose sentence length is out of bounds, or None if there are no bounds.
+        Lengths are read from the note feature store. Until it's built, the sentence field is read from the database
+        and measured the same way.
+        """
+        if not config.filter_local_by_length or not (config.sentence_min_length or config.sentence_max_length):
+            return None
+        bounds = dict(min_length=config.sentence_min_length, max_length=config.sentence_max_length)
+        if features := other.note_features():
+            features.update(other.db)
+            return functools.partial(features.filter_ids, **bounds)
+        return functools.partial(other.filter_by_sentence_length, config.sentence_field_name, **bounds)
+
+    def _iter_unfiltered_notes(
+        self,
+        other: OtherCollection,
+        deck: NameId,
+        filter_text: str,
+        first_batch_size: int,
+    ) -> Iterator[Sequence[NoteId]]:
+        profile_name = other.name
+        if terms := plain_search_terms(filter_text):
+            if (index := other.search_index()) and index.can_search(terms):
+                logDebug(f"answering search in {profile_name} from the index: {terms}")
+                index.update(other.db)
+                yield from self._iter_batches(other, deck, functools.partial(index.search, terms), first_batch_size)
+                return
+            if (ngrams := other.ngram_index()) and ngrams.can_search(terms):
+                logDebug(f"answering search in {profile_name} from the n-gram index: {terms}")
+                ngrams.update(other.db)
+                verify = functools.partial(other.filter_plain_text, terms)
+                yield from self._iter_candidates(other, deck, ngrams.candidates(terms), verify, first_batch_size)
+                return
+            if other.is_read_only:
+                logDebug(f"answering search in {profile_name} with a read-only query: {terms}")
+                find = functools.partial(other.find_plain_text, terms)
+                yield from self._iter_batches(other, deck, find, first_batch_size)
+                return
+        elif (pattern := regex_search_pattern(filter_text)) and (
+            candidates := self._regex_candidates(other, pattern)
+        ) is not None:
+            logDebug(f"answering regex search in {profile_name} from the index: {pattern}")
+            verify = functools.partial(other.filter_regex, re.compile(pattern, flags=re.IGNORECASE))
+            yield from self._iter_candidates(other, deck, candidates, verify, first_batch_size)
+            return
+        # Anki's search syntax can only be handled by the full collection. Its backend can't be interrupted,
+        # but a search that was cancelled while it was waiting for its turn doesn't have to start.
+        raise_if_cancelled()
+        assert not mw or other.col is not mw.col, "The other collection can't be the same as the current one."
         if deck == WHOLE_COLLECTION:
-            return self.col.find_notes(query=filter_text)
+            yield other.col.find_notes(query=filter_text)
         else:
-            return self.col.find_notes(query=f'"deck:{deck.name}" {filter_text}')
+            yield other.col.find_notes(query=f'"deck:{deck.name}" {filter_text}')
+
+    @staticmethod
+    def _iter_batches(
+        other: OtherCollection,
+        deck: NameId,
+        find: Callable[[int, int], Sequence[NoteId]],
+        batch_size: int,
+    ) -> Iterator[Sequence[NoteId]]:
+        """
+        Call find(after_id, limit) until it runs out of notes.
+        Notes outside of the deck and its subdecks are skipped, like the "deck:" search does.
+        """
+        in_deck = None if deck == WHOLE_COLLECTION else other.note_ids_in_deck(deck)
+        after_id = 0
+        while note_ids := find(after_id, batch_size):
+            after_id = note_ids[-1]
+            is_last = len(note_ids) < batch_size
+            if in_deck is not None:
+                note_ids = [note_id for note_id in note_ids if note_id in in_deck]
+            if note_ids:
+                yield note_ids
+            if is_last:
+                break
+            batch_size = min(batch_size * 2, LOAD_CHUNK_SIZE)
+
+    @staticmethod
+    def _regex_candidates(other: OtherCollection, pattern: str) -> Optional[Sequence[NoteId]]:
+        """
+        Find notes that contain the literal text every match of the pattern must contain.
+        Return None if the pattern can't be narrowed down by the search indexes, or if Python can't compile it.
+        """
+        try:
+            re.compile(pattern)
+        except re.error:
+            return None
+        if not (literals := required_literals(pattern)):
+            return None
+        if (index := other.search_index()) and (long_literals := [lit for lit in literals if index.can_search([lit])]):
+            index.update(other.db)
+            return index.search(long_literals)
+        if (ngrams := other.ngram_index()) and ngrams.can_search(literals):
+            ngrams.update(other.db)
+            return ngrams.candidates(literals)
+        return None
+
+    @staticmethod
+    def _iter_candidates(
+        other: OtherCollection,
+        deck: NameId,
+        candidates: Sequence[NoteId],
+        verify: Callable[[Sequence[NoteId]], Sequence[NoteId]],
+        batch_size: int,
+    ) -> Iterator[Sequence[NoteId]]:
+        """
+        Check candidate notes against the search in batches and yield the notes that match.
+        Notes outside of the deck and its subdecks are skipped, like the "deck:" search does.
+        """
+        in_deck = None if deck == WHOLE_COLLECTION else other.note_ids_in_deck(deck)
+        start = 0
+        while start < len(candidates):
+            chunk = candidates[start : start + batch_size]
+            start += len(chunk)
+            if in_deck is not None:
+                chunk = [note_id for note_id in chunk if note_id in in_deck]
+            if chunk and (note_ids := verify(chunk)):
+                yield note_ids
+            batch_size = min(batch_size * 2, LOAD_CHUNK_SIZE)
 
     def get_note(self, note_id: NoteId):
         assert note_id > 0, "Note ID must be greater than 0."
         return self.col.get_note(note_id)
+
+    def get_notes(self, note_ids: Sequence[NoteId]) -> Sequence[LocalNote]:
+        return self.get_notes_in(self.name, note_ids)
+
+    def get_notes_in(self, profile_name: str, note_ids: Sequence[NoteId]) -> Sequence[LocalNote]:
+        """
+        Load many notes at once, one SQL query per chunk of ids.
+        The order of note_ids is preserved. Notes that no longer exist are skipped.
+        The collection is pinned while the notes are loaded,
+        so that another thread can't close it when it opens a different collection.
+        """
+        field_ords: dict[NotetypeId, dict[str, int]] = {}
+        loaded: dict[NoteId, LocalNote] = {}
+
+        with self.pinned(profile_name) as other:
+            for start in range(0, len(note_ids), LOAD_CHUNK_SIZE):
+                chunk = note_ids[start : start + LOAD_CHUNK_SIZE]
+                rows = other.db.all(f"SELECT id, mid, flds, tags FROM notes WHERE id IN {ids2str(chunk)}")
+                for note_id, mid, flds, tags in rows:
+                    if mid not in field_ords:
+                        field_ords[mid] = other.field_ords(mid)
+                    loaded[note_id] = LocalNote(
+                        id=NoteId(note_id),
+                        mid=NotetypeId(mid),
+                        fields=split_fields(flds),
+                        tags=tags.split(),
+                        profile_name=other.name,
+                        _manager=self,
+                        _field_ords=field_ords[mid],
+                    )
+        return [loaded[note_id] for note_id in note_ids if note_id in loaded]
+
+    def sort_note_ids(
+        self,
+        profile_name: str,
+        note_ids: Sequence[NoteId],
+        sort_method: NoteSortMethod,
+        ordered: bool = True,
+        search_text: str = "",
+        limit: int = 0,
+    ) -> list[tuple[tuple, NoteId]]:
+        """
+        Return ids of found notes paired with their sort keys, sorted unless ordered is false.
+        If limit is set, only the best `limit` notes are returned, sorted.
+        Sort keys are read from the search index, the note feature store or computed by SQL,
+        so the notes don't have to be loaded.
+        """
+        other = self.acquire(profile_name)
+        if (
+            sort_method.ranks_by_relevance
+            and (keyed_ids := self.rank_by_relevance(profile_name, note_ids, search_text, limit=limit or -1))
+            is not None
+        ):
+            if not limit or len(keyed_ids) < limit:
+                # Notes that the index doesn't have go last.
+                ranked = {note_id for _key, note_id in keyed_ids}
+                keyed_ids.extend(sorted(((math.inf,), note_id) for note_id in note_ids if note_id not in ranked))
+            return keyed_ids[:limit] if limit else keyed_ids
+        if (feature_columns := sort_method.feature_columns()) and (features := other.note_features()):
+            features.update(other.db)
+            keyed_ids = features.sort_keys(note_ids, feature_columns, ordered and not limit)
+        else:
+            keyed_ids = self._sql_sort_keys(other, note_ids, sort_method, ordered and not limit)
+        return heapq.nsmallest(limit, keyed_ids) if limit else keyed_ids
+
+    def _sql_sort_keys(
+        self,
+        other: OtherCollection,
+        note_ids: Sequence[NoteId],
+        sort_method: NoteSortMethod,
+        ordered: bool,
+    ) -> list[tuple[tuple, NoteId]]:
+        columns = sort_method.sql_columns(other)
+        order_by = " ORDER BY " + ", ".join(str(pos) for pos in range(1, len(columns) + 2)) if ordered else ""
+        keyed_chunks: list[list[tuple[tuple, NoteId]]] = []
+        try:
+            for start in range(0, len(note_ids), LOAD_CHUNK_SIZE):
+                chunk = note_ids[start : start + LOAD_CHUNK_SIZE]
+                rows = other.db.all(
+                    f"SELECT {', '.join(columns)}, id FROM notes WHERE id IN {ids2str(chunk)}{order_by}"
+                )
+                keyed_chunks.append([(tuple(row[:-1]), NoteId(row[-1])) for row in rows])
+        except DBError as ex:
+            # Anki's connection may lack functions that the sort method relies on.
+            logDebug(f"can't sort notes in SQL, loading them instead: {ex}")
+            return self._sort_loaded_notes(other.name, note_ids, sort_method, ordered)
+        if ordered:
+            return list(heapq.merge(*keyed_chunks))
+        return [keyed_id for chunk in keyed_chunks for keyed_id in chunk]
+
+    def can_rank_by_relevance(self, profile_name: str, search_text: str) -> bool:
+        """
+        The search index is ready and can handle the search text.
+        """
+        terms = plain_search_terms(search_text)
+        return bool(terms and (index := self.acquire(profile_name).search_index()) and index.can_search(terms))
+
+    def rank_by_relevance(
+        self,
+        profile_name: str,
+        note_ids: Sequence[NoteId],
+        search_text: str,
+        offset: int = 0,
+        limit: int = -1,
+    ) -> Optional[list[tuple[tuple, NoteId]]]:
+        """
+        Score the found notes by how well they match the search text and return the best ones first,
+        paired with their keys. Only `limit` notes after the first `offset` ones are returned,
+        so that further pages can be ranked when they're needed. Notes that the index doesn't have are left out.
+        Return None if the search index can't rank the notes.
+        """
+        with self.pinned(profile_name) as other:
+            if not self.can_rank_by_relevance(profile_name, search_text):
+                logDebug("can't rank notes by relevance without the search index, sorting by length instead.")
+                return None
+            terms, index = plain_search_terms(search_text), other.search_index()
+            if offset == 0:
+                # Later pages are ranked against the same notes as the first one.
+                index.update(other.db)
+            return index.relevance_keys(
+                terms,
+                note_ids,
+                prefer_short=config.relevance_prefers_short,
+                offset=offset,
+                limit=limit,
+            )
+
+    def _sort_loaded_notes(
+        self,
+        profile_name: str,
+        note_ids: Sequence[NoteId],
+        sort_method: NoteSortMethod,
+        ordered: bool,
+    ) -> list[tuple[tuple, NoteId]]:
+        keyed_ids: list[tuple[tuple, NoteId]] = []
+        # Notes are loaded chunk by chunk to compute sort keys. Only the keys and ids are kept in memory.
+        for start in range(0, len(note_ids), LOAD_CHUNK_SIZE):
+            chunk = note_ids[start : start + LOAD_CHUNK_SIZE]
+            keyed_ids.extend((sort_method(note), note.id) for note in self.get_notes_in(profile_name, chunk))
+        if ordered:
+            keyed_ids.sort()
+        return keyed_ids
+
+    def iter_best_notes_per_term(
+        self,
+        profile_name: str,
+        deck: NameId,
+        terms: Sequence[str],
+        sort_method: Optional[NoteSortMethod],
+        limit: int,
+    ) -> Iterator[tuple[str, Sequence[NoteId]]]:
+        """
+        Look up each term of a word list and yield it with the ids of at most `limit` best notes that contain it.
+        All terms are searched in one pass, and sort keys are computed once for the notes of all terms.
+        Only the best notes are picked out of the sort keys, the rest of the found notes aren't sorted.
+        Relevance depends on the term, so the notes of each term are ranked separately.
+        Without a sort method, the first found notes are taken.
+        """
+        with self.pinned(profile_name) as other:
+            found = self._find_notes_per_term(other, deck, terms)
+            keys: dict[NoteId, tuple] = {}
+            if sort_method is not None and not sort_method.ranks_by_relevance:
+                all_note_ids = sorted(set().union(*found.values()))
+                keys = {
+                    note_id: key
+                    for key, note_id in self.sort_note_ids(profile_name, all_note_ids, sort_method, ordered=False)
+                }
+            for term in terms:
+                note_ids = found[term]
+                if sort_method is None:
+                    yield term, note_ids[:limit]
+                elif sort_method.ranks_by_relevance:
+                    keyed_ids = self.sort_note_ids(profile_name, note_ids, sort_method, search_text=term, limit=limit)
+                    yield term, [note_id for _key, note_id in keyed_ids]
+                else:
+                    keyed_ids = heapq.nsmallest(
+                        limit, ((keys[note_id], note_id) for note_id in note_ids if note_id in keys)
+                    )
+                    yield term, [note_id for _key, note_id in keyed_ids]
+
+    def _find_notes_per_term(
+        self,
+        other: OtherCollection,
+        deck: NameId,
+        terms: Sequence[str],
+    ) -> dict[str, Sequence[NoteId]]:
+        """
+        Search the collection for all terms of a word list at once and return the found notes of each term.
+        Notes that contain any of the plain text terms are found first, by one query per TERMS_PER_QUERY terms.
+        Then each note is assigned to the terms it contains. Terms that use Anki's search syntax are searched one by one.
+        """
+        words_by_term = {term: words for term in terms if (words := plain_search_terms(term))}
+        found: dict[str, Sequence[NoteId]] = {
+            term: self.find_notes_in(other.name, deck, term) for term in terms if term not in words_by_term
+        }
+        if not words_by_term:
+            return found
+        note_ids = self._find_plain_text_any(other, list(words_by_term.values()))
+        if deck != WHOLE_COLLECTION:
+            in_deck = other.note_ids_in_deck(deck)
+            note_ids = [note_id for note_id in note_ids if note_id in in_deck]
+        if note_ids and (length_filter := self._sentence_length_filter(other)):
+            note_ids = length_filter(note_ids)
+        found.update(self._assign_to_terms(other, note_ids, words_by_term))
+        return found
+
+    @staticmethod
+    def _find_plain_text_any(other: OtherCollection, word_lists: Sequence[Sequence[str]]) -> list[NoteId]:
+        """
+        Return ids of notes that contain all words of at least one of the lists, in ascending order.
+        Lists are looked up in the search indexes when they can handle them, and in the collection otherwise.
+        """
+        found: set[NoteId] = set()
+        index, ngrams = other.search_index(), other.ngram_index()
+        indexed_lists, ngram_lists, other_lists = [], [], []
+        for words in word_lists:
+            if index and index.can_search(words):
+                indexed_lists.append(words)
+            elif ngrams and ngrams.can_search(words):
+                ngram_lists.append(words)
+            else:
+                other_lists.append(words)
+        if ngram_lists:
+            ngrams.update(other.db)
+            # The n-gram index is kept in memory. Its candidates are checked against the terms later.
+            for words in ngram_lists:
+                found.update(ngrams.candidates(words))
+        if indexed_lists:
+            index.update(other.db)
+        for start in range(0, len(indexed_lists), TERMS_PER_QUERY):
+            found.update(index.search_any(indexed_lists[start : start + TERMS_PER_QUERY]))
+        for start in range(0, len(other_lists), TERMS_PER_QUERY):
+            found.update(other.find_plain_text_any(other_lists[start : start + TERMS_PER_QUERY]))
+        logDebug(f"found {len(found)} notes for {len(word_lists)} terms in {other.name}.")
+        return sorted(found)
+
+    @staticmethod
+    def _assign_to_terms(
+        other: OtherCollection,
+        note_ids: Sequence[NoteId],
+        words_by_term: dict[str, list[str]],
+    ) -> dict[str, list[NoteId]]:
+        """
+        Return the notes that contain all words of each term, in ascending order. Letter case is ignored.
+        The notes are read once. Terms are grouped by their first character,
+        so that each note is only checked against the terms whose first character it has.
+        """
+        found: dict[str, list[NoteId]] = {term: [] for term in words_by_term}
+        terms_by_char: dict[str, list[tuple[str, list[str]]]] = defaultdict(list)
+        for term, words in words_by_term.items():
+            words = [word.lower() for word in words]
+            terms_by_char[words[0][0]].append((term, words))
+        for start in range(0, len(note_ids), LOAD_CHUNK_SIZE):
+            chunk = note_ids[start : start + LOAD_CHUNK_SIZE]
+            for note_id, flds in other.db.all(f"SELECT id, flds FROM notes WHERE id IN {ids2str(chunk)} ORDER BY id"):
+                flds = flds.lower()
+                for char in terms_by_char.keys() & set(flds):
+                    for term, words in terms_by_char[char]:
+                        if all(word in flds for word in words):
+                            found[term].append(NoteId(note_id))
+        return found
+
+    def get_notes_by_ref(self, refs: Sequence[NoteRef]) -> Sequence[LocalNote]:
+        """
+        Load notes that come from different collections. The order of refs is preserved.
+        """
+        ids_by_profile: dict[str, list[NoteId]] = defaultdict(list)
+        for ref in refs:
+            ids_by_profile[ref.profile_name].append(ref.note_id)
+        loaded: dict[NoteRef, LocalNote] = {
+            NoteRef(note.profile_name, note.id): note
+            for profile_name, note_ids in ids_by_profile.items()
+            for note in self.get_notes_in(profile_name, note_ids)
+        }
+        return [loaded[ref] for ref in refs if ref in loaded]
@@ -1,9 +1,14 @@
 # Copyright: Ajatt-Tools and contributors; https://github.com/Ajatt-Tools
 # License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
 
+import hashlib
 import os
 
-from aqt import mw
+try:
+    from aqt import mw
+except ImportError:
+    # Anki's GUI can't be loaded, e.g. on a server without Qt. The add-on is used from the command line then.
+    mw = None
 
 ADDON_NAME = "Cross Profile Search and Import"
 ADDON_NAME_SHORT = "CroPro"
@@ -20,10 +25,31 @@ USER_FILES_DIR_PATH = os.path.join(ADDON_DIR_PATH, "user_files")
 IMG_DIR_PATH = os.path.join(ADDON_DIR_PATH, "img")
 
 WINDOW_STATE_FILE_PATH = os.path.join(USER_FILES_DIR_PATH, "window_state.json")
+SEARCH_INDEX_DIR_PATH = os.path.join(USER_FILES_DIR_PATH, "search_index")
+NOTE_FEATURES_DIR_PATH = os.path.join(USER_FILES_DIR_PATH, "note_features")
+NGRAM_INDEX_DIR_PATH = os.path.join(USER_FILES_DIR_PATH, "ngram_index")
+MEDIA_HASHES_DIR_PATH = os.path.join(USER_FILES_DIR_PATH, "media_hashes")
 CLOSE_ICON_PATH = os.path.join(IMG_DIR_PATH, "close.png")
 PLAY_ICON_PATH = os.path.join(IMG_DIR_PATH, "play-button.svg")
 CONFIG_MD_PATH = os.path.join(ADDON_DIR_PATH, "config.md")
 
+
+def sidecar_file_name(profile_name: str, col_file_path: str) -> str:
+    """
+    Name of the files that the add-on keeps for a collection, e.g. its search index.
+    Collections are told apart by their resolved paths, since collections of different folders can have the same name.
+    """
+    path_id = hashlib.sha1(os.path.realpath(col_file_path).encode("utf-8")).hexdigest()[:16]
+    return f"{profile_name}-{path_id}"
+
+
+def parse_term_list(text: str) -> list[str]:
+    """
+    One term per line. Empty lines and repeated terms are skipped, the order is kept.
+    """
+    return list(dict.fromkeys(line.strip() for line in text.splitlines() if line.strip()))
+
+
 for directory in (WEB_DIR_PATH, USER_FILES_DIR_PATH, IMG_DIR_PATH):
     assert os.path.isdir(directory), f"Path to directory must be valid: {directory}"
 
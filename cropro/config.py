@@ -1,11 +1,12 @@
 # Copyright: Ajatt-Tools and contributors; https://github.com/Ajatt-Tools
 # License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
 
+import json
+import os
 from typing import Optional
 
-from aqt import mw
-
 from .ajt_common.addon_config import AddonConfigManager, ConfigSubViewBase
+from .common import mw
 
 
 class RemoteFieldsConfig(ConfigSubViewBase):
@@ -76,6 +77,34 @@ class CroProConfig(AddonConfigManager):
         """
         return bool(self["allow_empty_search"])
 
+    @property
+    def enable_search_index(self) -> bool:
+        """
+        Keep a full-text index of the other collection to speed up plain text searches.
+        """
+        return bool(self["enable_search_index"])
+
+    @property
+    def filter_local_by_length(self) -> bool:
+        """
+        Apply sentence_min_length and sentence_max_length to local searches too.
+        """
+        return bool(self["filter_local_by_length"])
+
+    @property
+    def relevance_prefers_short(self) -> bool:
+        """
+        When sorting by relevance, rank shorter sentences higher.
+        """
+        return bool(self["relevance_prefers_short"])
+
+    @property
+    def link_media_files(self) -> bool:
+        """
+        Bring media files from the other profile by hard links or copy-on-write clones instead of copying them.
+        """
+        return bool(self["link_media_files"])
+
     @property
     def search_the_web(self) -> bool:
         """
@@ -131,6 +160,110 @@ class CroProConfig(AddonConfigManager):
     def timeout_seconds(self, timeout: int) -> None:
         self["timeout_seconds"] = int(timeout)
 
+    @property
+    def read_only_search(self) -> bool:
+        """
+        Open other collections read-only for searching.
+        The full collection is opened only when notes are imported or Anki's search syntax is used.
+        """
+        return bool(self["read_only_search"])
+
+    @property
+    def sqlite_cache_mb(self) -> int:
+        """
+        Size of the page cache of read-only connections, in megabytes.
+        """
+        return int(self["sqlite_cache_mb"])
+
+    @sqlite_cache_mb.setter
+    def sqlite_cache_mb(self, new_value: int) -> None:
+        self["sqlite_cache_mb"] = int(new_value)
+
+    @property
+    def sqlite_mmap_mb(self) -> int:
+        """
+        Use memory-mapped I/O for read-only connections, up to this many megabytes. 0 disables it.
+        """
+        return int(self["sqlite_mmap_mb"])
+
+    @sqlite_mmap_mb.setter
+    def sqlite_mmap_mb(self, new_value: int) -> None:
+        self["sqlite_mmap_mb"] = int(new_value)
+
+    @property
+    def max_opened_collections(self) -> int:
+        """
+        How many other collections can be kept open at the same time.
+        """
+        return int(self["max_opened_collections"])
+
+    @max_opened_collections.setter
+    def max_opened_collections(self, new_value: int) -> None:
+        self["max_opened_collections"] = int(new_value)
+
+    @property
+    def close_idle_collections_min(self) -> int:
+        """
+        Close other collections that haven't been used for this many minutes. 0 disables it.
+        """
+        return int(self["close_idle_collections_min"])
+
+    @close_idle_collections_min.setter
+    def close_idle_collections_min(self, new_value: int) -> None:
+        self["close_idle_collections_min"] = int(new_value)
+
+    @property
+    def search_cache_mb(self) -> int:
+        """
+        How much memory can be used to remember results of recent searches. 0 disables the cache.
+        """
+        return int(self["search_cache_mb"])
+
+    @search_cache_mb.setter
+    def search_cache_mb(self, new_value: int) -> None:
+        self["search_cache_mb"] = int(new_value)
+
+    @property
+    def search_as_you_type(self) -> bool:
+        """
+        Start searching when the user stops typing, without pressing Enter.
+        """
+        return bool(self["search_as_you_type"])
+
+    @property
+    def search_as_you_type_delay_ms(self) -> int:
+        """
+        How long to wait after the last keystroke before searching.
+        """
+        return int(self["search_as_you_type_delay_ms"])
+
+    @search_as_you_type_delay_ms.setter
+    def search_as_you_type_delay_ms(self, new_value: int) -> None:
+        self["search_as_you_type_delay_ms"] = int(new_value)
+
+    @property
+    def presorted_pages(self) -> int:
+        """
+        How many pages of sorted results are prepared before they're shown.
+        Later pages are sorted when they're opened. 0 sorts all results at once.
+        """
+        return int(self["presorted_pages"])
+
+    @presorted_pages.setter
+    def presorted_pages(self, new_value: int) -> None:
+        self["presorted_pages"] = int(new_value)
+
+    @property
+    def batch_results_per_term(self) -> int:
+        """
+        How many notes are found for each term of a batch lookup.
+        """
+        return int(self["batch_results_per_term"])
+
+    @batch_results_per_term.setter
+    def batch_results_per_term(self, new_value: int) -> None:
+        self["batch_results_per_term"] = int(new_value)
+
     @property
     def hidden_fields(self) -> list[str]:
         """
@@ -190,5 +323,18 @@ class CroProConfig(AddonConfigManager):
         self["http_proxy"] = new_value
 
 
+class StandaloneCroProConfig(CroProConfig):
+    """
+    Reads the default config next to this file, so that the add-on can be used without Anki's GUI.
+    Changes are kept in memory.
+    """
+
+    def _set_underlying_dicts(self) -> None:
+        with open(os.path.join(os.path.dirname(__file__), "config.json"), encoding="utf8") as f:
+            self._default_config = self._config = json.load(f)
+
+
 if mw:
     config = CroProConfig()
+else:
+    config = StandaloneCroProConfig()
@@ -17,14 +17,17 @@ TODO:
 - When matching model is found, verify field count (or entire map?)
 """
 
+import concurrent.futures
+import functools
+import heapq
 import json
 from collections import defaultdict
-from collections.abc import Iterable, MutableMapping, Sequence
-from typing import Optional
+from collections.abc import Callable, MutableMapping, Sequence
+from typing import Any, Optional
 
 import aqt
 from anki.models import NotetypeDict
-from anki.notes import Note, NoteId
+from anki.notes import NoteId
 from aqt import AnkiQt, gui_hooks, mw
 from aqt.browser import Browser
 from aqt.operations import CollectionOp, QueryOp
@@ -47,6 +50,8 @@ from .collection_manager import (
     WHOLE_COLLECTION,
     CollectionManager,
     NameId,
+    NoteRef,
+    NoteSortMethod,
     get_other_profile_names,
     note_type_names_and_ids,
     sorted_decks_and_ids,
@@ -63,8 +68,22 @@ from .config import config
 from .debug_log import LogDebug
 from .edit_window import AddDialogLauncher
 from .note_importer import NoteImporter, NoteTypeUnavailable
+from .readonly_db import cancellable
 from .remote_search import CroProWebClientException, CroProWebSearchClient, RemoteNote
+from .search_cache import SearchCacheKey, SearchResultCache
+from .search_results import (
+    AnyNote,
+    GroupedSearchResults,
+    LazilySortedSearchResults,
+    LazySearchResults,
+    NoteKey,
+    NoteLoader,
+    PartiallySortedSearchResults,
+    RankedSearchResults,
+)
+from .search_scheduler import SearchScheduler, SearchTicket
 from .settings_dialog import open_cropro_settings
+from .widgets.batch_lookup import BatchLookupDialog
 from .widgets.main_window_ui import MainWindowUI
 from .widgets.note_pages import NoteListStatus
 from .widgets.remote_search_opts import RemoteNotesSortMethod
@@ -72,6 +91,9 @@ from .widgets.utils import CroProComboBox
 
 logDebug = LogDebug(config)
 
+# How often to look for other collections that can be closed.
+IDLE_CHECK_INTERVAL_MS = 60_000
+
 
 #############################################################################
 # UI logic
@@ -137,13 +159,19 @@ class WindowState:
             return False
 
     def restore(self) -> None:
-        if self._ensure_loaded() and (profile_settings := self._pm_name_to_win_state.get(mw.pm.name)):
-            for key, widget in self._cfg_key_to_widget.items():
-                if value := profile_settings.get(key):
-                    widget.setCurrentText(value)
+        for key in self._cfg_key_to_widget:
+            self.restore_value(key)
         restoreGeom(self._window, self._window.name, adjustSize=True)
         logDebug(f"restored window state.")
 
+    def restore_value(self, key: str) -> None:
+        """
+        Select the remembered item in a combo box. Used when the items are set after the window is shown.
+        """
+        if self._ensure_loaded() and (profile_settings := self._pm_name_to_win_state.get(mw.pm.name)):
+            if value := profile_settings.get(key):
+                self._cfg_key_to_widget[key].setCurrentText(value)
+
     def _forget_missing_profiles(self) -> None:
         """If the user has deleted certain profiles, remove data about them from the dictionary."""
         for pm_name_to_remove in self._pm_name_to_win_state.keys() - mw.pm.profiles():
@@ -164,33 +192,24 @@ def nag_about_note_type(parent) -> int:
     )
 
 
-class SearchLock:
-    """
-    Class used to indicate that a search operation is in progress.
-    Until a search operation finishes, don't allow subsequent searches.
-    """
-
-    def __init__(self, cropro: MainWindowUI) -> None:
-        self._cropro = cropro
-        self._searching = False
-
-    def set_searching(self, searching: bool) -> None:
-        self._searching = searching
-        self._cropro.search_bar.setDisabled(searching)
-
-    def is_searching(self) -> bool:
-        return self._searching
-
-
 class CroProMainWindow(MainWindowUI):
+    # Emitted when the selected collection is opened and its decks are listed.
+    other_col_ready = pyqtSignal(str)
+
     def __init__(self, ankimw: AnkiQt) -> None:
         super().__init__(ankimw=ankimw, window_title=ADDON_NAME)
+        self._opening_profile_name: Optional[str] = None
+        self._pending_search_text: Optional[str] = None
+        self._restore_deck_when_ready = False
+        self._profile_generation = 0
         self.window_state = WindowState(self)
         self.other_col = CollectionManager()
         self.web_search_client = CroProWebSearchClient(config)
         self._add_window_mgr = AddDialogLauncher(self)
-        self._search_lock = SearchLock(self)
+        self._search_scheduler = SearchScheduler()
+        self._search_cache = SearchResultCache()
         self._importer = NoteImporter(web_client=self.web_search_client)
+        self._idle_timer = QTimer(self)
         self.connect_elements()
         self.setup_menubar()
         disable_help_button(self)
@@ -219,7 +238,9 @@ class CroProMainWindow(MainWindowUI):
         qconnect(toggle_web_search_act.triggered, self._on_toggle_web_search_triggered)
         qconnect(tools_menu.aboutToShow, lambda: toggle_web_search_act.setChecked(config.search_the_web))
 
+        tools_menu.addAction("Batch lookup", self._open_batch_lookup)
         tools_menu.addAction("Send query to Browser", self._send_query_to_browser)
+        tools_menu.addAction("Opened profiles", self._show_opened_collections)
 
         close_act = tools_menu.addAction("Close", self.close)
         close_act.setShortcut(QKeySequence("Ctrl+q"))
@@ -248,6 +269,13 @@ class CroProMainWindow(MainWindowUI):
         browser.activateWindow()
         browser.search_for(search_text)
 
+    def _show_opened_collections(self) -> None:
+        if usage := self.other_col.memory_usage():
+            text = "\n".join(f"* {info.describe()}" for info in usage)
+        else:
+            text = "No profiles are opened."
+        showInfo(text=text, textFormat="markdown", title=ADDON_NAME, parent=self)
+
     def _on_toggle_web_search_triggered(self, checked: bool) -> None:
         """
         In case the checkbox has been toggled, remember the setting.
@@ -290,6 +318,9 @@ class CroProMainWindow(MainWindowUI):
         qconnect(self.edit_button.clicked, self.new_edit_win)
         qconnect(self.import_button.clicked, self.do_import)
         qconnect(self.note_list.status_changed, self.set_search_result_status)
+        qconnect(self._idle_timer.timeout, self.other_col.close_idle)
+        qconnect(self.other_col_ready, self._on_other_col_ready)
+        self._idle_timer.start(IDLE_CHECK_INTERVAL_MS)
 
     def populate_other_profile_names(self) -> None:
         if not self.search_bar.opts.needs_to_repopulate_profile_names():
@@ -325,30 +356,103 @@ class CroProMainWindow(MainWindowUI):
         if not selected_profile_name:
             # there are no collections in the combobox
             return
+        if selected_profile_name == self._opening_profile_name:
+            # the collection is being opened right now
+            return
+        if self.search_bar.opts.is_all_profiles_selected():
+            # each collection is opened by the search itself.
+            self._select_all_profiles()
+            return
         if not self.other_col.is_opened or selected_profile_name != self.other_col.name:
             # the selected collection is not opened yet
             self.reset_cropro_status()
-            self.other_col.open_collection(selected_profile_name)
-            self.populate_other_profile_decks()
+            self._open_other_col_in_background(selected_profile_name)
+
+    def _select_all_profiles(self) -> None:
+        if self.other_col.is_opened or self._opening_profile_name:
+            self.reset_cropro_status()
+        self._opening_profile_name = None
+        self.other_col.deselect()
+        # decks are different in every profile.
+        self.search_bar.opts.set_decks([WHOLE_COLLECTION])
+
+    def _open_other_col_in_background(self, profile_name: str) -> None:
+        """
+        Opening a big collection and listing its decks takes time. Don't block the GUI thread.
+        """
+        logDebug(f"opening {profile_name} in the background...")
+        self._opening_profile_name = profile_name
+        self.search_bar.opts.set_decks([])
+        generation = self._profile_generation
+
+        def open_col(_col) -> list[NameId]:
+            return self.other_col.acquire(profile_name).deck_names_and_ids()
+
+        def is_outdated() -> bool:
+            return generation != self._profile_generation or profile_name != self._opening_profile_name
+
+        def on_success(decks: list[NameId]) -> None:
+            if generation != self._profile_generation:
+                # Anki has switched profiles in the meantime.
+                self.other_col.close_collection(profile_name)
+                return
+            if is_outdated():
+                # the user has selected another profile in the meantime.
+                return
+            self._opening_profile_name = None
+            self.other_col.open_collection(profile_name)
+            self.populate_other_profile_decks(decks)
+            logDebug(f"opened {profile_name}.")
+            self.other_col_ready.emit(profile_name)
+
+        def on_failure(exception: Exception) -> None:
+            if not is_outdated():
+                self._opening_profile_name = None
+                self._pending_search_text = None
+            raise exception
+
+        (
+            QueryOp(
+                parent=self,
+                op=open_col,
+                success=on_success,
+            )
+            .failure(on_failure)
+            .without_collection()
+            .run_in_background()
+        )
+
+    def _on_other_col_ready(self, _profile_name: str) -> None:
+        if self._restore_deck_when_ready:
+            self._restore_deck_when_ready = False
+            if self.isVisible():
+                self.window_state.restore_value("from_deck")
+        if (search_text := self._pending_search_text) is not None:
+            self._pending_search_text = None
+            logDebug("running the search that was waiting for the collection.")
+            self.perform_search(search_text)
 
     def reset_cropro_status(self) -> None:
+        # notes that are still being found by the previous search won't be shown.
+        self._search_scheduler.cancel()
         self.status_bar.hide_counters()
         self.search_result_label.hide_count()
         self.note_list.clear_notes()
         logDebug("cleared search results")
 
-    def populate_other_profile_decks(self) -> None:
+    def populate_other_profile_decks(self, decks: Sequence[NameId]) -> None:
         if not self.other_col.is_opened:
             # there's nothing to fill.
             return
         logDebug("populating other profile decks...")
         self.search_bar.opts.set_decks([
             WHOLE_COLLECTION,  # the "whole collection" option goes first
-            *self.other_col.deck_names_and_ids(),
+            *decks,
         ])
 
     def _should_abort_search(self) -> bool:
-        return self._search_lock.is_searching() or not self.isVisible()
+        # A search that is still running is superseded by the new one.
+        return not self.isVisible()
 
     def perform_search(self, search_text: str) -> None:
         if self._should_abort_search():
@@ -369,10 +473,13 @@ class CroProMainWindow(MainWindowUI):
             self.search_result_label.set_nothing_to_do()
             return
 
+        sort_method = self.search_bar.remote_opts.sort_method()
+        request_args = self.search_bar.get_request_args()
+
         def remote_notes_sort_key(remote_note: RemoteNote) -> int:
-            if self.search_bar.remote_opts.sort_method() == RemoteNotesSortMethod.len_asc:
+            if sort_method == RemoteNotesSortMethod.len_asc:
                 return len(remote_note.sentence_kanji)
-            elif self.search_bar.remote_opts.sort_method() == RemoteNotesSortMethod.len_desc:
+            elif sort_method == RemoteNotesSortMethod.len_desc:
                 return -len(remote_note.sentence_kanji)
             else:
                 return 1
@@ -384,25 +491,31 @@ class CroProMainWindow(MainWindowUI):
             return sorted(
                 (
                     item
-                    for item in self.web_search_client.search_notes(self.search_bar.get_request_args())
+                    for item in self.web_search_client.search_notes(request_args)
                     if config.sentence_min_length <= len(item.sentence_kanji) <= wrap_zero(config.sentence_max_length)
                 ),
                 key=remote_notes_sort_key,
             )
 
         def set_search_results(notes: Sequence[RemoteNote]) -> None:
-            self.note_list.set_notes(notes)
-            self._search_lock.set_searching(False)
+            if self._search_scheduler.is_current(ticket):
+                self._search_scheduler.finish(ticket)
+                self.note_list.set_notes(notes)
 
         def on_exception(exception: Exception) -> None:
-            self._search_lock.set_searching(False)
+            if not self._search_scheduler.is_current(ticket):
+                # the connection has been closed because the search was superseded.
+                return
+            self._search_scheduler.finish(ticket)
 
             if not isinstance(exception, CroProWebClientException):
                 raise exception
 
             self.search_result_label.set_error(exception)
 
-        self._search_lock.set_searching(True)
+        ticket = self._search_scheduler.start()
+        ticket.on_cancel(self.web_search_client.cancel_searches)
+        self.search_result_label.set_searching()
         (
             QueryOp(
                 parent=self,
@@ -411,7 +524,6 @@ class CroProMainWindow(MainWindowUI):
             )
             .failure(on_exception)
             .without_collection()
-            .with_progress("Searching notes...")
             .run_in_background()
         )
 
@@ -423,8 +535,10 @@ class CroProMainWindow(MainWindowUI):
         self.reset_cropro_status()
         self.open_other_col()
 
-        if not self.other_col.is_opened:
-            logDebug("Abort local search: other collection is not opened.")
+        if self._opening_profile_name:
+            logDebug("Delay local search: other collection is being opened.")
+            self._pending_search_text = search_text
+            self.search_result_label.set_opening_collection(self._opening_profile_name)
             return
 
         if not (search_text or config.allow_empty_search):
@@ -432,37 +546,329 @@ class CroProMainWindow(MainWindowUI):
             logDebug("Abort local search: empty search string.")
             return
 
+        if self.search_bar.opts.is_all_profiles_selected():
+            return self._search_all_profiles(search_text)
+
+        if not self.other_col.is_opened:
+            logDebug("Abort local search: other collection is not opened.")
+            return
+
         if not (self.search_bar.opts.selected_profile_name() and self.search_bar.opts.decks_populated()):
             # the user has only one profile or the combo boxes haven't been populated.
             logDebug("Abort local search: other collection's decks are not populated.")
             return
 
-        def search_notes(_col) -> Sequence[NoteId]:
-            return self.other_col.find_notes(self.search_bar.opts.current_deck(), search_text)
+        cache_key = self._search_cache_key(search_text)
+        if (cached_ids := self._search_cache.get(cache_key, self.other_col.current.modification_time())) is not None:
+            self.note_list.set_results(
+                LazySearchResults(
+                    note_ids=cached_ids,
+                    loader=self.other_col.get_notes,
+                    notes_per_page=config.notes_per_page,
+                )
+            )
+            return
+
+        profile_name = self.other_col.name
+        deck = self.search_bar.opts.current_deck()
+        sort_key = self.search_bar.opts.current_sort_key()
+        ticket = self._search_scheduler.start()
+        loader = functools.partial(self.other_col.get_notes_in, profile_name)
+        results = self._new_streamed_results(loader=loader)
+
+        def search_notes(_col) -> tuple[int, Optional[LazySearchResults]]:
+            with self.other_col.pinned(profile_name) as other, cancellable(ticket.is_cancelled):
+                # Remember the modification time before searching. If notes change during the search, it's stale.
+                col_mod = other.modification_time()
+                if sort_key:
+                    note_ids = self.other_col.find_notes_in(profile_name, deck, search_text)
+                    sort_method = sort_key(config)
+                    if ranked_results := self._new_ranked_results(profile_name, note_ids, sort_method, search_text):
+                        return col_mod, ranked_results
+                    keyed_ids = self.other_col.sort_note_ids(
+                        profile_name,
+                        note_ids,
+                        sort_method,
+                        ordered=config.presorted_pages < 1,
+                        search_text=search_text,
+                    )
+                    return col_mod, self._new_sorted_results([keyed_ids], loader=loader)
+                for batch in self.other_col.iter_found_notes(
+                    profile_name, deck, search_text, first_batch_size=config.notes_per_page
+                ):
+                    ticket.raise_if_cancelled()
+                    mw.taskman.run_on_main(functools.partial(self._add_streamed_results, ticket, results, batch))
+                return col_mod, None
+
+        def set_search_results(outcome: tuple[int, Optional[LazySearchResults]]) -> None:
+            col_mod, sorted_results = outcome
+            if sorted_results is None:
+                self._finish_streamed_results(ticket, shown_results := results, [])
+            else:
+                self._show_sorted_results(ticket, shown_results := sorted_results)
+            self._cache_search_results(cache_key, col_mod, shown_results)
+
+        self._run_search(ticket, search_notes, set_search_results)
+
+    def _cache_search_results(self, cache_key: SearchCacheKey, col_mod: int, results: LazySearchResults) -> None:
+        """
+        Remember the found notes in their final order.
+        Results that have only been sorted up to the first pages are sorted till the end in the background.
+        """
+        if (note_ids := results.cacheable_note_ids()) is not None:
+            self._search_cache.put(cache_key, col_mod, note_ids)
+            return
+        if not isinstance(results, LazilySortedSearchResults):
+            return
+
+        def on_done(future: concurrent.futures.Future) -> None:
+            if exception := future.exception():
+                logDebug(f"can't cache sorted search results: {exception}")
+            else:
+                self._search_cache.put(cache_key, col_mod, future.result())
+
+        mw.taskman.run_in_background(results.sorted_note_ids, on_done)
 
-        def set_search_results(note_ids: Sequence[NoteId]) -> None:
-            self.note_list.set_notes(
-                self._sort_col_search_results(self.other_col.get_note(note_id) for note_id in note_ids)
+    def _open_batch_lookup(self) -> None:
+        dialog = BatchLookupDialog(parent=self)
+        if dialog.exec() != QDialog.DialogCode.Accepted:
+            return
+        if not (terms := dialog.terms()):
+            return tooltip("Nothing to do.", parent=self)
+        self.perform_batch_search(terms, import_all=dialog.should_import())
+
+    def perform_batch_search(self, terms: Sequence[str], import_all: bool = False) -> None:
+        """
+        Look up every term of a word list in the selected profile in one background operation.
+        The best notes of each term are shown grouped by term. If import_all is set, they're imported all at once.
+        """
+        if config.search_the_web:
+            return tooltip("Batch lookup only searches local profiles.", parent=self)
+        self.reset_cropro_status()
+        if (
+            self.search_bar.opts.is_all_profiles_selected()
+            or self._opening_profile_name
+            or not self.other_col.is_opened
+        ):
+            self.search_result_label.set_error_text("Select a profile to look up the terms in.")
+            return
+
+        profile_name = self.other_col.name
+        deck = self.search_bar.opts.current_deck()
+        sort_key = self.search_bar.opts.current_sort_key()
+        limit = config.batch_results_per_term
+        loader = functools.partial(self.other_col.get_notes_in, profile_name)
+        ticket = self._search_scheduler.start()
+
+        def search_notes(_col) -> tuple[GroupedSearchResults, list[str], Sequence[AnyNote]]:
+            groups: list[tuple[str, Sequence[NoteId]]] = []
+            with cancellable(ticket.is_cancelled):
+                for term, note_ids in self.other_col.iter_best_notes_per_term(
+                    profile_name, deck, terms, sort_key(config) if sort_key else None, limit
+                ):
+                    ticket.raise_if_cancelled()
+                    groups.append((term, note_ids))
+                results = GroupedSearchResults(groups, loader=loader, notes_per_page=config.notes_per_page)
+                # A note that was found for several terms is imported once.
+                notes = loader(list(dict.fromkeys(results.note_ids))) if import_all else []
+            return results, [term for term, note_ids in groups if not note_ids], notes
+
+        def set_search_results(outcome: tuple[GroupedSearchResults, list[str], Sequence[AnyNote]]) -> None:
+            results, missing_terms, notes = outcome
+            if not self._search_scheduler.is_current(ticket):
+                return
+            self._show_sorted_results(ticket, results)
+            logDebug(f"batch lookup: {len(terms)} terms, {len(results)} notes, nothing found for {len(missing_terms)}.")
+            if missing_terms:
+                tooltip(f"Nothing found for: {', '.join(missing_terms)}", period=5000, parent=self)
+            if notes:
+                self._import_notes(notes)
+
+        self._run_search(ticket, search_notes, set_search_results)
+
+    def _search_all_profiles(self, search_text: str) -> None:
+        """
+        Search every other profile at once. Each collection is searched in its own thread.
+        Unless the results need to be sorted, notes are shown as soon as any of the profiles finds them.
+        """
+        profile_names = self.search_bar.opts.other_profile_names()
+        sort_key = self.search_bar.opts.current_sort_key()
+        ticket = self._search_scheduler.start()
+        results = self._new_streamed_results(loader=self.other_col.get_notes_by_ref)
+
+        def search_profile(profile_name: str) -> list[tuple[Any, NoteRef]]:
+            with self.other_col.pinned(profile_name), cancellable(ticket.is_cancelled):
+                if sort_key:
+                    note_ids = self.other_col.find_notes_in(profile_name, WHOLE_COLLECTION, search_text)
+                    keyed_ids = self.other_col.sort_note_ids(
+                        profile_name,
+                        note_ids,
+                        sort_key(config),
+                        ordered=config.presorted_pages < 1,
+                        search_text=search_text,
+                    )
+                    return [(key, NoteRef(profile_name, note_id)) for key, note_id in keyed_ids]
+                for batch in self.other_col.iter_found_notes(
+                    profile_name, WHOLE_COLLECTION, search_text, first_batch_size=config.notes_per_page
+                ):
+                    ticket.raise_if_cancelled()
+                    refs = [NoteRef(profile_name, note_id) for note_id in batch]
+                    mw.taskman.run_on_main(functools.partial(self._add_streamed_results, ticket, results, refs, True))
+                return []
+
+        def search_notes(_col) -> Optional[LazySearchResults]:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=len(profile_names)) as executor:
+                futures = [executor.submit(search_profile, profile_name) for profile_name in profile_names]
+                found = [future.result() for future in concurrent.futures.as_completed(futures)]
+            return self._new_sorted_results(found, loader=self.other_col.get_notes_by_ref) if sort_key else None
+
+        def set_search_results(sorted_results: Optional[LazySearchResults]) -> None:
+            if sorted_results is None:
+                self._finish_streamed_results(ticket, results, [], show_profile_names=True)
+            else:
+                self._show_sorted_results(ticket, sorted_results, show_profile_names=True)
+
+        logDebug(f"searching {len(profile_names)} profiles at once.")
+        self._run_search(ticket, search_notes, set_search_results)
+
+    @staticmethod
+    def _new_streamed_results(loader: NoteLoader) -> LazySearchResults:
+        """
+        Create results that are filled while the search is running.
+        """
+        return LazySearchResults(
+            note_ids=[],
+            loader=loader,
+            notes_per_page=config.notes_per_page,
+            is_complete=False,
+        )
+
+    @staticmethod
+    def _new_sorted_results(keyed_ids: Sequence[list[tuple[Any, NoteKey]]], loader: NoteLoader) -> LazySearchResults:
+        """
+        Create results of a sorted search from note ids paired with their sort keys, one list per profile.
+        Unless all results have to be sorted at once, only the first pages are sorted now.
+        """
+        if config.presorted_pages > 0:
+            return PartiallySortedSearchResults(
+                keyed_ids=[keyed_id for profile_ids in keyed_ids for keyed_id in profile_ids],
+                loader=loader,
+                notes_per_page=config.notes_per_page,
+                presorted_pages=config.presorted_pages,
             )
-            self._search_lock.set_searching(False)
+        # keys of each profile are sorted already.
+        return LazySearchResults(
+            note_ids=[note_key for _key, note_key in heapq.merge(*keyed_ids)],
+            loader=loader,
+            notes_per_page=config.notes_per_page,
+        )
+
+    def _new_ranked_results(
+        self,
+        profile_name: str,
+        note_ids: Sequence[NoteId],
+        sort_method: NoteSortMethod,
+        search_text: str,
+    ) -> Optional[RankedSearchResults]:
+        """
+        Create results that are ranked by relevance as the user flips pages,
+        or return None if the notes have to be sorted by their keys.
+        """
+        if not (
+            sort_method.ranks_by_relevance
+            and config.presorted_pages > 0
+            and self.other_col.can_rank_by_relevance(profile_name, search_text)
+        ):
+            return None
+        return RankedSearchResults(
+            note_ids=note_ids,
+            rank=functools.partial(self.other_col.rank_by_relevance, profile_name, note_ids, search_text),
+            loader=functools.partial(self.other_col.get_notes_in, profile_name),
+            notes_per_page=config.notes_per_page,
+            presorted_pages=config.presorted_pages,
+        )
+
+    def _show_sorted_results(
+        self,
+        ticket: SearchTicket,
+        results: LazySearchResults,
+        show_profile_names: bool = False,
+    ) -> None:
+        if not self._search_scheduler.is_current(ticket):
+            return
+        self.note_list.set_results(results, show_profile_names=show_profile_names)
+        self._search_scheduler.finish(ticket)
+
+    def _add_streamed_results(
+        self,
+        ticket: SearchTicket,
+        results: LazySearchResults,
+        note_ids: Sequence[NoteKey],
+        show_profile_names: bool = False,
+    ) -> None:
+        """
+        Append notes found so far and show them. Runs on the main thread.
+        Notes found by a search that has been superseded or cancelled are dropped.
+        """
+        if not self._search_scheduler.is_current(ticket):
+            return
+        results.extend(note_ids)
+        if self.note_list.results is results:
+            self.note_list.on_results_added()
+        elif len(results) > 0 or results.is_complete():
+            self.note_list.set_results(results, show_profile_names=show_profile_names)
+
+    def _finish_streamed_results(
+        self,
+        ticket: SearchTicket,
+        results: LazySearchResults,
+        note_ids: Sequence[NoteKey],
+        show_profile_names: bool = False,
+    ) -> None:
+        if not self._search_scheduler.is_current(ticket):
+            return
+        results.finish()
+        self._add_streamed_results(ticket, results, note_ids, show_profile_names)
+        self._search_scheduler.finish(ticket)
 
-        self._search_lock.set_searching(True)
+    def _run_search(self, ticket: SearchTicket, op: Callable[[Any], Any], success: Callable[[Any], None]) -> None:
+        """
+        Run the search in the background. No progress dialog is shown, so that the user can start another search.
+        """
+
+        def on_failure(exception: Exception) -> None:
+            if not self._search_scheduler.is_current(ticket):
+                # queries of a cancelled search are interrupted.
+                logDebug(f"search #{ticket.generation} stopped: {exception!r}")
+                return
+            self._search_scheduler.finish(ticket)
+            raise exception
+
+        self.search_result_label.set_searching()
         (
             QueryOp(
                 parent=self,
-                op=search_notes,
-                success=set_search_results,
+                op=op,
+                success=success,
             )
+            .failure(on_failure)
             .without_collection()
-            .with_progress("Searching notes...")
             .run_in_background()
         )
 
-    def _sort_col_search_results(self, results: Iterable[Note]) -> Sequence[Note]:
+    def _search_cache_key(self, search_text: str) -> SearchCacheKey:
         sort_key = self.search_bar.opts.current_sort_key()
-        if sort_key is None:
-            return list(results)
-        return sorted(results, key=sort_key(config))
+        return SearchCacheKey(
+            profile_name=self.other_col.name,
+            deck_id=self.search_bar.opts.current_deck().id,
+            search_text=search_text,
+            sort_key=sort_key(config).describe() if sort_key else "",
+            filters=(
+                f"length:{config.sentence_field_name}:{config.sentence_min_length}-{config.sentence_max_length}"
+                if config.filter_local_by_length
+                else ""
+            ),
+        )
 
     def set_search_result_status(self, status: NoteListStatus) -> None:
         self.search_result_label.set_count(*status)
@@ -482,6 +888,9 @@ class CroProMainWindow(MainWindowUI):
         # clear the selection
         self.note_list.clear_selection()
 
+        self._import_notes(notes)
+
+    def _import_notes(self, notes: Sequence[AnyNote]) -> None:
         logDebug(f"importing {len(notes)} notes")
 
         def on_failure(ex: Exception) -> None:
@@ -555,6 +964,11 @@ class CroProMainWindow(MainWindowUI):
 
     def on_profile_will_close(self):
         self.close()
+        self._search_scheduler.cancel()
+        self._profile_generation += 1
+        self._opening_profile_name = None
+        self._pending_search_text = None
+        self._search_cache.clear()
         self.other_col.close_all()
 
     def on_profile_did_open(self) -> None:
@@ -563,6 +977,8 @@ class CroProMainWindow(MainWindowUI):
         self.note_list.clear_notes()
         # setup search bar
         self.populate_other_profile_names()
+        # the collection is opened in the background, so that it doesn't slow down Anki's startup.
+        self._restore_deck_when_ready = True
         self.open_other_col()
         # setup import conditions
         self.populate_current_profile_decks()
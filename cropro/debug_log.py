@@ -3,9 +3,7 @@
 import logging
 import pathlib
 
-from aqt import mw
-
-from .common import ADDON_NAME_SHORT
+from .common import ADDON_NAME_SHORT, mw
 from .config import CroProConfig
 
 
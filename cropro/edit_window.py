@@ -10,7 +10,7 @@ from aqt import addcards, gui_hooks, mw
 from aqt.qt import *
 from aqt.utils import tooltip
 
-from .collection_manager import NameId
+from .collection_manager import LocalNote, NameId
 from .config import config
 from .debug_log import LogDebug
 from .note_importer import (
@@ -49,9 +49,12 @@ class AddDialogLauncher:
         self.block_close_cb: bool = False
         gui_hooks.add_cards_will_add_note.append(self.on_add_import)
 
-    def create_window(self, other_note: Optional[Note] = None) -> NoteId:
+    def create_window(self, other_note: Optional[Union[Note, LocalNote]] = None) -> NoteId:
         assert mw, "Main window must exist."
 
+        if isinstance(other_note, LocalNote):
+            other_note = other_note.to_note()
+
         if not isinstance(other_note, Note):
             # TODO edit remote notes.
             tooltip("Not implemented", parent=cast(QWidget, self.cropro))
@@ -70,7 +73,7 @@ class AddDialogLauncher:
 
         mw.col.decks.select(self.cropro.current_deck().id)
 
-        model = get_matching_model(self.cropro.current_model(), other_note.note_type())
+        model = get_matching_model(mw.col, self.cropro.current_model(), other_note.note_type())
 
         mw.col.models.set_current(model)
         mw.col.models.update(model)
@@ -0,0 +1,169 @@
+# Copyright: Ajatt-Tools and contributors; https://github.com/Ajatt-Tools
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+
+import os
+from collections.abc import Iterator, Sequence
+from typing import Optional
+
+from anki.collection import Collection
+from anki.decks import DEFAULT_DECK_ID
+from anki.notes import NoteId
+
+from .collection_manager import (
+    NO_MODEL,
+    WHOLE_COLLECTION,
+    CollectionManager,
+    LocalNote,
+    NameId,
+    NoteSortMethod,
+)
+from .config import config
+from .debug_log import LogDebug
+from .note_importer import ImportResultCounter, NoteImporter, NoteTypeUnavailable
+from .remote_search import CroProWebSearchClient
+from .sort_methods import SortResultsByLen, SortResultsByNoteID, SortResultsByRelevance
+
+logDebug = LogDebug(config)
+
+# Sort methods by the names used on the command line. The same methods are offered in the search options.
+SORT_METHODS = {
+    "none": None,
+    "length": SortResultsByLen,
+    "id": SortResultsByNoteID,
+    "relevance": SortResultsByRelevance,
+}
+
+
+def collection_name_of(col_file_path: str) -> str:
+    """
+    Collections of Anki profiles are named after the profile, like in the add-on's window,
+    so that the search indexes built by the add-on are reused. Other collection files are named after the file.
+    """
+    col_file_path = os.path.abspath(col_file_path)
+    if os.path.basename(col_file_path) == "collection.anki2":
+        return os.path.basename(os.path.dirname(col_file_path))
+    return os.path.splitext(os.path.basename(col_file_path))[0]
+
+
+def new_sort_method(name: str) -> Optional[NoteSortMethod]:
+    return sort_cls(config) if (sort_cls := SORT_METHODS[name]) else None
+
+
+class HeadlessCroPro:
+    """
+    Searches other collections and imports notes into a collection without Anki's GUI, e.g. from a script.
+    Collections are opened by their file paths. Settings are taken from the add-on's config.
+    """
+
+    def __init__(self, target_col_path: Optional[str] = None) -> None:
+        self._col_paths: dict[str, str] = {}
+        self._sources = CollectionManager(col_file_path_of=self._col_paths.__getitem__)
+        self._target_col_path = target_col_path and os.path.abspath(target_col_path)
+        self._target: Optional[Collection] = None
+        self._importer = NoteImporter(web_client=CroProWebSearchClient(config))
+
+    def __enter__(self) -> "HeadlessCroPro":
+        return self
+
+    def __exit__(self, *_args) -> None:
+        self.close()
+
+    def add_source(self, col_file_path: str) -> str:
+        """
+        Register a collection to search in. Return its name, which is passed to the other methods.
+        """
+        col_file_path = os.path.abspath(col_file_path)
+        if not os.path.isfile(col_file_path):
+            raise FileNotFoundError(f"collection file doesn't exist: {col_file_path}")
+        if col_file_path == self._target_col_path:
+            raise ValueError("can't search the collection that notes are imported into.")
+        name = collection_name_of(col_file_path)
+        if self._col_paths.setdefault(name, col_file_path) != col_file_path:
+            raise ValueError(f"another collection is already named {name}: {self._col_paths[name]}")
+        return name
+
+    def find_deck(self, source: str, deck_name: Optional[str]) -> NameId:
+        if not deck_name:
+            return WHOLE_COLLECTION
+        for deck in self._sources.acquire(source).deck_names_and_ids():
+            if deck.name == deck_name:
+                return deck
+        raise KeyError(f"deck doesn't exist in {source}: {deck_name}")
+
+    def search(
+        self,
+        source: str,
+        search_text: str,
+        deck_name: Optional[str] = None,
+        sort_method: Optional[NoteSortMethod] = None,
+        limit: int = 0,
+    ) -> Sequence[NoteId]:
+        """
+        Find notes in the source collection and return their ids, sorted if a sort method is given.
+        If limit is set, only the best notes are returned.
+        """
+        with self._sources.pinned(source):
+            note_ids = self._sources.find_notes_in(source, self.find_deck(source, deck_name), search_text)
+            if sort_method is None:
+                return note_ids[:limit] if limit else note_ids
+            keyed_ids = self._sources.sort_note_ids(source, note_ids, sort_method, search_text=search_text, limit=limit)
+        return [note_id for _key, note_id in keyed_ids]
+
+    def search_per_term(
+        self,
+        source: str,
+        terms: Sequence[str],
+        limit: int,
+        deck_name: Optional[str] = None,
+        sort_method: Optional[NoteSortMethod] = None,
+    ) -> Iterator[tuple[str, Sequence[NoteId]]]:
+        """
+        Look up each term and yield it with the ids of at most `limit` best notes that contain it.
+        """
+        deck = self.find_deck(source, deck_name)
+        return self._sources.iter_best_notes_per_term(source, deck, terms, sort_method, limit)
+
+    def load_notes(self, source: str, note_ids: Sequence[NoteId]) -> Sequence[LocalNote]:
+        return self._sources.get_notes_in(source, note_ids)
+
+    @property
+    def target(self) -> Collection:
+        """
+        The collection that notes are imported into. Opened on first access.
+        """
+        if self._target is None:
+            if not self._target_col_path:
+                raise RuntimeError("target collection is not set.")
+            logDebug(f"opening target collection: {self._target_col_path}")
+            self._target = Collection(self._target_col_path)
+        return self._target
+
+    def import_notes(
+        self,
+        notes: Sequence[LocalNote],
+        deck_name: Optional[str] = None,
+        note_type_name: Optional[str] = None,
+    ) -> ImportResultCounter:
+        """
+        Import notes into the target collection. The deck is created if it doesn't exist.
+        Without a note type, notes keep their own note type, which is copied if the target doesn't have it.
+        """
+        col = self.target
+        if deck_name:
+            deck = NameId(deck_name, col.decks.id(deck_name))
+        else:
+            deck = NameId(col.decks.name(DEFAULT_DECK_ID), DEFAULT_DECK_ID)
+        if not note_type_name:
+            model = NO_MODEL
+        elif note_type := col.models.by_name(note_type_name):
+            model = NameId(note_type["name"], note_type["id"])
+        else:
+            raise NoteTypeUnavailable(f"note type doesn't exist: {note_type_name}")
+        self._importer.import_notes(col=col, notes=notes, model=model, deck=deck)
+        return self._importer.move_results()
+
+    def close(self) -> None:
+        self._sources.close_all()
+        if self._target is not None:
+            self._target.close()
+            self._target = None
@@ -0,0 +1,137 @@
+# Copyright: Ajatt-Tools and contributors; https://github.com/Ajatt-Tools
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+
+import hashlib
+import os
+import pickle
+import threading
+from typing import NamedTuple, Optional
+
+from .common import MEDIA_HASHES_DIR_PATH
+from .config import config
+from .debug_log import LogDebug
+
+logDebug = LogDebug(config)
+
+# Bump when the layout of the index changes. Files written by other versions are discarded.
+MEDIA_HASHES_VERSION = 1
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+class HashedFile(NamedTuple):
+    size: int
+    mtime_ns: int
+    sha1: str
+
+
+def file_sha1(file_path: str) -> str:
+    digest = hashlib.sha1()
+    with open(file_path, "rb") as f:
+        while chunk := f.read(READ_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def media_hashes_file_path(media_dir: str) -> str:
+    # Media folders are identified by their paths, which can't be used as file names.
+    folder_id = hashlib.sha1(os.path.abspath(media_dir).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(MEDIA_HASHES_DIR_PATH, f"{folder_id}.pickle")
+
+
+class MediaHashIndex:
+    """
+    SHA-1 hashes of files in a media folder, so that files don't have to be read to compare their contents.
+    A hash is reused while the file keeps its size and modification time, otherwise the file is hashed again.
+    Files are hashed when they're first looked up. The index is saved to a sidecar file.
+    """
+
+    def __init__(self, media_dir: str) -> None:
+        self._media_dir = media_dir
+        self._lock = threading.Lock()
+        self._files: dict[str, HashedFile] = {}
+        self._is_dirty = False
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(media_hashes_file_path(self._media_dir), "rb") as f:
+                state = pickle.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError) as ex:
+            logDebug(f"can't read media hashes of {self._media_dir}: {ex}")
+            return
+        if state.get("version") == MEDIA_HASHES_VERSION and state.get("media_dir") == self._media_dir:
+            self._files = {name: HashedFile(*file) for name, file in state["files"].items()}
+
+    def save(self) -> None:
+        """
+        Write the index to disk if new files have been hashed.
+        """
+        with self._lock:
+            if not self._is_dirty:
+                return
+            state = {
+                "version": MEDIA_HASHES_VERSION,
+                "media_dir": self._media_dir,
+                # Plain tuples can be read back even if the add-on's package is renamed.
+                "files": {name: tuple(file) for name, file in self._files.items()},
+            }
+            self._is_dirty = False
+        os.makedirs(MEDIA_HASHES_DIR_PATH, exist_ok=True)
+        file_path = media_hashes_file_path(self._media_dir)
+        with open(tmp_file_path := f"{file_path}.{threading.get_ident()}.tmp", "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file_path, file_path)
+
+    def sha1_of(self, file_name: str) -> Optional[str]:
+        """
+        Return the SHA-1 of the file in the media folder, or None if there's no such file.
+        """
+        try:
+            stat = os.stat(os.path.join(self._media_dir, file_name))
+        except OSError:
+            return None
+        with self._lock:
+            known = self._files.get(file_name)
+        if known and known.size == stat.st_size and known.mtime_ns == stat.st_mtime_ns:
+            return known.sha1
+        try:
+            sha1 = file_sha1(os.path.join(self._media_dir, file_name))
+        except OSError:
+            return None
+        self.remember(file_name, sha1, stat)
+        return sha1
+
+    def remember(self, file_name: str, sha1: str, stat: Optional[os.stat_result] = None) -> None:
+        """
+        Record the hash of a file whose contents are known, e.g. a file that has just been copied to the folder.
+        """
+        try:
+            stat = stat or os.stat(os.path.join(self._media_dir, file_name))
+        except OSError:
+            return
+        with self._lock:
+            self._files[file_name] = HashedFile(stat.st_size, stat.st_mtime_ns, sha1)
+            self._is_dirty = True
+
+
+_indexes: dict[str, MediaHashIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def media_hash_index(media_dir: str) -> MediaHashIndex:
+    """
+    Return the hash index of the media folder. Each folder has one index, shared by all threads.
+    """
+    with _indexes_lock:
+        if (index := _indexes.get(media_dir)) is None:
+            index = _indexes[media_dir] = MediaHashIndex(media_dir)
+        return index
+
+
+def save_media_hash_indexes() -> None:
+    with _indexes_lock:
+        indexes = list(_indexes.values())
+    for index in indexes:
+        index.save()
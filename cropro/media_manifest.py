@@ -0,0 +1,117 @@
+# Copyright: Ajatt-Tools and contributors; https://github.com/Ajatt-Tools
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+
+import os
+import threading
+import time
+from collections.abc import Iterable
+from typing import Optional
+
+from .config import config
+from .debug_log import LogDebug
+
+logDebug = LogDebug(config)
+
+# How often the media folder is checked for changes while it's being looked up.
+REFRESH_INTERVAL_SECONDS = 1.0
+
+
+class MediaManifest:
+    """
+    Names of the files in a media folder, read with one os.scandir() pass,
+    so that looking up a file doesn't need a system call.
+    Only names are read. Their sizes would take a stat() call per file, which is slow on network drives.
+    The folder is scanned again when its modification time changes, i.e. when a file is added, removed or renamed.
+    The modification time is checked at most once per REFRESH_INTERVAL_SECONDS.
+    Files that the add-on adds or removes itself are recorded without scanning the folder again.
+    """
+
+    def __init__(self, media_dir: str) -> None:
+        self._media_dir = media_dir
+        self._lock = threading.Lock()
+        self._names: set[str] = set()
+        self._dir_mtime_ns: Optional[int] = None
+        self._checked_at = -REFRESH_INTERVAL_SECONDS
+
+    @property
+    def media_dir(self) -> str:
+        return self._media_dir
+
+    def _dir_mtime(self) -> Optional[int]:
+        try:
+            return os.stat(self._media_dir).st_mtime_ns
+        except OSError:
+            return None
+
+    def _refresh(self) -> None:
+        if time.monotonic() - self._checked_at < REFRESH_INTERVAL_SECONDS:
+            return
+        dir_mtime_ns = self._dir_mtime()
+        if dir_mtime_ns != self._dir_mtime_ns or dir_mtime_ns is None:
+            self._names = self._scan()
+            self._dir_mtime_ns = dir_mtime_ns
+        self._checked_at = time.monotonic()
+
+    def _scan(self) -> set[str]:
+        names: set[str] = set()
+        try:
+            with os.scandir(self._media_dir) as entries:
+                for entry in entries:
+                    try:
+                        # The type comes with the directory listing on most file systems, so it doesn't need stat().
+                        if entry.is_file():
+                            names.add(entry.name)
+                    except OSError:
+                        continue
+        except OSError as ex:
+            logDebug(f"can't list media folder {self._media_dir}: {ex}")
+        return names
+
+    def _record_own_change(self) -> None:
+        """
+        The folder has been changed by the add-on, and the manifest already knows about the change.
+        The new modification time of the folder is recorded, so that the change doesn't cause another scan.
+        """
+        if self._dir_mtime_ns is not None:
+            self._dir_mtime_ns = self._dir_mtime()
+
+    def add(self, file_name: str) -> None:
+        """
+        Record a file that has just been added to the folder, without scanning the folder again.
+        """
+        with self._lock:
+            self._names.add(file_name)
+            self._record_own_change()
+
+    def remove(self, file_names: Iterable[str]) -> None:
+        """
+        Record files that have just been removed from the folder, without scanning the folder again.
+        """
+        with self._lock:
+            self._names.difference_update(file_names)
+            self._record_own_change()
+
+    def __contains__(self, file_name: str) -> bool:
+        with self._lock:
+            self._refresh()
+            return file_name in self._names
+
+    def path_of(self, file_name: str) -> Optional[str]:
+        """
+        Return the path to the file, or None if the folder doesn't have it.
+        """
+        return os.path.join(self._media_dir, file_name) if file_name in self else None
+
+
+_manifests: dict[str, MediaManifest] = {}
+_manifests_lock = threading.Lock()
+
+
+def media_manifest(media_dir: str) -> MediaManifest:
+    """
+    Return the manifest of the media folder. Each folder has one manifest, shared by all threads.
+    """
+    with _manifests_lock:
+        if (manifest := _manifests.get(media_dir)) is None:
+            manifest = _manifests[media_dir] = MediaManifest(media_dir)
+        return manifest
@@ -0,0 +1,90 @@
+# Copyright: Ajatt-Tools and contributors; https://github.com/Ajatt-Tools
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+
+import contextlib
+import os
+import re
+import shutil
+import unicodedata
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+
+from .config import config
+from .debug_log import LogDebug
+
+logDebug = LogDebug(config)
+
+# ioctl that makes a copy-on-write clone of a file on Btrfs, XFS and other Linux filesystems.
+FICLONE = 0x40049409
+# Characters Anki removes from media file names.
+RE_UNSAFE_FILENAME_CHARS = re.compile(r'[\[\]<>:"/?*^\\|\x00\r\n]')
+
+
+def is_normalized_file_name(file_name: str) -> bool:
+    """
+    Anki renames files that are added with a name it doesn't accept.
+    Such files are left for Anki to add, so that they get the same name as they would get otherwise.
+    """
+    return (
+        bool(file_name)
+        and file_name == file_name.strip()
+        and unicodedata.normalize("NFC", file_name) == file_name
+        and not RE_UNSAFE_FILENAME_CHARS.search(file_name)
+    )
+
+
+def _clone_or_copy(src_path: str, dst_path: str) -> str:
+    with open(src_path, "rb") as src, open(dst_path, "xb") as dst:
+        if fcntl is not None:
+            try:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+                return "reflink"
+            except OSError:
+                pass
+        if hasattr(os, "copy_file_range"):
+            try:
+                size = os.fstat(src.fileno()).st_size
+                offset = 0
+                while offset < size and (copied := os.copy_file_range(src.fileno(), dst.fileno(), size - offset)):
+                    offset += copied
+                if offset == size:
+                    return "copy_file_range"
+                # The file has changed while it was being copied. Start over.
+                dst.truncate(0)
+                dst.seek(0)
+                src.seek(0)
+            except OSError:
+                pass
+        shutil.copyfileobj(src, dst)
+        return "copy"
+
+
+def transfer_file(src_path: str, dst_path: str) -> str:
+    """
+    Bring the file to dst_path without copying its bytes if the filesystem allows it.
+    Try a hard link, then a copy-on-write clone, then an in-kernel copy, and copy the file as the last resort.
+    Return the method that worked. Raise FileExistsError if dst_path already exists.
+    """
+    try:
+        os.link(src_path, dst_path)
+        return "link"
+    except FileExistsError:
+        raise
+    except OSError as ex:
+        # Different filesystems, or the filesystem doesn't support hard links.
+        logDebug(f"can't hard link {src_path}: {ex}")
+    try:
+        method = _clone_or_copy(src_path, dst_path)
+        logDebug(f"transferred {os.path.basename(dst_path)} by {method}.")
+        return method
+    except FileExistsError:
+        raise
+    except BaseException:
+        # Don't leave a partial file behind.
+        with contextlib.suppress(OSError):
+            os.remove(dst_path)
+        raise
@@ -0,0 +1,251 @@
+# Copyright: Ajatt-Tools and contributors; https://github.com/Ajatt-Tools
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+
+import array
+import os
+import pickle
+import re
+import threading
+from collections import defaultdict
+from collections.abc import Callable, Iterable, Sequence
+
+from .common import NGRAM_INDEX_DIR_PATH, sidecar_file_name
+from .config import config
+from .debug_log import LogDebug
+from .readonly_db import AnyDB
+
+logDebug = LogDebug(config)
+
+# Bump when the layout of the index changes. Files written by other versions are rebuilt.
+NGRAM_INDEX_VERSION = 1
+# How many notes are read from the other collection at once.
+SYNC_CHUNK_SIZE = 5_000
+# The index is rebuilt when this share of its postings may point to notes that have been changed or deleted.
+MAX_STALE_RATIO = 0.25
+# Kana, kanji, and hangul. Text in these scripts has no spaces between words.
+RE_CJK_RUN = re.compile(r"[々぀-ヿ㐀-䶿一-鿿가-힯豈-﫿ｦ-ﾟ]+")
+
+
+def ngrams_of(text: str) -> set[str]:
+    """
+    Single characters and pairs of adjacent characters of every CJK run in the text.
+    """
+    grams: set[str] = set()
+    for run in RE_CJK_RUN.findall(text):
+        grams.update(run)
+        grams.update(run[pos : pos + 2] for pos in range(len(run) - 1))
+    return grams
+
+
+def query_ngrams(term: str) -> set[str]:
+    """
+    The fewest n-grams a note must contain to contain the term: a single character or the pairs of characters.
+    Parts of the term outside of CJK runs are not indexed and have to be checked against the note.
+    """
+    grams: set[str] = set()
+    for run in RE_CJK_RUN.findall(term):
+        if len(run) == 1:
+            grams.add(run)
+        else:
+            grams.update(run[pos : pos + 2] for pos in range(len(run) - 1))
+    return grams
+
+
+def encode_deltas(note_ids: Iterable[int], previous: int = 0) -> bytearray:
+    """
+    Store ascending note ids as differences between neighbors, seven bits per byte.
+    """
+    encoded = bytearray()
+    for note_id in note_ids:
+        delta, previous = note_id - previous, note_id
+        while delta >= 0x80:
+            encoded.append(delta & 0x7F | 0x80)
+            delta >>= 7
+        encoded.append(delta)
+    return encoded
+
+
+def decode_deltas(encoded: bytes) -> array.array:
+    note_ids = array.array("q")
+    current = delta = shift = 0
+    for byte in encoded:
+        delta |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            current += delta
+            note_ids.append(current)
+            delta = shift = 0
+    return note_ids
+
+
+def ngram_index_file_path(profile_name: str, col_file_path: str) -> str:
+    return os.path.join(NGRAM_INDEX_DIR_PATH, f"{sidecar_file_name(profile_name, col_file_path)}.pickle")
+
+
+class CjkNgramIndex:
+    """
+    Lists of notes that contain each CJK character and each pair of adjacent CJK characters.
+    Answers searches for terms that are too short for the trigram search index, e.g. a single kanji.
+    Note ids are delta-encoded. Changed notes are added to the lists without removing their old n-grams,
+    so the lists may point to notes that no longer match. Found notes are checked against the search terms anyway.
+    The index is rebuilt when it gets too stale, and it's saved to a sidecar file.
+    """
+
+    def __init__(
+        self,
+        profile_name: str,
+        col_file_path: str,
+        save_later: Callable[[Callable[[], None]], None],
+    ) -> None:
+        self._profile_name = profile_name
+        self._file_path = ngram_index_file_path(profile_name, col_file_path)
+        # Updates run on the search thread. Writing the file is left to a background thread.
+        self._save_later = save_later
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._is_dirty = False
+        self._ready = False
+        self._closing = False
+        self._postings: dict[str, bytearray] = {}
+        # The last note id in each list, to append new notes without decoding the list.
+        self._last_ids: dict[str, int] = {}
+        self._col_mod = 0
+        self._notes_mod = 0
+        self._note_count = 0
+        self._stale_count = 0
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self._file_path, "rb") as f:
+                state = pickle.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError) as ex:
+            logDebug(f"can't read n-gram index of {self._profile_name}: {ex}")
+            return
+        if state.get("version") != NGRAM_INDEX_VERSION:
+            return
+        self._postings = state["postings"]
+        self._last_ids = state["last_ids"]
+        self._col_mod = state["col_mod"]
+        self._notes_mod = state["notes_mod"]
+        self._note_count = state["note_count"]
+        self._stale_count = state["stale_count"]
+
+    def save(self) -> None:
+        """
+        Write the index to disk if it has been updated.
+        """
+        # Saves scheduled by consecutive updates must not overwrite a newer file with an older snapshot.
+        with self._save_lock:
+            with self._lock:
+                if not self._is_dirty:
+                    return
+                # Postings are appended to in place by the next update, so the snapshot needs copies of them.
+                state = {
+                    "version": NGRAM_INDEX_VERSION,
+                    "postings": {gram: bytearray(posting) for gram, posting in self._postings.items()},
+                    "last_ids": dict(self._last_ids),
+                    "col_mod": self._col_mod,
+                    "notes_mod": self._notes_mod,
+                    "note_count": self._note_count,
+                    "stale_count": self._stale_count,
+                }
+                self._is_dirty = False
+            os.makedirs(NGRAM_INDEX_DIR_PATH, exist_ok=True)
+            with open(tmp_file_path := f"{self._file_path}.{threading.get_ident()}.tmp", "wb") as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_file_path, self._file_path)
+
+    @staticmethod
+    def can_search(terms: Sequence[str]) -> bool:
+        return any(query_ngrams(term) for term in terms)
+
+    def is_ready(self) -> bool:
+        """
+        The index can answer queries once the initial build has finished.
+        """
+        return self._ready and not self._closing
+
+    def update(self, db: AnyDB) -> None:
+        """
+        Add new and modified notes to the index. Rebuild it if too many notes have been changed or deleted.
+        Called in the background when the collection is opened and before each search.
+        """
+        with self._lock:
+            if self._closing:
+                return
+            col_mod = db.scalar("SELECT mod FROM col")
+            if col_mod == self._col_mod:
+                self._ready = True
+                return
+            note_count = db.scalar("SELECT count() FROM notes")
+            # Notes that disappeared have been deleted. Their ids stay in the lists.
+            self._stale_count += max(0, self._note_count - note_count)
+            if self._stale_count > MAX_STALE_RATIO * max(note_count, 1):
+                logDebug(f"n-gram index of {self._profile_name} is stale, rebuilding it.")
+                self._postings, self._last_ids, self._notes_mod, self._stale_count = {}, {}, 0, 0
+            n_updated = self._add_modified_notes(db)
+            if self._closing:
+                return
+            self._col_mod, self._note_count = col_mod, note_count
+            self._is_dirty = True
+            self._ready = True
+            logDebug(f"n-gram index of {self._profile_name}: updated {n_updated} notes, {len(self._postings)} n-grams.")
+        self._save_later(self.save)
+
+    def _add_modified_notes(self, db: AnyDB) -> int:
+        last_id, max_mod, n_updated = 0, self._notes_mod, 0
+        max_indexed_id = max(self._last_ids.values(), default=0)
+        # Notes that were indexed before and then modified. Their ids have to be put in the middle of the lists.
+        out_of_order: dict[str, list[int]] = defaultdict(list)
+        # Notes modified within the same second as the previous update are indexed again to not miss any of them.
+        while not self._closing and (
+            rows := db.all(
+                "SELECT id, mod, flds FROM notes WHERE mod >= ? AND id > ? ORDER BY id LIMIT ?",
+                self._notes_mod,
+                last_id,
+                SYNC_CHUNK_SIZE,
+            )
+        ):
+            for note_id, mod, flds in rows:
+                if note_id <= max_indexed_id:
+                    self._stale_count += 1
+                for gram in ngrams_of(flds):
+                    if note_id > (previous := self._last_ids.get(gram, 0)):
+                        self._postings.setdefault(gram, bytearray()).extend(encode_deltas((note_id,), previous))
+                        self._last_ids[gram] = note_id
+                    elif note_id < previous:
+                        out_of_order[gram].append(note_id)
+                max_mod = max(max_mod, mod)
+            last_id = rows[-1][0]
+            n_updated += len(rows)
+        for gram, note_ids in out_of_order.items():
+            merged = sorted(set(decode_deltas(self._postings[gram])).union(note_ids))
+            self._postings[gram] = encode_deltas(merged)
+        self._notes_mod = max_mod
+        return n_updated
+
+    def candidates(self, terms: Sequence[str]) -> array.array:
+        """
+        Return ids of notes that may contain all terms, in ascending order.
+        The notes still have to be checked against the terms.
+        """
+        with self._lock:
+            grams = set().union(*(query_ngrams(term) for term in terms))
+            if any(gram not in self._postings for gram in grams):
+                return array.array("q")
+            # Start with the shortest list. Other lists only narrow it down.
+            encoded = sorted((self._postings[gram] for gram in grams), key=len)
+        found = decode_deltas(encoded[0])
+        for posting in encoded[1:]:
+            other_ids = set(decode_deltas(posting))
+            found = array.array("q", (note_id for note_id in found if note_id in other_ids))
+            if not found:
+                break
+        return found
+
+    def close(self) -> None:
+        self._closing = True
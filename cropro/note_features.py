@@ -0,0 +1,329 @@
+# Copyright: Ajatt-Tools and contributors; https://github.com/Ajatt-Tools
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+
+import array
+import bisect
+import os
+import pickle
+import threading
+from collections.abc import Sequence
+
+from anki.models import NotetypeId
+from anki.notes import NoteId
+from anki.utils import field_checksum, html_to_text_line, split_fields
+
+from .ajt_common.media import find_images, find_sounds
+from .common import NOTE_FEATURES_DIR_PATH, sidecar_file_name
+from .config import config
+from .debug_log import LogDebug
+from .readonly_db import AnyDB
+
+try:
+    import numpy as np
+except ImportError:
+    # NumPy isn't available in every Anki build. Columns are processed in pure Python then.
+    np = None
+
+logDebug = LogDebug(config)
+
+# Bump when the meaning of the stored columns changes. Files written by other versions are rebuilt.
+FEATURES_VERSION = 1
+# How many notes are read from the other collection at once.
+SYNC_CHUNK_SIZE = 5_000
+# Sentence length of notes whose type doesn't have the sentence field. Such notes go last when sorted by length.
+NO_SENTENCE = 2**31 - 1
+# Bits of the media_flags column.
+HAS_AUDIO = 1
+HAS_IMAGE = 2
+
+# Column name -> array type code. Values of the n-th note are stored at the n-th position of each column.
+COLUMN_TYPES = {
+    "ids": "q",
+    "mods": "q",
+    "sentence_lengths": "i",
+    "media_flags": "B",
+    "sentence_checksums": "I",
+    "deck_ids": "q",
+}
+
+
+def features_file_path(profile_name: str, col_file_path: str) -> str:
+    return os.path.join(NOTE_FEATURES_DIR_PATH, f"{sidecar_file_name(profile_name, col_file_path)}.pickle")
+
+
+def empty_columns() -> dict[str, array.array]:
+    return {name: array.array(type_code) for name, type_code in COLUMN_TYPES.items()}
+
+
+def media_flags_of(flds: str) -> int:
+    return (HAS_AUDIO if find_sounds(flds) else 0) | (HAS_IMAGE if find_images(flds) else 0)
+
+
+class NoteFeatureStore:
+    """
+    Properties of the other collection's notes that are precomputed to sort and filter search results
+    without loading and parsing the notes: plain-text length and checksum of the sentence field,
+    whether the note has audio or images, and the deck of its first card.
+    Values are stored in compact arrays ordered by note id.
+    The store is updated incrementally by looking at the modification time of notes and cards,
+    and it's saved to a sidecar file so that it doesn't have to be rebuilt when the profile is opened again.
+    """
+
+    def __init__(self, profile_name: str, col_file_path: str, sentence_field_name: str) -> None:
+        self._profile_name = profile_name
+        self._file_path = features_file_path(profile_name, col_file_path)
+        self.sentence_field_name = sentence_field_name
+        self._lock = threading.Lock()
+        self._ready = False
+        self._closing = False
+        self._columns = empty_columns()
+        self._field_ords: dict[NotetypeId, int] = {}
+        self._col_mod = 0
+        self._notes_mod = 0
+        self._cards_mod = 0
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self._file_path, "rb") as f:
+                state = pickle.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError) as ex:
+            logDebug(f"can't read note features of {self._profile_name}: {ex}")
+            return
+        if state.get("version") != FEATURES_VERSION or state.get("sentence_field_name") != self.sentence_field_name:
+            return
+        self._columns = state["columns"]
+        self._field_ords = state["field_ords"]
+        self._col_mod = state["col_mod"]
+        self._notes_mod = state["notes_mod"]
+        self._cards_mod = state["cards_mod"]
+
+    def _save(self, col_mod: int, notes_mod: int, cards_mod: int) -> None:
+        os.makedirs(NOTE_FEATURES_DIR_PATH, exist_ok=True)
+        with open(tmp_file_path := f"{self._file_path}.tmp", "wb") as f:
+            pickle.dump(
+                {
+                    "version": FEATURES_VERSION,
+                    "sentence_field_name": self.sentence_field_name,
+                    "columns": self._columns,
+                    "field_ords": self._field_ords,
+                    "col_mod": col_mod,
+                    "notes_mod": notes_mod,
+                    "cards_mod": cards_mod,
+                },
+                f,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+        os.replace(tmp_file_path, self._file_path)
+
+    def is_ready(self) -> bool:
+        """
+        The store can answer queries once the initial build has finished.
+        """
+        return self._ready and not self._closing
+
+    def update(self, db: AnyDB) -> None:
+        """
+        Recompute features of new and modified notes and drop deleted ones.
+        Called in the background when the collection is opened and before each search that needs the features.
+        """
+        with self._lock:
+            if self._closing:
+                return
+            col_mod = db.scalar("SELECT mod FROM col")
+            if col_mod == self._col_mod:
+                self._ready = True
+                return
+            field_ords = {
+                NotetypeId(ntid): ord_
+                for ntid, ord_, name in db.all("SELECT ntid, ord, name FROM fields")
+                if name == self.sentence_field_name
+            }
+            if field_ords != self._field_ords:
+                # Note types have been changed. Every note has to be looked at again.
+                self._columns, self._field_ords, self._notes_mod, self._cards_mod = empty_columns(), field_ords, 0, 0
+            changed, notes_mod = self._read_modified_notes(db)
+            deck_ids, cards_mod = self._read_modified_decks(db)
+            if self._closing:
+                return
+            self._merge(changed, deck_ids, note_count=db.scalar("SELECT count() FROM notes"), db=db)
+            self._save(col_mod, notes_mod, cards_mod)
+            # The queries above can be cancelled by a newer search. Until everything has been read, merged and saved,
+            # the modification times stay where they were, so the next update looks at the same notes again.
+            self._col_mod, self._notes_mod, self._cards_mod = col_mod, notes_mod, cards_mod
+            self._ready = True
+            logDebug(
+                f"note features of {self._profile_name}: updated {len(changed)} notes, "
+                f"{len(deck_ids)} decks, {len(self._columns['ids'])} notes in total."
+            )
+
+    def _read_modified_notes(self, db: AnyDB) -> tuple[dict[NoteId, tuple[int, int, int, int]], int]:
+        """
+        Return the modification time, sentence length, media flags and sentence checksum of each modified note,
+        and the latest modification time of the notes.
+        """
+        changed: dict[NoteId, tuple[int, int, int, int]] = {}
+        last_id, max_mod = 0, self._notes_mod
+        # Notes modified within the same second as the previous update are looked at again to not miss any of them.
+        while not self._closing and (
+            rows := db.all(
+                "SELECT id, mod, mid, flds FROM notes WHERE mod >= ? AND id > ? ORDER BY id LIMIT ?",
+                self._notes_mod,
+                last_id,
+                SYNC_CHUNK_SIZE,
+            )
+        ):
+            for note_id, mod, mid, flds in rows:
+                if (ord_ := self._field_ords.get(mid)) is not None:
+                    sentence = html_to_text_line(split_fields(flds)[ord_])
+                    length, checksum = len(sentence), field_checksum(sentence)
+                else:
+                    length, checksum = NO_SENTENCE, 0
+                changed[NoteId(note_id)] = (mod, length, media_flags_of(flds), checksum)
+                max_mod = max(max_mod, mod)
+            last_id = rows[-1][0]
+        return changed, max_mod
+
+    def _read_modified_decks(self, db: AnyDB) -> tuple[dict[NoteId, int], int]:
+        """
+        Return the deck of the first card of each note whose cards have been modified,
+        and the latest modification time of the cards.
+        Cards in filtered decks are counted as being in their home deck.
+        """
+        deck_ids: dict[NoteId, int] = {}
+        max_mod = self._cards_mod
+        for note_id, deck_id, mod in db.all(
+            "SELECT nid, CASE WHEN odid != 0 THEN odid ELSE did END, mod FROM cards "
+            "WHERE nid IN (SELECT nid FROM cards WHERE mod >= ?) ORDER BY nid, ord DESC",
+            self._cards_mod,
+        ):
+            # Cards are ordered from the last to the first one, so the first card wins.
+            deck_ids[NoteId(note_id)] = deck_id
+            max_mod = max(max_mod, mod)
+        return deck_ids, max_mod
+
+    def _merge(
+        self,
+        changed: dict[NoteId, tuple[int, int, int, int]],
+        deck_ids: dict[NoteId, int],
+        note_count: int,
+        db: AnyDB,
+    ) -> None:
+        columns = self._columns
+        ids = columns["ids"]
+        added: list[tuple[NoteId, int, int, int, int, int]] = []
+        for note_id, (mod, length, flags, checksum) in changed.items():
+            if (pos := self._position(note_id)) >= 0:
+                columns["mods"][pos] = mod
+                columns["sentence_lengths"][pos] = length
+                columns["media_flags"][pos] = flags
+                columns["sentence_checksums"][pos] = checksum
+            else:
+                added.append((note_id, mod, length, flags, checksum, deck_ids.get(note_id, 0)))
+        for note_id, deck_id in deck_ids.items():
+            if (pos := self._position(note_id)) >= 0:
+                columns["deck_ids"][pos] = deck_id
+        if not added and len(ids) == note_count:
+            return
+        # Notes have been added or deleted. The columns are rebuilt to keep them ordered by note id.
+        rows = list(zip(*(columns[name] for name in COLUMN_TYPES)))
+        rows.extend(added)
+        if len(rows) != note_count:
+            existing = set(db.list("SELECT id FROM notes"))
+            rows = [row for row in rows if row[0] in existing]
+        rows.sort()
+        self._columns = {
+            name: array.array(type_code, values)
+            for (name, type_code), values in zip(COLUMN_TYPES.items(), zip(*rows) if rows else [()] * len(COLUMN_TYPES))
+        }
+
+    def _position(self, note_id: NoteId) -> int:
+        """
+        Position of the note in the columns, or -1 if the note is unknown.
+        """
+        ids = self._columns["ids"]
+        pos = bisect.bisect_left(ids, note_id)
+        return pos if pos < len(ids) and ids[pos] == note_id else -1
+
+    def sort_keys(
+        self,
+        note_ids: Sequence[NoteId],
+        column_names: Sequence[str],
+        ordered: bool = False,
+    ) -> list[tuple[tuple, NoteId]]:
+        """
+        Pair each note id with a sort key made of the note's values in the columns, sorted if ordered is true.
+        Unknown notes, e.g. notes added after the last update, get the largest keys.
+        """
+        with self._lock:
+            if np is not None:
+                return self._sort_keys_vectorized(note_ids, column_names, ordered)
+            columns = [self._columns[name] for name in column_names]
+            missing = tuple(NO_SENTENCE for _name in column_names)
+            positions = [self._position(note_id) for note_id in note_ids]
+            keyed_ids = [
+                (tuple(column[pos] for column in columns) if pos >= 0 else missing, note_id)
+                for pos, note_id in zip(positions, note_ids)
+            ]
+        if ordered:
+            keyed_ids.sort()
+        return keyed_ids
+
+    def _sort_keys_vectorized(
+        self,
+        note_ids: Sequence[NoteId],
+        column_names: Sequence[str],
+        ordered: bool,
+    ) -> list[tuple[tuple, NoteId]]:
+        query, _found, columns = self._gather(note_ids, column_names)
+        if ordered:
+            # lexsort orders by the last key first.
+            order = np.lexsort((query, *reversed(columns)))
+            query, columns = query[order], [column[order] for column in columns]
+        return list(zip(zip(*(column.tolist() for column in columns)), query.tolist()))
+
+    def filter_ids(self, note_ids: Sequence[NoteId], min_length: int = 0, max_length: int = 0) -> list[NoteId]:
+        """
+        Keep notes whose sentence length is within the bounds, preserving their order. 0 means no bound.
+        Notes without the sentence field are dropped.
+        Unknown notes are kept, so that notes added after the last update aren't lost.
+        """
+        max_length = max_length or NO_SENTENCE - 1
+        with self._lock:
+            if np is not None:
+                query, found, (lengths,) = self._gather(note_ids, ["sentence_lengths"])
+                return query[~found | ((lengths >= min_length) & (lengths <= max_length))].tolist()
+            lengths = self._columns["sentence_lengths"]
+            return [
+                note_id
+                for note_id in note_ids
+                if (pos := self._position(note_id)) < 0 or min_length <= lengths[pos] <= max_length
+            ]
+
+    def _gather(
+        self,
+        note_ids: Sequence[NoteId],
+        column_names: Sequence[str],
+    ) -> tuple["np.ndarray", "np.ndarray", list["np.ndarray"]]:
+        """
+        Return the note ids, a mask of notes known to the store and the notes' values in each column as NumPy arrays.
+        Values of unknown notes are set to NO_SENTENCE.
+        """
+        ids = np.frombuffer(self._columns["ids"], dtype=np.int64)
+        query = np.asarray(note_ids, dtype=np.int64)
+        positions = np.searchsorted(ids, query).clip(max=max(len(ids) - 1, 0))
+        found = ids[positions] == query if len(ids) else np.zeros(len(query), dtype=bool)
+        columns = [
+            (
+                np.where(found, np.frombuffer(column, dtype=column.typecode)[positions], NO_SENTENCE)
+                if len(ids)
+                else np.full(len(query), NO_SENTENCE, dtype=np.int64)
+            )
+            for column in (self._columns[name] for name in column_names)
+        ]
+        return query, found, columns
+
+    def close(self) -> None:
+        self._closing = True
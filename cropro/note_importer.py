@@ -2,31 +2,41 @@
 # License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
 
 import concurrent.futures
+import contextlib
 import dataclasses
 import enum
 import math
 import os.path
+import re
+import threading
+from collections import defaultdict
 from collections.abc import Iterable, MutableSequence, Sequence
 from copy import deepcopy
-from typing import NamedTuple, Optional
+from typing import NamedTuple, Optional, Union
 
 import requests
 from anki.cards import Card
 from anki.collection import AddNoteRequest, Collection, OpChanges
-from anki.consts import CARD_TYPE_REV
+from anki.consts import CARD_TYPE_REV, MODEL_CLOZE
 from anki.decks import DeckId
-from anki.models import NoteType
-from anki.notes import Note
-from anki.utils import join_fields
-from aqt import mw
-from aqt.qt import *
-
-from .collection_manager import NO_MODEL, NameId
-from .common import ADDON_NAME_SHORT
+from anki.models import NoteType, NotetypeId
+from anki.notes import Note, NoteFieldsCheckResult
+from anki.utils import field_checksum, join_fields, split_fields, strip_html_media
+
+from .collection_manager import NO_MODEL, LocalNote, NameId, escape_like
+from .common import ADDON_NAME_SHORT, mw
 from .config import config
+from .media_hash_index import media_hash_index, save_media_hash_indexes
+from .media_manifest import media_manifest
+from .media_transfer import is_normalized_file_name, transfer_file
 from .remote_search import CroProWebClientException, CroProWebSearchClient, RemoteNote
+from .search_results import to_chunks
 
 MAX_WORKERS = 5
+# How many file names are looked up by one query. SQLite limits the number of query parameters.
+REFERENCE_CHECK_CHUNK_SIZE = 500
+# Cloze deletions, e.g. {{c1::text}}.
+RE_CLOZE = re.compile(r"\{\{c\d+::")
 
 
 @enum.unique
@@ -71,16 +81,55 @@ def files_in_note(note: Note) -> Iterable[FileInfo]:
     Returns FileInfo for every file referenced by other_note.
     Skips missing files.
     """
+    manifest = media_manifest(note.col.media.dir())
     for file_ref in note.col.media.files_in_str(note.mid, join_fields(note.fields)):
-        if os.path.exists(file_path := os.path.join(note.col.media.dir(), file_ref)):
-            yield FileInfo(file_ref, str(file_path))
+        if file_path := manifest.path_of(file_ref):
+            yield FileInfo(file_ref, file_path)
+
+
+def renamed_on_conflict(file_name: str, sha1: str) -> str:
+    """
+    The name Anki gives to a file when the media folder already has a different file with the same name.
+    """
+    stem, ext = os.path.splitext(file_name)
+    return f"{stem}-{sha1}{ext}"
+
+
+def add_media_file(col: Collection, file: FileInfo) -> str:
+    """
+    Add the file to the collection's media folder and return its name there.
+    Files are compared by their hashes, which are remembered for both media folders.
+    If the folder already has the same file, under its own name or renamed on conflict, it isn't copied again.
+    If enabled, new files are linked to the other profile's media folder instead of being copied.
+    """
+    if not (sha1 := media_hash_index(os.path.dirname(file.path)).sha1_of(file.name)):
+        return _add_file_to_manifest(col, col.media.add_file(file.path))
+    target_hashes = media_hash_index(col.media.dir())
+    for file_name in (file.name, renamed_on_conflict(file.name, sha1)):
+        if (target_sha1 := target_hashes.sha1_of(file_name)) == sha1:
+            return file_name
+        if target_sha1 is None and config.link_media_files and is_normalized_file_name(file_name):
+            # Another thread may have added a file with this name in the meantime. Then Anki sorts it out.
+            with contextlib.suppress(FileExistsError):
+                transfer_file(file.path, os.path.join(col.media.dir(), file_name))
+                target_hashes.remember(file_name, sha1)
+                return _add_file_to_manifest(col, file_name)
+            break
+    new_filename = col.media.add_file(file.path)
+    target_hashes.remember(new_filename, sha1)
+    return _add_file_to_manifest(col, new_filename)
+
+
+def _add_file_to_manifest(col: Collection, file_name: str) -> str:
+    media_manifest(col.media.dir()).add(file_name)
+    return file_name
 
 
 def copy_media_files(new_note: Note, other_note: Note) -> None:
     assert new_note.id == 0, "This function expects a note that hasn't been added yet."
     # check if there are any media files referenced by other_note
     for file in files_in_note(other_note):
-        new_filename = new_note.col.media.add_file(file.path)
+        new_filename = add_media_file(new_note.col, file)
         # NOTE: this_col_filename may differ from original filename (name conflict, different contents),
         # in which case we need to update the note.
         if new_filename != file.name:
@@ -94,29 +143,107 @@ def remove_media_files(new_note: Note) -> None:
     But if the same file(s) are referenced by another note, they shouldn't be trashed.
     """
     assert new_note.col == mw.col.weakref()
-    new_note.col.media.trash_files(
-        [file.name for file in files_in_note(new_note) if not new_note.col.find_cards(file.name)]
-    )
+    file_names = [file.name for file in files_in_note(new_note)]
+    referenced = referenced_file_names(new_note.col, file_names)
+    unused = [file_name for file_name in file_names if file_name not in referenced]
+    new_note.col.media.trash_files(unused)
+    media_manifest(new_note.col.media.dir()).remove(unused)
+
+
+def referenced_file_names(col: Collection, file_names: Sequence[str]) -> set[str]:
+    """
+    Return the file names that are mentioned by notes of the collection.
+    All names are checked in one pass over the notes instead of a search per file.
+    Like Anki's search, letter case is ignored, so a file is kept if in doubt.
+    """
+    referenced: set[str] = set()
+    for chunk in to_chunks(file_names, REFERENCE_CHECK_CHUNK_SIZE):
+        condition = " OR ".join("flds LIKE ? ESCAPE '\\'" for _name in chunk)
+        patterns = [f"%{escape_like(name)}%" for name in chunk]
+        for flds in col.db.list(f"SELECT flds FROM notes WHERE {condition}", *patterns):
+            flds = flds.lower()
+            referenced.update(name for name in chunk if name.lower() in flds)
+    return referenced
+
+
+class DuplicateIndex:
+    """
+    Checksums of the first fields of notes in the collection, to find duplicates without a query per imported note.
+    Checksums of a note type are read with one query when the first note of that type is checked.
+    Notes that pass the check are remembered, so that duplicates within the imported batch are caught too.
+    Like Note.dupeOrEmpty(), notes are duplicates if they have the same type and first field, ignoring HTML,
+    and notes are rejected if their first field is empty or if their cloze deletions don't fit the note type.
+    """
+
+    def __init__(self, col: Collection) -> None:
+        self._col = col
+        self._lock = threading.Lock()
+        self._checksums: dict[NotetypeId, set[int]] = {}
+        # First fields of the notes that are being imported, by note type and checksum.
+        self._batch: dict[tuple[NotetypeId, int], set[str]] = defaultdict(set)
+
+    def is_duplicate_or_empty(self, note: Note) -> bool:
+        """
+        Return True if the note shouldn't be imported. Otherwise, remember it as a part of the batch.
+        Safe to call from several threads.
+        """
+        if not (first_field := strip_html_media(note.fields[0])).strip():
+            return True
+        if self._has_cloze_problem(note):
+            return True
+        # Anki computes the checksum of the first field the same way when it stores the note.
+        checksum = field_checksum(note.fields[0])
+        with self._lock:
+            if (checksums := self._checksums.get(note.mid)) is None:
+                checksums = self._checksums[note.mid] = set(
+                    self._col.db.list("SELECT csum FROM notes WHERE mid = ?", note.mid)
+                )
+            if first_field in (pending := self._batch[(note.mid, checksum)]):
+                return True
+            if checksum in checksums and self._is_in_collection(note.mid, checksum, first_field):
+                return True
+            pending.add(first_field)
+            return False
+
+    @staticmethod
+    def _has_cloze_problem(note: Note) -> bool:
+        """
+        Cloze notes need a cloze deletion, and other notes can't have any.
+        Only notes of cloze types are checked by Anki too, e.g. for cloze deletions in fields that cards don't show.
+        """
+        is_cloze = note.note_type()["type"] == MODEL_CLOZE
+        if is_cloze != any(RE_CLOZE.search(field) for field in note.fields):
+            return True
+        return is_cloze and note.fields_check() != NoteFieldsCheckResult.NORMAL
+
+    def _is_in_collection(self, mid: NotetypeId, checksum: int, first_field: str) -> bool:
+        """
+        Checksums may collide, so the first fields of the notes that share the checksum are compared.
+        """
+        return any(
+            strip_html_media(split_fields(flds)[0]) == first_field
+            for flds in self._col.db.list("SELECT flds FROM notes WHERE mid = ? AND csum = ?", mid, checksum)
+        )
 
 
 class NoteTypeUnavailable(RuntimeError):
     pass
 
 
-def get_matching_model(target_model: NameId, reference_model: Optional[NoteType]) -> NoteType:
+def get_matching_model(col: Collection, target_model: NameId, reference_model: Optional[NoteType]) -> NoteType:
     if target_model != NO_MODEL:
         # use existing note type (even if its name or fields are different)
-        return mw.col.models.get(target_model.id)
+        return col.models.get(target_model.id)
 
     if reference_model:
         # find a model in current profile that matches the name of model from other profile
         # create a new note type (clone) if needed.
-        matching_model = mw.col.models.by_name(reference_model.get("name"))
+        matching_model = col.models.by_name(reference_model.get("name"))
 
         if not matching_model or matching_model.keys() != reference_model.keys():
             matching_model = deepcopy(reference_model)
             matching_model["id"] = 0
-            mw.col.models.add(matching_model)
+            col.models.add(matching_model)
         return matching_model
 
     raise NoteTypeUnavailable()
@@ -128,7 +255,7 @@ def col_diff(this_col: Collection, other_col: Collection) -> int:
     due numbers which are relative to the collection's creation time need to be adjusted by it.
     Return difference as number of days.
     """
-    assert (this_col is mw.col) and (this_col is not other_col)
+    assert this_col is not other_col
     return math.ceil((other_col.crt - this_col.crt) / (60 * 60 * 24))
 
 
@@ -164,7 +291,7 @@ def download_media(new_note: Note, other_note: RemoteNote, web_client: CroProWeb
     assert new_note.id == 0, "This function expects a note that hasn't been added yet."
     for file in other_note.media_info():
         if file.is_valid_url() and file.field_name in new_note:
-            file.file_name = mw.col.media.write_data(
+            file.file_name = new_note.col.media.write_data(
                 desired_fname=file.file_name,
                 data=web_client.download_media(file.url),
             )
@@ -183,7 +310,7 @@ class NoteImporter:
     def import_notes(
         self,
         col: Collection,
-        notes: Sequence[Union[Note, RemoteNote]],
+        notes: Sequence[Union[Note, LocalNote, RemoteNote]],
         model: NameId,
         deck: NameId,
     ) -> OpChanges:
@@ -194,37 +321,48 @@ class NoteImporter:
 
         pos = col.add_custom_undo_entry(f"{ADDON_NAME_SHORT}: import {len(notes)} notes")
         requests: list[AddNoteRequest] = []
-
-        with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-            futures = [
-                executor.submit(
-                    self._construct_new_note,
-                    col=col,
-                    other_note=note,
-                    model=model,
-                    deck=deck,
-                )
-                for note in notes
-            ]
-
-            for future in concurrent.futures.as_completed(futures):
-                result: NoteCreateResult = future.result()
-                if result.status in (NoteCreateStatus.success, NoteCreateStatus.connection_error):
-                    requests.append(AddNoteRequest(note=result.note, deck_id=DeckId(deck.id)))
-                self._counter[result.status].append(result.note)
+        dupes = DuplicateIndex(col) if config.skip_duplicates else None
+
+        with contextlib.ExitStack() as stack:
+            # Notes found in all profiles at once come from different collections. Keep them open until the end.
+            for note in {note.profile_name: note for note in notes if isinstance(note, LocalNote)}.values():
+                stack.enter_context(note.pinned_collection())
+            with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+                futures = [
+                    executor.submit(
+                        self._construct_new_note,
+                        col=col,
+                        other_note=note,
+                        model=model,
+                        deck=deck,
+                        dupes=dupes,
+                    )
+                    for note in notes
+                ]
+
+                for future in concurrent.futures.as_completed(futures):
+                    result: NoteCreateResult = future.result()
+                    if result.status in (NoteCreateStatus.success, NoteCreateStatus.connection_error):
+                        requests.append(AddNoteRequest(note=result.note, deck_id=DeckId(deck.id)))
+                    self._counter[result.status].append(result.note)
 
         col.add_notes(requests)  # new notes have changed their ids
+        save_media_hash_indexes()
 
         return col.merge_undo_entries(pos)
 
     def _construct_new_note(
         self,
         col: Collection,
-        other_note: Union[Note, RemoteNote],
+        other_note: Union[Note, LocalNote, RemoteNote],
         model: NameId,
         deck: NameId,
+        dupes: Optional[DuplicateIndex] = None,
     ) -> NoteCreateResult:
-        matching_model = get_matching_model(model, other_note.note_type())
+        if isinstance(other_note, LocalNote):
+            # search results are read-only views. the full note is needed to copy media and tag it.
+            other_note = other_note.to_note()
+        matching_model = get_matching_model(col, model, other_note.note_type())
         new_note = Note(col, matching_model)
         new_note.note_type()["did"] = deck.id
 
@@ -238,7 +376,7 @@ class NoteImporter:
             new_note.tags = [tag for tag in other_note.tags if tag != "leech"]
 
         # check if note is dupe of existing one
-        if config.skip_duplicates and new_note.dupeOrEmpty():
+        if dupes is not None and dupes.is_duplicate_or_empty(new_note):
             return NoteCreateResult(new_note, NoteCreateStatus.dupe)
 
         if isinstance(other_note, RemoteNote):
@@ -0,0 +1,174 @@
+# Copyright: Ajatt-Tools and contributors; https://github.com/Ajatt-Tools
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+
+import contextlib
+import functools
+import os
+import pathlib
+import sqlite3
+import threading
+from collections.abc import Callable, Iterator
+from typing import Any, Optional, Union
+
+from anki.dbproxy import DBProxy
+from anki.utils import field_checksum, html_to_text_line, split_fields
+
+# The oldest schema that stores decks, note types and fields in separate tables.
+MIN_SCHEMA_VERSION = 15
+MIB = 1024 * 1024
+# How many SQLite virtual machine instructions are run between checks for cancellation.
+CANCEL_CHECK_INTERVAL = 10_000
+
+_cancel_checks = threading.local()
+
+
+@contextlib.contextmanager
+def cancellable(is_cancelled: Callable[[], bool]) -> Iterator[None]:
+    """
+    Abort queries run by the current thread inside the block as soon as is_cancelled() returns True.
+    Aborted queries raise sqlite3.OperationalError. Queries run by other threads aren't affected.
+    """
+    previous = getattr(_cancel_checks, "is_cancelled", None)
+    _cancel_checks.is_cancelled = is_cancelled
+    try:
+        yield
+    finally:
+        _cancel_checks.is_cancelled = previous
+
+
+def abort_if_cancelled() -> int:
+    """
+    SQLite progress handler. Runs on the thread that executes the query. Returning non-zero aborts the query.
+    """
+    is_cancelled = getattr(_cancel_checks, "is_cancelled", None)
+    return int(is_cancelled is not None and is_cancelled())
+
+
+def raise_if_cancelled() -> None:
+    """
+    Stop the search run by the current thread inside a cancellable() block if it has been cancelled.
+    Used before work that the progress handler can't interrupt, e.g. a search run by Anki's backend.
+    Raises the same error as an aborted query.
+    """
+    if abort_if_cancelled():
+        raise sqlite3.OperationalError("interrupted")
+
+
+def make_cancellable(con: sqlite3.Connection) -> None:
+    con.set_progress_handler(abort_if_cancelled, CANCEL_CHECK_INTERVAL)
+
+
+def unicase_collation(a: str, b: str) -> int:
+    """
+    Anki declares some columns with the "unicase" collation, which doesn't exist outside of Anki.
+    Case-insensitive comparison is a close enough replacement to read these tables.
+    """
+    a, b = a.casefold(), b.casefold()
+    return (a > b) - (a < b)
+
+
+def field_at_index(flds: str, idx: int) -> str:
+    """
+    Return the field at the index, or an empty string if the note has fewer fields.
+    Mirrors the SQL function with the same name that Anki registers on its own connections.
+    """
+    fields = split_fields(flds)
+    return fields[idx] if 0 <= idx < len(fields) else ""
+
+
+@functools.lru_cache(maxsize=256)
+def plain_text(field: str) -> str:
+    # The length and the checksum of a field are computed one after another, so the text is stripped once.
+    return html_to_text_line(field)
+
+
+def plain_text_length(field: str) -> int:
+    """
+    Length of the field's text without HTML, measured the same way as the note feature store measures sentences.
+    """
+    return len(plain_text(field))
+
+
+def plain_text_checksum(field: str) -> int:
+    """
+    Checksum of the field's text without HTML, computed the same way as the note feature store computes it.
+    """
+    return field_checksum(plain_text(field))
+
+
+def has_pending_wal(col_file_path: str) -> bool:
+    """
+    If the collection wasn't closed cleanly, some changes may still sit in the write-ahead log.
+    Such collections can't be opened as immutable.
+    """
+    try:
+        return os.path.getsize(f"{col_file_path}-wal") > 0
+    except OSError:
+        return False
+
+
+class ReadOnlyDB:
+    """
+    A query-only connection to a collection file that bypasses Anki's backend.
+    Mirrors the subset of DBProxy's interface used by the add-on.
+    """
+
+    def __init__(self, col_file_path: str, immutable: bool, cache_mb: int, mmap_mb: int) -> None:
+        self._col_file_path = col_file_path
+        self._cache_mb = cache_mb
+        self._mmap_mb = mmap_mb
+        self._lock = threading.Lock()
+        self._con = self._connect(immutable)
+
+    def _connect(self, immutable: bool) -> sqlite3.Connection:
+        uri = pathlib.Path(self._col_file_path).as_uri() + "?mode=ro"
+        if immutable and not has_pending_wal(self._col_file_path):
+            uri += "&immutable=1"
+        con = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        con.create_collation("unicase", unicase_collation)
+        con.create_function("field_at_index", 2, field_at_index, deterministic=True)
+        con.create_function("plain_text_length", 1, plain_text_length, deterministic=True)
+        con.create_function("plain_text_checksum", 1, plain_text_checksum, deterministic=True)
+        make_cancellable(con)
+        con.execute("PRAGMA query_only = ON")
+        con.execute(f"PRAGMA cache_size = {-int(self._cache_mb) * 1024}")
+        con.execute(f"PRAGMA mmap_size = {int(self._mmap_mb) * MIB}")
+        return con
+
+    def reopen(self, immutable: bool) -> None:
+        """
+        Replace the connection, e.g. before the file is written to, because an immutable connection
+        may return wrong results or report corruption once the file changes.
+        Queries that are running finish first. Later queries go through the new connection.
+        """
+        con = self._connect(immutable)
+        with self._lock:
+            self._con, old_con = con, self._con
+            old_con.close()
+
+    def all(self, sql: str, *args: Any) -> list[list]:
+        with self._lock:
+            return [list(row) for row in self._con.execute(sql, args)]
+
+    def list(self, sql: str, *args: Any) -> list:
+        with self._lock:
+            return [row[0] for row in self._con.execute(sql, args)]
+
+    def first(self, sql: str, *args: Any) -> Optional[list]:
+        with self._lock:
+            row = self._con.execute(sql, args).fetchone()
+        return list(row) if row is not None else None
+
+    def scalar(self, sql: str, *args: Any) -> Any:
+        row = self.first(sql, *args)
+        return row[0] if row is not None else None
+
+    def schema_version(self) -> int:
+        return self.scalar("SELECT ver FROM col")
+
+    def close(self) -> None:
+        with self._lock:
+            self._con.close()
+
+
+AnyDB = Union[DBProxy, ReadOnlyDB]
@@ -3,6 +3,7 @@
 
 import dataclasses
 import enum
+import threading
 import typing
 from collections.abc import Iterable, Sequence
 from typing import Optional, TypedDict
@@ -194,6 +195,9 @@ class CroProWebSearchClient:
         self._client = anki.httpclient.HttpClient()
         self._config = config
         self._log = LogDebug(config)
+        # Responses of searches that are still being downloaded.
+        self._search_responses: set[requests.Response] = set()
+        self._lock = threading.Lock()
         self._set_proxies()
 
     def _set_proxies(self) -> None:
@@ -226,9 +230,25 @@ class CroProWebSearchClient:
     def search_notes(self, search_args: CroProWebSearchArgs) -> Sequence[RemoteNote]:
         if not search_args:
             return []
+        resp = self._get(get_request_url(search_args))
+        with self._lock:
+            self._search_responses.add(resp)
         try:
-            resp_json = self._get(get_request_url(search_args)).json()
+            resp_json = resp.json()
         except requests.RequestException as ex:
             raise CroProWebClientException(ex.response) from ex
+        finally:
+            with self._lock:
+                self._search_responses.discard(resp)
         examples = [item for item in resp_json["examples"]]
         return [RemoteNote.from_json(example, self._config) for example in examples]
+
+    def cancel_searches(self) -> None:
+        """
+        Close connections of searches that are still receiving results. Their results are no longer needed.
+        """
+        with self._lock:
+            responses = list(self._search_responses)
+        for resp in responses:
+            self._log("closing the connection of a cancelled search")
+            resp.close()
@@ -0,0 +1,89 @@
+# Copyright: Ajatt-Tools and contributors; https://github.com/Ajatt-Tools
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+
+import array
+import threading
+from collections.abc import Sequence
+from typing import NamedTuple, Optional
+
+from anki.notes import NoteId
+
+from .config import config
+from .debug_log import LogDebug
+
+logDebug = LogDebug(config)
+
+MIB = 1024 * 1024
+
+
+class SearchCacheKey(NamedTuple):
+    profile_name: str
+    deck_id: int
+    search_text: str
+    # Describes the sort method and its settings.
+    sort_key: str
+    # Describes filters applied to the found notes.
+    filters: str
+
+
+class SearchCacheEntry(NamedTuple):
+    col_mod: int
+    note_ids: array.array
+
+    def size_bytes(self) -> int:
+        return self.note_ids.itemsize * len(self.note_ids)
+
+
+class SearchResultCache:
+    """
+    Remembers ids of notes found by recent searches.
+    An entry is valid as long as the other collection hasn't been modified.
+    The least recently used entries are dropped when the cache exceeds its size limit.
+    """
+
+    def __init__(self) -> None:
+        # Ordered from the least to the most recently used.
+        self._entries: dict[SearchCacheKey, SearchCacheEntry] = {}
+        self._size_bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: SearchCacheKey, col_mod: int) -> Optional[Sequence[NoteId]]:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None and entry.col_mod == col_mod:
+                self._entries[key] = entry
+                self._hits += 1
+                self._log_stats("hit")
+                return entry.note_ids
+            if entry is not None:
+                # The collection has been modified since the search was cached.
+                self._size_bytes -= entry.size_bytes()
+            self._misses += 1
+            self._log_stats("miss")
+            return None
+
+    def put(self, key: SearchCacheKey, col_mod: int, note_ids: Sequence[NoteId]) -> None:
+        entry = SearchCacheEntry(col_mod, array.array("q", note_ids))
+        max_size_bytes = config.search_cache_mb * MIB
+        if max_size_bytes <= 0 or entry.size_bytes() > max_size_bytes:
+            return
+        with self._lock:
+            if old_entry := self._entries.pop(key, None):
+                self._size_bytes -= old_entry.size_bytes()
+            self._entries[key] = entry
+            self._size_bytes += entry.size_bytes()
+            while self._size_bytes > max_size_bytes:
+                self._size_bytes -= self._entries.pop(next(iter(self._entries))).size_bytes()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size_bytes = 0
+
+    def _log_stats(self, event: str) -> None:
+        logDebug(
+            f"search cache {event}: {self._hits} hits, {self._misses} misses, "
+            f"{len(self._entries)} entries, {self._size_bytes / MIB:.2f} MiB."
+        )
@@ -0,0 +1,359 @@
+# Copyright: Ajatt-Tools and contributors; https://github.com/Ajatt-Tools
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+
+import os
+import re
+import sqlite3
+import string
+import threading
+from collections.abc import Sequence
+from typing import Optional, Union
+
+from anki.notes import NoteId
+from anki.utils import html_to_text_line, split_fields
+
+from .common import SEARCH_INDEX_DIR_PATH, sidecar_file_name
+from .config import config
+from .debug_log import LogDebug
+from .readonly_db import AnyDB, make_cancellable
+
+logDebug = LogDebug(config)
+
+# Bump when the layout of the index changes. Indexes of other versions are rebuilt.
+INDEX_VERSION = 2
+# How many notes are read from the other collection and written to the index at once.
+SYNC_CHUNK_SIZE = 5_000
+# The trigram tokenizer can't match anything shorter than this.
+MIN_TERM_LEN = 3
+# Characters and keywords that carry a special meaning in Anki's search syntax.
+RE_ANKI_SYNTAX = re.compile(r'[:"*_()\\]|^-|\s-|(?:^|\s)(?:or|and)(?:\s|$)', flags=re.IGNORECASE)
+# A search that consists of a single regular expression, e.g. re:食べ(る|た) or "re:a b".
+RE_REGEX_SEARCH = re.compile(r'^(?:re:([^\s"]+)|"re:((?:[^"\\]|\\.)*)")$')
+# Characters that make the preceding atom optional.
+REGEX_OPTIONAL_QUANTIFIERS = "?*{"
+# Escapes followed by the hex code of a character, and the number of digits they take, e.g. \x41 or \u98df.
+REGEX_HEX_ESCAPE_DIGITS = {"x": 2, "u": 4, "U": 8}
+# Digits that may follow the first digit of a backreference or an octal escape, e.g. \12 or \012.
+REGEX_MAX_EXTRA_DIGITS = 2
+
+
+def is_fts_trigram_available() -> bool:
+    """
+    The trigram tokenizer was added in SQLite 3.34.0.
+    Older builds of Python may come with an older SQLite or without FTS5 at all.
+    """
+    try:
+        with sqlite3.connect(":memory:") as con:
+            con.execute("CREATE VIRTUAL TABLE probe USING fts5(content, tokenize='trigram')")
+    except sqlite3.OperationalError:
+        return False
+    return True
+
+
+def plain_search_terms(search_text: str) -> Optional[list[str]]:
+    """
+    Split the search text into plain substrings if the text doesn't use Anki's search syntax.
+    Return None if the query has to be handled by Anki.
+    """
+    if RE_ANKI_SYNTAX.search(search_text):
+        return None
+    return search_text.split() or None
+
+
+def regex_search_pattern(search_text: str) -> Optional[str]:
+    """
+    Return the regular expression if the search text is a single "re:" search, otherwise None.
+    """
+    if match := RE_REGEX_SEARCH.match(search_text.strip()):
+        return match.group(1) if match.group(1) is not None else match.group(2).replace('\\"', '"')
+    return None
+
+
+def escape_end(pattern: str, escaped: str, pos: int) -> int:
+    """
+    Return the position where an escape ends. `escaped` is the character after the backslash, found right before pos.
+    The digits or the name that follow escapes like \\x41, \\u98df, \\N{DIGIT ONE}, \\0 or \\12 aren't literal text.
+    Taking a digit too many is harmless, while taking one too few would make it look like a literal.
+    """
+    if escaped == "N" and pattern[pos : pos + 1] == "{":
+        return pattern.find("}", pos) + 1 or len(pattern)
+    if escaped.isdigit():
+        max_digits, digits = REGEX_MAX_EXTRA_DIGITS, string.digits
+    elif escaped in REGEX_HEX_ESCAPE_DIGITS:
+        max_digits, digits = REGEX_HEX_ESCAPE_DIGITS[escaped], string.hexdigits
+    else:
+        return pos
+    end = pos
+    while end < min(len(pattern), pos + max_digits) and pattern[end] in digits:
+        end += 1
+    return end
+
+
+def required_literals(pattern: str) -> list[str]:
+    """
+    Return substrings that every text matching the regular expression must contain.
+    Only literal text outside of groups and character classes is considered,
+    and patterns with alternatives outside of groups have no required literals.
+    """
+    runs: list[str] = []
+    run: list[str] = []
+    last_is_literal = False
+    depth = pos = 0
+
+    def end_run() -> None:
+        nonlocal run
+        runs.append("".join(run))
+        run = []
+
+    while pos < len(pattern):
+        char = pattern[pos]
+        pos += 1
+        if char == "\\":
+            escaped, pos = pattern[pos : pos + 1], pos + 1
+            # Escaped punctuation and non-ASCII characters match themselves.
+            if depth == 0 and escaped and not (escaped.isascii() and escaped.isalnum()):
+                run.append(escaped)
+                last_is_literal = True
+                continue
+            # A class like \d, an anchor like \b, a backreference, or a character given by its code.
+            pos = escape_end(pattern, escaped, pos)
+            end_run()
+        elif char == "[":
+            # Skip the character class. A closing bracket right after the opening one is a literal.
+            pos += pattern[pos : pos + 1] == "^"
+            pos += pattern[pos : pos + 1] == "]"
+            while pos < len(pattern) and pattern[pos] != "]":
+                pos += 2 if pattern[pos] == "\\" else 1
+            pos += 1
+            end_run()
+        elif char == "(":
+            depth += 1
+            end_run()
+        elif char == ")":
+            depth -= 1
+            end_run()
+        elif char == "|" and depth == 0:
+            return []
+        elif char in REGEX_OPTIONAL_QUANTIFIERS:
+            if last_is_literal and run:
+                run.pop()
+            if char == "{":
+                pos = pattern.find("}", pos) + 1 or len(pattern)
+            end_run()
+        elif char == "+" or char in ".^$":
+            end_run()
+        elif depth == 0:
+            run.append(char)
+            last_is_literal = True
+            continue
+        last_is_literal = False
+    end_run()
+    return [run for run in runs if run]
+
+
+def to_match_expr(terms: Sequence[str], column: Optional[str] = "flds") -> str:
+    """
+    Quote each term so that FTS5 treats it as a substring to match.
+    Terms separated by spaces are implicitly joined with AND, like in Anki.
+    Only the given column is searched, or all columns if it's None.
+    """
+    expr = " ".join('"{}"'.format(term.replace('"', '""')) for term in terms)
+    return f"{{{column}}} : ({expr})" if column else expr
+
+
+def index_file_path(profile_name: str, col_file_path: str) -> str:
+    return os.path.join(SEARCH_INDEX_DIR_PATH, f"{sidecar_file_name(profile_name, col_file_path)}.sqlite")
+
+
+class NoteSearchIndex:
+    """
+    A full-text index of the other collection's notes stored in a sidecar SQLite file.
+    Besides all fields of the note, the plain text of the sentence field is indexed to rank notes by relevance.
+    The index is updated incrementally by looking at the modification time of notes.
+    """
+
+    def __init__(self, profile_name: str, col_file_path: str) -> None:
+        self._profile_name = profile_name
+        self._lock = threading.Lock()
+        self._ready = False
+        self._closing = False
+        os.makedirs(SEARCH_INDEX_DIR_PATH, exist_ok=True)
+        self._con = sqlite3.connect(index_file_path(profile_name, col_file_path), check_same_thread=False)
+        make_cancellable(self._con)
+        self._create_tables()
+
+    def _create_tables(self) -> None:
+        with self._con:
+            self._con.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value NOT NULL)")
+            if self._get_meta("version") != INDEX_VERSION:
+                self._con.execute("DROP TABLE IF EXISTS notes_fts")
+                self._con.execute("DELETE FROM meta")
+                self._set_meta("version", INDEX_VERSION)
+            self._con.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(flds, sentence, tokenize='trigram')"
+            )
+
+    def _get_meta(self, key: str, default: Union[int, str] = 0) -> Union[int, str]:
+        row = self._con.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, key: str, value: Union[int, str]) -> None:
+        self._con.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    @staticmethod
+    def can_search(terms: Sequence[str]) -> bool:
+        return all(len(term) >= MIN_TERM_LEN for term in terms)
+
+    def is_ready(self) -> bool:
+        """
+        The index can answer queries once the initial build has finished.
+        """
+        return self._ready and not self._closing
+
+    def update(self, db: AnyDB) -> None:
+        """
+        Add new and modified notes to the index and remove deleted ones.
+        Called in the background when the collection is opened and before each search.
+        """
+        with self._lock:
+            if self._closing:
+                return
+            col_mod = db.scalar("SELECT mod FROM col")
+            sentence_ords = {
+                ntid: ord_
+                for ntid, ord_, name in db.all("SELECT ntid, ord, name FROM fields")
+                if name == config.sentence_field_name
+            }
+            sentence_field = f"{config.sentence_field_name}:{sorted(sentence_ords.items())}"
+            if sentence_field != self._get_meta("sentence_field", ""):
+                # The sentence field has been changed. Every note has to be indexed again.
+                with self._con:
+                    self._con.execute("DELETE FROM notes_fts")
+                    self._set_meta("notes_mod", 0)
+                    self._set_meta("sentence_field", sentence_field)
+            elif col_mod == self._get_meta("col_mod"):
+                self._ready = True
+                return
+            self._add_modified_notes(db, sentence_ords)
+            self._remove_deleted_notes(db)
+            with self._con:
+                self._set_meta("col_mod", col_mod)
+            self._ready = True
+
+    def _add_modified_notes(self, db: AnyDB, sentence_ords: dict[int, int]) -> None:
+        last_mod = self._get_meta("notes_mod")
+        last_id, max_mod, n_updated = 0, last_mod, 0
+        # Notes modified within the same second as the previous update are re-indexed to not miss any of them.
+        while not self._closing and (
+            rows := db.all(
+                "SELECT id, mod, mid, flds FROM notes WHERE mod >= ? AND id > ? ORDER BY id LIMIT ?",
+                last_mod,
+                last_id,
+                SYNC_CHUNK_SIZE,
+            )
+        ):
+            with self._con:
+                self._con.executemany("DELETE FROM notes_fts WHERE rowid = ?", ((row[0],) for row in rows))
+                self._con.executemany(
+                    "INSERT INTO notes_fts (rowid, flds, sentence) VALUES (?, ?, ?)",
+                    (
+                        (
+                            note_id,
+                            flds,
+                            html_to_text_line(split_fields(flds)[sentence_ords[mid]]) if mid in sentence_ords else "",
+                        )
+                        for note_id, _mod, mid, flds in rows
+                    ),
+                )
+            last_id = rows[-1][0]
+            max_mod = max(max_mod, *(row[1] for row in rows))
+            n_updated += len(rows)
+        if self._closing:
+            return
+        with self._con:
+            self._set_meta("notes_mod", max_mod)
+        logDebug(f"search index of {self._profile_name}: updated {n_updated} notes.")
+
+    def _remove_deleted_notes(self, db: AnyDB) -> None:
+        if self._closing:
+            return
+        indexed_count = self._con.execute("SELECT count() FROM notes_fts").fetchone()[0]
+        if indexed_count == db.scalar("SELECT count() FROM notes"):
+            return
+        deleted = {row[0] for row in self._con.execute("SELECT rowid FROM notes_fts")}
+        deleted.difference_update(db.list("SELECT id FROM notes"))
+        with self._con:
+            self._con.executemany("DELETE FROM notes_fts WHERE rowid = ?", ((note_id,) for note_id in deleted))
+        logDebug(f"search index of {self._profile_name}: removed {len(deleted)} notes.")
+
+    def search(self, terms: Sequence[str], after_id: int = 0, limit: int = -1) -> Sequence[NoteId]:
+        """
+        Return ids of notes that contain all terms, in ascending order.
+        A large result set can be read in batches by passing the last id of the previous batch.
+        """
+        with self._lock:
+            return [
+                NoteId(row[0])
+                for row in self._con.execute(
+                    "SELECT rowid FROM notes_fts WHERE notes_fts MATCH ? AND rowid > ? ORDER BY rowid LIMIT ?",
+                    (to_match_expr(terms), after_id, limit),
+                )
+            ]
+
+    def search_any(self, term_lists: Sequence[Sequence[str]]) -> Sequence[NoteId]:
+        """
+        Return ids of notes that contain all terms of at least one of the lists, in ascending order.
+        Answers many searches with one query, e.g. the terms of a word list.
+        """
+        with self._lock:
+            return [
+                NoteId(row[0])
+                for row in self._con.execute(
+                    "SELECT rowid FROM notes_fts WHERE notes_fts MATCH ? ORDER BY rowid",
+                    (" OR ".join(to_match_expr(terms) for terms in term_lists),),
+                )
+            ]
+
+    def relevance_keys(
+        self,
+        terms: Sequence[str],
+        note_ids: Sequence[NoteId],
+        prefer_short: bool = False,
+        offset: int = 0,
+        limit: int = -1,
+    ) -> list[tuple[tuple, NoteId]]:
+        """
+        Return the notes that contain the terms, best first, paired with keys made of their BM25 scores.
+        Only the given notes are scored, and only `limit` notes after the first `offset` ones are returned.
+        Notes that the index doesn't have are left out. Lower keys are more relevant.
+        Only the sentence field is scored, so notes that contain the terms in other fields go last.
+        If prefer_short is true, the score is further divided by the sentence length relative to the average
+        of the given notes, so that of two equally relevant sentences the shorter one goes first.
+        """
+        with self._lock, self._con:
+            self._con.execute("CREATE TEMP TABLE IF NOT EXISTS candidates (id INTEGER PRIMARY KEY)")
+            self._con.execute("DELETE FROM temp.candidates")
+            self._con.executemany(
+                "INSERT OR IGNORE INTO temp.candidates (id) VALUES (?)", ((note_id,) for note_id in note_ids)
+            )
+            score_expr = "bm25(notes_fts, 0.0, 1.0)"
+            args: list[Union[str, float, int]] = [to_match_expr(terms, column=None)]
+            if prefer_short:
+                avg_length = self._con.execute(
+                    "SELECT avg(length(sentence)) FROM notes_fts WHERE rowid IN temp.candidates"
+                ).fetchone()[0]
+                score_expr = f"{score_expr} / (1 + length(sentence) / ?)"
+                args.insert(0, avg_length or 1)
+            return [
+                ((score,), NoteId(rowid))
+                for rowid, score in self._con.execute(
+                    f"SELECT rowid, {score_expr} AS score FROM notes_fts "
+                    "WHERE notes_fts MATCH ? AND rowid IN temp.candidates ORDER BY score, rowid LIMIT ? OFFSET ?",
+                    (*args, limit, offset),
+                )
+            ]
+
+    def close(self) -> None:
+        self._closing = True
+        with self._lock:
+            self._con.close()
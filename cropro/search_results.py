@@ -0,0 +1,340 @@
+# Copyright: Ajatt-Tools and contributors; https://github.com/Ajatt-Tools
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+
+import abc
+import heapq
+import math
+import threading
+from collections.abc import Callable, Iterable, Sequence
+from itertools import islice
+from typing import Any, Optional, Union
+
+from anki.notes import Note, NoteId
+
+from .collection_manager import LocalNote, NoteRef
+from .remote_search import RemoteNote
+
+AnyNote = Union[Note, LocalNote, RemoteNote]
+# Results of a search in one collection are note ids. Results of a search in all profiles are note refs.
+NoteKey = Union[NoteId, NoteRef]
+NoteLoader = Callable[[Sequence[NoteKey]], Sequence[LocalNote]]
+
+
+def to_chunks(iterable: Iterable, chunk_size: int) -> Iterable[Sequence]:
+    # batched('ABCDEFG', 3) → ABC DEF G
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least one")
+    iterator = iter(iterable)
+    while batch := tuple(islice(iterator, chunk_size)):
+        yield batch
+
+
+class SearchResults(abc.ABC):
+    """
+    Notes found by a search, split into pages.
+    """
+
+    def __init__(self, notes_per_page: int) -> None:
+        if notes_per_page < 1:
+            raise ValueError("notes_per_page must be at least one")
+        self._notes_per_page = notes_per_page
+
+    @abc.abstractmethod
+    def __len__(self) -> int:
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def page(self, page_num: int) -> Sequence[AnyNote]:
+        """
+        Return notes on the page. Pages are counted from 0.
+        """
+        raise NotImplementedError()
+
+    def prefetch(self, page_num: int) -> None:
+        """
+        Prepare the page so that it can be shown without delay. Safe to call from a background thread.
+        """
+        pass
+
+    def is_complete(self) -> bool:
+        """
+        False while the search is still running and more notes may be added.
+        """
+        return True
+
+    def page_labels(self, page_num: int) -> Optional[Sequence[str]]:
+        """
+        Labels shown in front of the notes on the page, one per note, or None if the notes aren't labeled.
+        Call after the page has been loaded.
+        """
+        return None
+
+    def page_count(self) -> int:
+        return math.ceil(len(self) / self._notes_per_page)
+
+    def _page_bounds(self, page_num: int) -> slice:
+        start = page_num * self._notes_per_page
+        return slice(start, start + self._notes_per_page)
+
+
+class LoadedSearchResults(SearchResults):
+    """
+    Search results that are already in memory, e.g. notes received from the web.
+    """
+
+    def __init__(self, notes: Sequence[AnyNote], notes_per_page: int) -> None:
+        super().__init__(notes_per_page)
+        self._notes = notes
+
+    def __len__(self) -> int:
+        return len(self._notes)
+
+    def page(self, page_num: int) -> Sequence[AnyNote]:
+        return self._notes[self._page_bounds(page_num)]
+
+
+class LazySearchResults(SearchResults):
+    """
+    Search results that keep only note ids in memory.
+    Notes are loaded when their page is requested.
+    Only the most recently requested pages are kept, so memory usage doesn't depend on the number of results.
+    More results can be appended while the search is still running.
+    """
+
+    _max_cached_pages = 3
+
+    def __init__(
+        self,
+        note_ids: Sequence[NoteKey],
+        loader: NoteLoader,
+        notes_per_page: int,
+        is_complete: bool = True,
+    ) -> None:
+        super().__init__(notes_per_page)
+        self._is_complete = is_complete
+        self._note_ids = note_ids
+        # The initial sequence may be shared, e.g. with the search cache. It's copied before it's modified.
+        self._owns_note_ids = False
+        self._loader = loader
+        self._pages: dict[int, Sequence[LocalNote]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._note_ids)
+
+    @property
+    def note_ids(self) -> Sequence[NoteKey]:
+        return self._note_ids
+
+    def is_complete(self) -> bool:
+        return self._is_complete
+
+    def cacheable_note_ids(self) -> Optional[Sequence[NoteKey]]:
+        """
+        All found note ids in their final order, or None if they aren't known yet.
+        """
+        return self._note_ids if self._is_complete else None
+
+    def finish(self) -> None:
+        """
+        Called when the search has completed and no more notes will be added.
+        """
+        self._is_complete = True
+
+    def extend(self, note_ids: Sequence[NoteKey]) -> None:
+        with self._lock:
+            if self._note_ids and (last_page_num := (len(self._note_ids) - 1) // self._notes_per_page) in self._pages:
+                # The last page may have been loaded before it was full.
+                del self._pages[last_page_num]
+            if not self._owns_note_ids:
+                self._note_ids, self._owns_note_ids = list(self._note_ids), True
+            self._note_ids.extend(note_ids)
+
+    def page(self, page_num: int) -> Sequence[LocalNote]:
+        with self._lock:
+            try:
+                # move the page to the end to mark it as recently used.
+                notes = self._pages[page_num] = self._pages.pop(page_num)
+            except KeyError:
+                notes = self._pages[page_num] = self._loader(self._note_ids[self._page_bounds(page_num)])
+            while len(self._pages) > self._max_cached_pages:
+                del self._pages[next(iter(self._pages))]
+            return notes
+
+    def prefetch(self, page_num: int) -> None:
+        if 0 <= page_num < self.page_count():
+            self.page(page_num)
+
+
+class LazilySortedSearchResults(LazySearchResults, abc.ABC):
+    """
+    Search results that are put in order only as far as the user has looked.
+    """
+
+    def extend(self, note_ids: Sequence[NoteKey]) -> None:
+        raise NotImplementedError("sorted results can't be extended")
+
+    @abc.abstractmethod
+    def sorted_note_ids(self) -> list[NoteKey]:
+        """
+        All found note ids in their final order, computed without changing the results,
+        so that it's safe to call from a background thread while the user flips pages.
+        """
+        raise NotImplementedError()
+
+
+class PartiallySortedSearchResults(LazilySortedSearchResults):
+    """
+    Search results that are sorted only as far as the user has looked.
+    Found notes are kept in a heap ordered by their sort keys.
+    Notes for the first pages are taken from the heap right away, later pages are sorted when they're requested.
+    Finding the first k of n notes takes O(n + k log n) time instead of O(n log n) for a full sort.
+    """
+
+    def __init__(
+        self,
+        keyed_ids: list[tuple[Any, NoteKey]],
+        loader: NoteLoader,
+        notes_per_page: int,
+        presorted_pages: int,
+    ) -> None:
+        super().__init__(note_ids=[], loader=loader, notes_per_page=notes_per_page)
+        heapq.heapify(keyed_ids)
+        self._heap = keyed_ids
+        self._total = len(keyed_ids)
+        self._sort_up_to(presorted_pages * notes_per_page)
+
+    def __len__(self) -> int:
+        return self._total
+
+    def is_fully_sorted(self) -> bool:
+        return not self._heap
+
+    def cacheable_note_ids(self) -> Optional[Sequence[NoteKey]]:
+        return self._note_ids if self.is_fully_sorted() else None
+
+    def sorted_note_ids(self) -> list[NoteKey]:
+        # The notes that haven't been sorted yet are sorted on a copy.
+        with self._lock:
+            note_ids, heap = list(self._note_ids), list(self._heap)
+        heap.sort()
+        return [*note_ids, *(note_key for _key, note_key in heap)]
+
+    def page(self, page_num: int) -> Sequence[LocalNote]:
+        with self._lock:
+            self._sort_up_to(self._page_bounds(page_num).stop)
+        return super().page(page_num)
+
+    def _sort_up_to(self, count: int) -> None:
+        while len(self._note_ids) < count and self._heap:
+            self._note_ids.append(heapq.heappop(self._heap)[1])
+
+
+# Returns up to `limit` of the best notes that come after the first `offset` ones, or None if they can't be ranked.
+NoteRanker = Callable[[int, int], Optional[Sequence[tuple[Any, NoteKey]]]]
+
+
+class RankedSearchResults(LazilySortedSearchResults):
+    """
+    Search results that are ranked only as far as the user has looked, e.g. by relevance to the search text.
+    Ranking is done by asking for the next best notes, so notes past the shown pages are never scored.
+    Notes for the first pages are ranked right away, later pages are ranked when they're requested.
+    Found notes that the ranking leaves out go last.
+    """
+
+    def __init__(
+        self,
+        note_ids: Sequence[NoteKey],
+        rank: NoteRanker,
+        loader: NoteLoader,
+        notes_per_page: int,
+        presorted_pages: int,
+    ) -> None:
+        super().__init__(note_ids=[], loader=loader, notes_per_page=notes_per_page)
+        self._found = note_ids
+        self._rank = rank
+        self._is_fully_ranked = False
+        self._rank_up_to(presorted_pages * notes_per_page)
+
+    def __len__(self) -> int:
+        return len(self._found)
+
+    def cacheable_note_ids(self) -> Optional[Sequence[NoteKey]]:
+        return self._note_ids if self._is_fully_ranked else None
+
+    def sorted_note_ids(self) -> list[NoteKey]:
+        with self._lock:
+            note_ids = list(self._note_ids)
+            if self._is_fully_ranked:
+                return note_ids
+        note_ids.extend(note_key for _key, note_key in self._rank(len(note_ids), -1) or [])
+        return self._with_unranked(note_ids)
+
+    def page(self, page_num: int) -> Sequence[LocalNote]:
+        with self._lock:
+            self._rank_up_to(self._page_bounds(page_num).stop)
+        return super().page(page_num)
+
+    def _rank_up_to(self, count: int) -> None:
+        if self._is_fully_ranked or len(self._note_ids) >= count:
+            return
+        limit = count - len(self._note_ids)
+        ranked = self._rank(len(self._note_ids), limit) or []
+        self._note_ids.extend(note_key for _key, note_key in ranked)
+        if len(ranked) < limit:
+            self._note_ids = self._with_unranked(self._note_ids)
+            self._is_fully_ranked = True
+
+    def _with_unranked(self, note_ids: list[NoteKey]) -> list[NoteKey]:
+        ranked = set(note_ids)
+        return [*note_ids, *(note_key for note_key in self._found if note_key not in ranked)]
+
+
+class GroupedSearchResults(LazySearchResults):
+    """
+    Search results that are made of several groups, e.g. the notes found for each term of a word list.
+    Groups are shown one after another, and each note is labeled with the name of its group.
+    The same note may belong to more than one group.
+    """
+
+    def __init__(
+        self,
+        groups: Sequence[tuple[str, Sequence[NoteKey]]],
+        loader: NoteLoader,
+        notes_per_page: int,
+    ) -> None:
+        super().__init__(
+            note_ids=[note_id for _label, note_ids in groups for note_id in note_ids],
+            loader=loader,
+            notes_per_page=notes_per_page,
+        )
+        self._labels = [label for label, note_ids in groups for _note_id in note_ids]
+        self._page_labels: dict[int, Sequence[str]] = {}
+
+    def extend(self, note_ids: Sequence[NoteKey]) -> None:
+        raise NotImplementedError("grouped results can't be extended")
+
+    def page(self, page_num: int) -> Sequence[LocalNote]:
+        notes = super().page(page_num)
+        with self._lock:
+            self._page_labels[page_num] = self._match_labels(page_num, notes)
+            while len(self._page_labels) > self._max_cached_pages:
+                del self._page_labels[next(iter(self._page_labels))]
+        return notes
+
+    def page_labels(self, page_num: int) -> Optional[Sequence[str]]:
+        return self._page_labels.get(page_num)
+
+    def _match_labels(self, page_num: int, notes: Sequence[LocalNote]) -> list[str]:
+        """
+        The loader skips notes that no longer exist, so loaded notes are matched to the ids on the page in order.
+        """
+        bounds = self._page_bounds(page_num)
+        keyed_labels = zip(self._note_ids[bounds], self._labels[bounds])
+        labels = []
+        for note in notes:
+            for note_key, label in keyed_labels:
+                if note_key == note.id or note_key == NoteRef(note.profile_name, note.id):
+                    labels.append(label)
+                    break
+        return labels
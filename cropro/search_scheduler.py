@@ -0,0 +1,89 @@
+# Copyright: Ajatt-Tools and contributors; https://github.com/Ajatt-Tools
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+
+import threading
+from collections.abc import Callable
+from typing import Optional
+
+from .config import config
+from .debug_log import LogDebug
+
+logDebug = LogDebug(config)
+
+
+class SearchCancelled(Exception):
+    pass
+
+
+class SearchTicket:
+    """
+    Represents one search. The search checks its ticket to stop early once it has been superseded.
+    """
+
+    def __init__(self, generation: int) -> None:
+        self.generation = generation
+        self._cancelled = False
+        self._on_cancel: list[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def is_cancelled(self) -> bool:
+        return self._cancelled
+
+    def raise_if_cancelled(self) -> None:
+        if self._cancelled:
+            raise SearchCancelled()
+
+    def on_cancel(self, callback: Callable[[], None]) -> None:
+        """
+        Call the function when the search is cancelled, e.g. to close a network connection.
+        If the search has been cancelled already, the function is called right away.
+        """
+        with self._lock:
+            if not self._cancelled:
+                self._on_cancel.append(callback)
+                return
+        callback()
+
+    def cancel(self) -> None:
+        with self._lock:
+            self._cancelled = True
+            callbacks, self._on_cancel = self._on_cancel, []
+        for callback in callbacks:
+            callback()
+
+
+class SearchScheduler:
+    """
+    Keeps track of the running search.
+    Starting a new search cancels the previous one, and results of a cancelled search are discarded.
+    """
+
+    def __init__(self) -> None:
+        self._generation = 0
+        self._current: Optional[SearchTicket] = None
+
+    def start(self) -> SearchTicket:
+        self.cancel()
+        self._generation += 1
+        self._current = SearchTicket(self._generation)
+        logDebug(f"started search #{self._generation}.")
+        return self._current
+
+    def cancel(self) -> None:
+        if self._current is not None:
+            logDebug(f"cancelled search #{self._current.generation}.")
+            self._current.cancel()
+            self._current = None
+
+    def finish(self, ticket: SearchTicket) -> None:
+        if self.is_current(ticket):
+            self._current = None
+
+    def is_current(self, ticket: SearchTicket) -> bool:
+        """
+        The search is still running and hasn't been superseded by another one.
+        """
+        return ticket is self._current
+
+    def is_searching(self) -> bool:
+        return self._current is not None
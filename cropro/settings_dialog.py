@@ -57,6 +57,15 @@ class CroProSettingsDialog(QDialog):
         self.hidden_fields = ItemEditBox("Hidden fields", initial_values=config.hidden_fields)
         self.web_timeout_spinbox = CroProSpinBox(min_val=1, max_val=999, step=1, value=config.timeout_seconds)
         self.http_proxy_edit = QLineEdit(config.http_proxy)
+        self.sqlite_cache_spinbox = CroProSpinBox(min_val=2, max_val=4096, step=16, value=config.sqlite_cache_mb)
+        self.sqlite_mmap_spinbox = CroProSpinBox(min_val=0, max_val=65536, step=256, value=config.sqlite_mmap_mb)
+        self.max_opened_cols_spinbox = CroProSpinBox(min_val=1, max_val=20, step=1, value=config.max_opened_collections)
+        self.search_cache_spinbox = CroProSpinBox(min_val=0, max_val=1024, step=8, value=config.search_cache_mb)
+        self.close_idle_spinbox = CroProSpinBox(min_val=0, max_val=999, step=5, value=config.close_idle_collections_min)
+        self.search_delay_spinbox = CroProSpinBox(
+            min_val=50, max_val=5000, step=50, value=config.search_as_you_type_delay_ms
+        )
+        self.presorted_pages_spinbox = CroProSpinBox(min_val=0, max_val=100, step=1, value=config.presorted_pages)
         self.http_proxy_edit.setPlaceholderText("socks5://127.0.0.1:9099")
         # Currently, the longest sentence has a length of 196 letters (Shirokuma Cafe Outro full sub).
         self.sentence_min_length = CroProSpinBox(min_val=0, max_val=500, step=1, value=config.sentence_min_length)
@@ -97,6 +106,7 @@ class CroProSettingsDialog(QDialog):
         layout.addRow(self.checkboxes["copy_tags"])
         layout.addRow(self.checkboxes["preview_on_right_side"])
         layout.addRow(self.checkboxes["search_the_web"])
+        layout.addRow(self.checkboxes["search_as_you_type"])
         return widget
 
     def _make_local_tab(self) -> QWidget:
@@ -104,6 +114,10 @@ class CroProSettingsDialog(QDialog):
         widget.setLayout(layout := QFormLayout())
         layout.addRow(self.checkboxes["allow_empty_search"])
         layout.addRow(self.checkboxes["copy_card_data"])
+        layout.addRow(self.checkboxes["enable_search_index"])
+        layout.addRow(self.checkboxes["filter_local_by_length"])
+        layout.addRow(self.checkboxes["relevance_prefers_short"])
+        layout.addRow(self.checkboxes["link_media_files"])
         layout.addRow("Tag original cards with", self.tag_edit)
         layout.addRow("Sentence field", self.sentence_field_edit)
         return widget
@@ -168,6 +182,14 @@ class CroProSettingsDialog(QDialog):
         widget.setLayout(layout := QFormLayout())
         layout.addRow("Web download timeout", self.web_timeout_spinbox)
         layout.addRow("HTTP/HTTPS proxy", self.http_proxy_edit)
+        layout.addRow(self.checkboxes["read_only_search"])
+        layout.addRow("Read-only page cache, MiB", self.sqlite_cache_spinbox)
+        layout.addRow("Read-only mmap size, MiB", self.sqlite_mmap_spinbox)
+        layout.addRow("Max opened profiles", self.max_opened_cols_spinbox)
+        layout.addRow("Close idle profiles after, min", self.close_idle_spinbox)
+        layout.addRow("Search cache size, MiB", self.search_cache_spinbox)
+        layout.addRow("Search-as-you-type delay, ms", self.search_delay_spinbox)
+        layout.addRow("Presorted pages", self.presorted_pages_spinbox)
         layout.addRow(self.checkboxes["enable_debug_log"])
         layout.addRow(self.checkboxes["call_add_cards_hook"])
         layout.addRow(hbox := QHBoxLayout())
@@ -202,6 +224,32 @@ class CroProSettingsDialog(QDialog):
             "Set HTTP and HTTPS proxy if you can't access Web Search otherwise.\n"
             "For example, 'socks5://127.0.0.1:9099'."
         )
+        self.checkboxes["read_only_search"].setToolTip(
+            "Open other profiles read-only when searching.\n"
+            "Switching profiles becomes faster.\n"
+            "The full collection is opened only to import notes\n"
+            "or to run queries that use Anki's search syntax."
+        )
+        self.sqlite_cache_spinbox.setToolTip("Page cache size of read-only connections.")
+        self.sqlite_mmap_spinbox.setToolTip("Memory-mapped I/O limit of read-only connections.\n0 = Disabled")
+        self.max_opened_cols_spinbox.setToolTip(
+            "How many other profiles can be kept open at the same time.\n"
+            "The least recently used profile is closed first."
+        )
+        self.search_delay_spinbox.setToolTip(
+            "When searching as you type,\nwait this long after the last keystroke before searching."
+        )
+        self.presorted_pages_spinbox.setToolTip(
+            "How many pages of sorted results are prepared before they're shown.\n"
+            "Later pages are sorted when they're opened.\n"
+            "0 = Sort all results at once"
+        )
+        self.close_idle_spinbox.setToolTip("Close other profiles that haven't been used for a while.\n0 = Never")
+        self.search_cache_spinbox.setToolTip(
+            "Remember results of recent searches to show them instantly next time.\n"
+            "Cached results are dropped when the other profile changes.\n"
+            "0 = Disabled"
+        )
         self.sentence_min_length.setToolTip("0 = No limit")
         self.sentence_max_length.setToolTip("0 = No limit")
         self.checkboxes["copy_card_data"].setToolTip(
@@ -229,6 +277,32 @@ class CroProSettingsDialog(QDialog):
         self.checkboxes["allow_empty_search"].setToolTip(
             "Show a list of notes from the other collection\neven when the search bar is empty."
         )
+        self.checkboxes["enable_search_index"].setToolTip(
+            "Keep a full-text index of the other collection.\n"
+            "Plain text searches are answered from the index,\n"
+            "which is much faster when the other collection is big.\n"
+            "Short Japanese, Chinese and Korean terms are looked up\n"
+            "in a separate index of single characters and character pairs.\n"
+            "The index is built in the background and takes extra disk space."
+        )
+        self.checkboxes["filter_local_by_length"].setToolTip(
+            "Only show notes whose sentence length is within\n"
+            "the range set on the Web Search tab.\n"
+            "The sentence is read from the sentence field."
+        )
+        self.checkboxes["relevance_prefers_short"].setToolTip(
+            "When results are sorted by relevance,\n"
+            "rank shorter sentences higher than equally relevant long ones.\n"
+            "Sorting by relevance requires the search index."
+        )
+        self.checkboxes["link_media_files"].setToolTip(
+            "Hard-link or clone media files from the other profile instead of copying them.\n"
+            "Saves time and disk space when both profiles are on the same filesystem.\n"
+            "Files are copied when linking isn't possible."
+        )
+        self.checkboxes["search_as_you_type"].setToolTip(
+            "Start searching when you stop typing.\nA new search cancels the one that is still running."
+        )
         self.checkboxes["search_the_web"].setToolTip(
             "Instead of searching notes in a local profile,\nsearch the Internet instead."
         )
@@ -271,6 +345,13 @@ class CroProSettingsDialog(QDialog):
         config.hidden_fields = self.hidden_fields.values()
         config.timeout_seconds = self.web_timeout_spinbox.value()
         config.http_proxy = self.http_proxy_edit.text()
+        config.sqlite_cache_mb = self.sqlite_cache_spinbox.value()
+        config.sqlite_mmap_mb = self.sqlite_mmap_spinbox.value()
+        config.max_opened_collections = self.max_opened_cols_spinbox.value()
+        config.close_idle_collections_min = self.close_idle_spinbox.value()
+        config.search_cache_mb = self.search_cache_spinbox.value()
+        config.search_as_you_type_delay_ms = self.search_delay_spinbox.value()
+        config.presorted_pages = self.presorted_pages_spinbox.value()
         config.sentence_min_length = self.sentence_min_length.value()
         config.sentence_max_length = (
             self.sentence_max_length.value()
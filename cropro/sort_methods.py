@@ -0,0 +1,103 @@
+# Copyright: Ajatt-Tools and contributors; https://github.com/Ajatt-Tools
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+
+"""
+Ways to sort found notes. They don't depend on Qt, so that notes can also be sorted without Anki's GUI.
+"""
+
+import abc
+from typing import Optional, Union
+
+from anki.notes import Note
+from anki.utils import field_checksum, html_to_text_line
+
+from .collection_manager import LocalNote, OtherCollection
+from .config import CroProConfig
+from .note_features import NO_SENTENCE
+
+
+class SortResults(abc.ABC):
+    # Found notes are ranked by how well they match the search text, which is only possible with the search index.
+    ranks_by_relevance = False
+
+    def __init__(self, config: CroProConfig):
+        self._config = config
+
+    @abc.abstractmethod
+    def __call__(self, note: Union[Note, LocalNote]) -> tuple:
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def sql_columns(self, other: OtherCollection) -> list[str]:
+        """
+        SQL expressions over the notes table that produce the same sort key, so that notes don't have to be loaded.
+        """
+        raise NotImplementedError()
+
+    def feature_columns(self) -> Optional[list[str]]:
+        """
+        Columns of the note feature store that produce the same sort key, or None if the store can't be used.
+        """
+        return None
+
+    def describe(self) -> str:
+        """
+        Identifies the sort method and the settings it depends on.
+        """
+        return type(self).__name__
+
+
+class SortResultsByLen(SortResults):
+    """
+    Shorter sentences go first. Sentences of the same length are ordered by the checksum of their text,
+    which keeps copies of the same sentence together but isn't alphabetical.
+    The note feature store only keeps numbers, so a checksum is the text tie-break that every way of sorting can use.
+    """
+
+    def __call__(self, note: Union[Note, LocalNote]) -> tuple[int, int]:
+        try:
+            sentence = html_to_text_line(note[self._config.sentence_field_name])
+        except KeyError:
+            return NO_SENTENCE, 0
+        return len(sentence), field_checksum(sentence)
+
+    def sql_columns(self, other: OtherCollection) -> list[str]:
+        field_ords = other.field_ords_by_name(self._config.sentence_field_name)
+        # The functions are registered on the read-only connection. Anki's connection doesn't have them,
+        # and the notes are loaded and sorted in Python instead. Notes of types that don't have the field go last.
+        length_cases = "".join(
+            f" WHEN {mid} THEN plain_text_length(field_at_index(flds, {ord_}))" for mid, ord_ in field_ords.items()
+        )
+        checksum_cases = "".join(
+            f" WHEN {mid} THEN plain_text_checksum(field_at_index(flds, {ord_}))" for mid, ord_ in field_ords.items()
+        )
+        return [
+            f"CASE mid{length_cases} ELSE {NO_SENTENCE} END" if field_ords else str(NO_SENTENCE),
+            f"CASE mid{checksum_cases} ELSE 0 END" if field_ords else "0",
+        ]
+
+    def feature_columns(self) -> Optional[list[str]]:
+        return ["sentence_lengths", "sentence_checksums"]
+
+    def describe(self) -> str:
+        return f"{super().describe()}:{self._config.sentence_field_name}"
+
+
+class SortResultsByRelevance(SortResultsByLen):
+    """
+    The best matches go first, scored by BM25 from the search index.
+    Without the index, or for search text the index can't handle, notes are sorted by sentence length.
+    """
+
+    ranks_by_relevance = True
+
+    def describe(self) -> str:
+        return f"{super().describe()}:{int(self._config.relevance_prefers_short)}"
+
+
+class SortResultsByNoteID(SortResults):
+    def __call__(self, note: Union[Note, LocalNote]) -> tuple[int]:
+        return (note.id,)
+
+    def sql_columns(self, other: OtherCollection) -> list[str]:
+        return ["id"]
@@ -0,0 +1,69 @@
+# Copyright: Ajatt-Tools and contributors; https://github.com/Ajatt-Tools
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+
+from aqt.qt import *
+from aqt.utils import disable_help_button, restoreGeom, saveGeom
+
+from ..ajt_common.about_menu import tweak_window
+from ..common import ADDON_NAME, parse_term_list
+from ..config import config
+from .utils import CroProSpinBox
+
+BUT_OK = QDialogButtonBox.StandardButton.Ok
+BUT_CANCEL = QDialogButtonBox.StandardButton.Cancel
+
+
+class BatchLookupDialog(QDialog):
+    """
+    Asks for a list of terms to look up at once, e.g. words to mine from a frequency list.
+    """
+
+    name = "cropro_batch_lookup_dialog"
+
+    def __init__(self, *args, **kwargs) -> None:
+        QDialog.__init__(self, *args, **kwargs)
+        disable_help_button(self)
+        self.terms_edit = QPlainTextEdit()
+        self.terms_edit.setPlaceholderText("One term per line")
+        self.per_term_spinbox = CroProSpinBox(min_val=1, max_val=100, step=1, value=config.batch_results_per_term)
+        self.import_checkbox = QCheckBox("Import all found notes")
+        self.button_box = QDialogButtonBox(BUT_OK | BUT_CANCEL)
+        self._setup_ui()
+        self._add_tooltips()
+        qconnect(self.button_box.accepted, self.accept)
+        qconnect(self.button_box.rejected, self.reject)
+        tweak_window(self)
+        restoreGeom(self, self.name, adjustSize=True)
+
+    def _setup_ui(self) -> None:
+        self.setMinimumWidth(300)
+        self.setWindowTitle(f"{ADDON_NAME} - Batch lookup")
+        layout = QFormLayout()
+        layout.addRow(self.terms_edit)
+        layout.addRow("Notes per term", self.per_term_spinbox)
+        layout.addRow(self.import_checkbox)
+        layout.addRow(self.button_box)
+        self.setLayout(layout)
+
+    def _add_tooltips(self) -> None:
+        self.per_term_spinbox.setToolTip(
+            "How many notes to find for each term.\nThe best notes are picked according to the selected sort order."
+        )
+        self.import_checkbox.setToolTip(
+            "Import the found notes of all terms right away.\nOtherwise, they're listed so that you can pick some."
+        )
+
+    def terms(self) -> list[str]:
+        return parse_term_list(self.terms_edit.toPlainText())
+
+    def should_import(self) -> bool:
+        return self.import_checkbox.isChecked()
+
+    def done(self, result: int) -> None:
+        saveGeom(self, self.name)
+        return super().done(result)
+
+    def accept(self) -> None:
+        config.batch_results_per_term = self.per_term_spinbox.value()
+        config.write_config()
+        return super().accept()
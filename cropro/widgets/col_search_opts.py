@@ -1,15 +1,18 @@
 # Copyright: Ajatt-Tools and contributors; https://github.com/Ajatt-Tools
 # License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
-import abc
 from collections.abc import Iterable, Sequence
 from typing import Optional
 
-from anki.notes import Note
 from aqt import AnkiQt
 from aqt.qt import *
 
-from ..collection_manager import NameId
-from ..config import CroProConfig
+from ..collection_manager import ALL_PROFILES, NameId
+from ..sort_methods import (
+    SortResults,
+    SortResultsByLen,
+    SortResultsByNoteID,
+    SortResultsByRelevance,
+)
 from .utils import CroProComboBox, CroProLineEdit, CroProPushButton, NameIdComboBox
 
 
@@ -58,34 +61,12 @@ class CroProSearchBar(QWidget):
         qconnect(self._search_term_edit.editingFinished, handle_search_requested)
 
 
-class SortResults(abc.ABC):
-    def __init__(self, config: CroProConfig):
-        self._config = config
-
-    @abc.abstractmethod
-    def __call__(self, note: Note):
-        raise NotImplementedError()
-
-
-class SortResultsByLen(SortResults):
-    def __call__(self, note: Note) -> tuple[int, str]:
-        field_name = self._config.sentence_field_name
-        try:
-            return len(note[field_name]), note[field_name]
-        except KeyError:
-            return sys.maxsize, ""
-
-
-class SortResultsByNoteID(SortResults):
-    def __call__(self, note: Note) -> int:
-        return note.id
-
-
 def new_sort_results_combo_box() -> CroProComboBox:
     combo = CroProComboBox()
     combo.addItem("None", None)
     combo.addItem("Sentence length", SortResultsByLen)
     combo.addItem("Note ID", SortResultsByNoteID)
+    combo.addItem("Relevance", SortResultsByRelevance)
     return combo
 
 
@@ -150,8 +131,11 @@ class ColSearchOptions(QWidget):
     def set_profile_names(self, other_profile_names: Sequence[str]) -> None:
         """
         Populate profile selector with a list of profile names, excluding the current profile.
+        If there's more than one other profile, they can be searched all at once.
         """
         assert self.ankimw.pm.name not in other_profile_names
+        if len(other_profile_names) > 1:
+            other_profile_names = [*other_profile_names, ALL_PROFILES]
         self._other_profile_names_combo.set_texts(other_profile_names)
 
     def selected_profile_name(self) -> str:
@@ -160,6 +144,15 @@ class ColSearchOptions(QWidget):
         """
         return self._other_profile_names_combo.currentText()
 
+    def is_all_profiles_selected(self) -> bool:
+        return self.selected_profile_name() == ALL_PROFILES
+
+    def other_profile_names(self) -> list[str]:
+        """
+        Names of all other profiles listed in the profile selector.
+        """
+        return [name for name in self._other_profile_names_combo.all_texts() if name != ALL_PROFILES]
+
     def set_decks(self, decks: Iterable[NameId]) -> None:
         """
         A list of decks to search in.
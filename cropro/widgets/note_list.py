@@ -2,11 +2,13 @@
 # License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
 
 from collections.abc import Iterable, Sequence
+from typing import Optional
 
 from anki.notes import Note
 from anki.utils import html_to_text_line
 from aqt.qt import *
 
+from ..collection_manager import LocalNote
 from ..remote_search import RemoteNote
 from .note_previewer import NotePreviewer
 
@@ -59,7 +61,7 @@ class NoteList(QSplitter):
         if not self._note_list.selectedItems() and self._note_list.count() > 0:
             self._note_list.setCurrentRow(0)
 
-    def selected_notes(self) -> Sequence[Note]:
+    def selected_notes(self) -> Sequence[Union[Note, LocalNote, RemoteNote]]:
         return [item.data(self._role) for item in self._note_list.selectedItems()]
 
     def clear_selection(self) -> None:
@@ -71,9 +73,11 @@ class NoteList(QSplitter):
 
     def set_notes(
         self,
-        notes: Iterable[Union[Note, RemoteNote]],
+        notes: Iterable[Union[Note, LocalNote, RemoteNote]],
         hide_fields: list[str],
         is_previewer_enabled: bool = True,
+        show_profile_names: bool = False,
+        labels: Optional[Sequence[str]] = None,
     ):
         self._enable_previewer = is_previewer_enabled
 
@@ -82,7 +86,7 @@ class NoteList(QSplitter):
             return any(hidden_field.lower() in field_name for hidden_field in hide_fields)
 
         self.clear_notes()
-        for note in notes:
+        for idx, note in enumerate(notes):
             item = QListWidgetItem()
             item.setText(
                 " | ".join(
@@ -91,5 +95,10 @@ class NoteList(QSplitter):
                     if not is_hidden(field_name) and field_content.strip()
                 )
             )
+            if show_profile_names and isinstance(note, LocalNote):
+                item.setText(f"[{note.profile_name}] {item.text()}")
+                item.setToolTip(f"Profile: {note.profile_name}")
+            if labels:
+                item.setText(f"[{labels[idx]}] {item.text()}")
             item.setData(self._role, note)
             self._note_list.addItem(item)
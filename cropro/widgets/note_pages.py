@@ -1,16 +1,15 @@
 # Copyright: Ajatt-Tools and contributors; https://github.com/Ajatt-Tools
 # License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
 import typing
-from collections.abc import Iterable, Sequence
-from itertools import islice
+from collections.abc import Sequence
 
-from anki.notes import Note
+from aqt import mw
 from aqt.qt import *
 
 from ..ajt_common.utils import clamp, q_emit
 from ..config import config
 from ..debug_log import LogDebug
-from ..remote_search import RemoteNote
+from ..search_results import AnyNote, LoadedSearchResults, SearchResults
 from .note_list import NoteList
 
 logDebug = LogDebug(config)
@@ -24,35 +23,35 @@ class PageNavButton(QPushButton):
         self.setToolTip(tooltip)
 
 
-def to_chunks(iterable: Iterable, chunk_size: int) -> Iterable[Sequence]:
-    # batched('ABCDEFG', 3) → ABC DEF G
-    if chunk_size < 1:
-        raise ValueError("chunk_size must be at least one")
-    iterator = iter(iterable)
-    while batch := tuple(islice(iterator, chunk_size)):
-        yield batch
-
-
 class NoteListStatus(typing.NamedTuple):
     found_count: int
     displayed_count: int
     current_page_num: int
     total_pages_count: int
+    # False while the search is running and more notes are on the way.
+    is_complete: bool
 
 
 class PagedNoteList(QWidget):
     _note_list: NoteList
     _page_prev_btn: QPushButton
     _page_next_btn: QPushButton
-    _notes: list[Sequence[Union[Note, RemoteNote]]]
+    _results: SearchResults
+    _visible_notes: Sequence[AnyNote]
     _current_page_num: int
+    # A page that the user has flipped to before it was found.
+    _pending_page_num: typing.Optional[int]
+    _show_profile_names: bool
 
     status_changed = pyqtSignal(NoteListStatus)
 
     def __init__(self) -> None:
         super().__init__()
-        self._notes = []
+        self._results = LoadedSearchResults([], config.notes_per_page)
+        self._visible_notes = []
         self._current_page_num = 0
+        self._pending_page_num = None
+        self._show_profile_names = False
         self._page_prev_btn = PageNavButton("🞀", "Previous Page")
         self._page_next_btn = PageNavButton("🞂", "Next Page")
         self._note_list = NoteList()
@@ -74,13 +73,16 @@ class PagedNoteList(QWidget):
 
     def clear_notes(self) -> None:
         self._note_list.clear_notes()
-        self._notes.clear()
+        self._results = LoadedSearchResults([], config.notes_per_page)
+        self._visible_notes = []
+        self._pending_page_num = None
+        self._show_profile_names = False
 
-    def selected_notes(self) -> Sequence[Union[Note, RemoteNote]]:
+    def selected_notes(self) -> Sequence[AnyNote]:
         return self._note_list.selected_notes()
 
     def note_count(self) -> int:
-        return sum(len(chunk) for chunk in self._notes)
+        return len(self._results)
 
     def clear_selection(self) -> None:
         return self._note_list.clear_selection()
@@ -89,35 +91,87 @@ class PagedNoteList(QWidget):
         qconnect(self._page_prev_btn.clicked, lambda: self.flip_page(-1))
         qconnect(self._page_next_btn.clicked, lambda: self.flip_page(+1))
 
-    def set_notes(self, notes: Sequence[Union[Note, RemoteNote]]) -> None:
-        self._notes = [*to_chunks(notes, config.notes_per_page)]
+    def set_notes(self, notes: Sequence[AnyNote]) -> None:
+        self.set_results(LoadedSearchResults(notes, config.notes_per_page))
+
+    def set_results(self, results: SearchResults, show_profile_names: bool = False) -> None:
+        """
+        Show search results. Only the notes on the visible page are loaded.
+        Profile names are shown when the results come from more than one profile.
+        """
+        self._results = results
+        self._pending_page_num = None
+        self._show_profile_names = show_profile_names
         self.set_page(0)
 
-    def get_visible_notes(self) -> Sequence[Union[Note, RemoteNote]]:
-        return self._notes[self._current_page_num] if self._notes else []
+    def on_results_added(self) -> None:
+        """
+        Called after more notes have been appended to the shown results or the search has completed.
+        The visible page is reloaded only if it had free space, so that a full page keeps its selection.
+        If the user is waiting for a page that has now been found, the page is shown.
+        """
+        if self._pending_page_num is not None and (
+            self._pending_page_num < self._results.page_count() or self._results.is_complete()
+        ):
+            page_num, self._pending_page_num = self._pending_page_num, None
+            self.set_page(page_num)
+        elif len(self._visible_notes) < config.notes_per_page:
+            self.set_page(self._current_page_num)
+        else:
+            self._set_buttons_enabled()
+            self._emit_status()
+
+    @property
+    def results(self) -> SearchResults:
+        return self._results
+
+    def get_visible_notes(self) -> Sequence[AnyNote]:
+        return self._visible_notes
+
+    def _prefetch_next_page(self) -> None:
+        results, next_page_num = self._results, self._current_page_num + 1
+        if next_page_num < results.page_count():
+            mw.taskman.run_in_background(lambda: results.prefetch(next_page_num), lambda _future: None)
 
     def set_page(self, page_num: int):
-        self._current_page_num = clamp(min_val=0, val=page_num, max_val=len(self._notes) - 1)
+        self._current_page_num = clamp(min_val=0, val=page_num, max_val=self._results.page_count() - 1)
+        self._visible_notes = self._results.page(self._current_page_num) if len(self._results) > 0 else []
         self._note_list.set_notes(
             notes=self.get_visible_notes(),
             hide_fields=config.hidden_fields,
             is_previewer_enabled=config.preview_on_right_side,
+            show_profile_names=self._show_profile_names,
+            labels=self._results.page_labels(self._current_page_num) if self._visible_notes else None,
         )
         self._set_buttons_enabled()
+        self._emit_status()
+        logDebug(f"Page set. Current page #{self._current_page_num + 1}/{self._results.page_count()}.")
+        self._prefetch_next_page()
+
+    def _emit_status(self) -> None:
         q_emit(
             self.status_changed,
             NoteListStatus(
                 found_count=self.note_count(),
                 displayed_count=len(self.get_visible_notes()),
                 current_page_num=self._current_page_num + 1,  # count from 1
-                total_pages_count=len(self._notes),
+                total_pages_count=self._results.page_count(),
+                is_complete=self._results.is_complete(),
             ),
         )
-        logDebug(f"Page set. Current page #{self._current_page_num + 1}/{len(self._notes)}.")
 
     def flip_page(self, step: int) -> None:
-        self.set_page(step + self._current_page_num)
+        page_num = step + self._current_page_num
+        if page_num >= self._results.page_count() and not self._results.is_complete():
+            # the page will be shown when enough notes are found.
+            logDebug(f"Page #{page_num + 1} hasn't been found yet.")
+            self._pending_page_num = page_num
+            return
+        self._pending_page_num = None
+        self.set_page(page_num)
 
     def _set_buttons_enabled(self):
         self._page_prev_btn.setEnabled(self._current_page_num > 0)
-        self._page_next_btn.setEnabled(self._current_page_num < len(self._notes) - 1)
+        self._page_next_btn.setEnabled(
+            self._current_page_num < self._results.page_count() - 1 or not self._results.is_complete()
+        )
@@ -15,9 +15,12 @@ from anki.sound import SoundOrVideoTag
 from anki.utils import html_to_text_line
 from aqt import mw
 from aqt.qt import *
+from aqt.utils import tooltip
 from aqt.webview import AnkiWebView
 
 from ..ajt_common.media import find_images, find_sounds
+from ..collection_manager import LocalNote, note_media_dir
+from ..media_manifest import media_manifest
 from ..remote_search import RemoteMediaInfo, RemoteNote
 
 RE_DANGEROUS = re.compile(r'[\'"<>]+')
@@ -46,13 +49,18 @@ def format_remote_image(image: RemoteMediaInfo) -> str:
     """
 
 
-def format_image_references(note: Note, image_file_names: Iterable[str]) -> str:
+def format_image_references(note: Union[Note, LocalNote], image_file_names: Iterable[str]) -> str:
+    manifest = media_manifest(note_media_dir(note))
+
     def image_as_base64_src(file_name: str) -> str:
+        if (file_path := manifest.path_of(file_name)) is None:
+            # This file does not exist in the collection. Likely a URL. Return as is.
+            return file_name
         try:
-            with open(os.path.join(note.col.media.dir(), file_name), "rb") as f:
+            with open(file_path, "rb") as f:
                 return f"data:image/{filetype(file_name)};base64,{img2b64(f.read())}"
         except FileNotFoundError:
-            # This file does not exist in the collection. Likely a URL. Return as is.
+            # The file has been removed after the media folder was listed.
             return file_name
 
     return "".join(
@@ -102,7 +110,7 @@ class NotePreviewer(AnkiWebView):
 
     mw.addonManager.setWebExports(__name__, r"(img|web)/.*\.(js|css|html|png|svg)")
 
-    _note: Optional[Union[Note, RemoteNote]]
+    _note: Optional[Union[Note, LocalNote, RemoteNote]]
 
     def __init__(self, parent: QWidget):
         super().__init__(parent)
@@ -120,7 +128,7 @@ class NotePreviewer(AnkiWebView):
         self.stdHtml("", js=[], css=[])
         self.hide()
 
-    def load_note(self, note: Union[Note, RemoteNote]) -> None:
+    def load_note(self, note: Union[Note, LocalNote, RemoteNote]) -> None:
         self._note = note
         self.stdHtml(
             body=f"<main>{self._generate_html_for_note(note)}</main>",
@@ -133,7 +141,7 @@ class NotePreviewer(AnkiWebView):
         )
         self.show()
 
-    def _generate_html_for_note(self, note: Union[Note, RemoteNote]) -> str:
+    def _generate_html_for_note(self, note: Union[Note, LocalNote, RemoteNote]) -> str:
         """Creates html for the previewer showing the current note."""
         markup = io.StringIO()
         for field_name, field_content in note.items():
@@ -143,7 +151,7 @@ class NotePreviewer(AnkiWebView):
             markup.write('<div class="content">')
             if isinstance(self._note, RemoteNote):
                 markup.write(self._create_html_for_remote_field(field_name, field_content))
-            elif isinstance(self._note, Note):
+            elif isinstance(self._note, (Note, LocalNote)):
                 markup.write(self._create_html_for_field(field_content))
             else:
                 raise ValueError(f"Unknown type {type(self._note)}")
@@ -167,7 +175,7 @@ class NotePreviewer(AnkiWebView):
 
     def _create_html_for_field(self, field_content: str) -> str:
         """Creates the content for the previewer showing the local note's field."""
-        assert isinstance(self._note, Note), "Local note required."
+        assert isinstance(self._note, (Note, LocalNote)), "Local note required."
         markup = io.StringIO()
         if audio_files := find_sounds(field_content):
             markup.write(f'<div class="cropro__audio_list">{format_audio_references(audio_files)}</div>')
@@ -182,9 +190,10 @@ class NotePreviewer(AnkiWebView):
         from aqt import sound
 
         if cmd.startswith("cropro__play_file:"):
-            assert isinstance(self._note, Note), "Only local files can be played with av_player."
+            assert isinstance(self._note, (Note, LocalNote)), "Only local files can be played with av_player."
             file_name = os.path.basename(urllib.parse.unquote(cmd.split(":", maxsplit=1)[-1]))
-            file_path = os.path.join(self._note.col.media.dir(), file_name)
+            if (file_path := media_manifest(note_media_dir(self._note)).path_of(file_name)) is None:
+                return tooltip(f"File doesn't exist: {file_name}", parent=self)
             return sound.av_player.play_tags([
                 SoundOrVideoTag(file_path),
             ])
@@ -1,11 +1,12 @@
 # Copyright: Ajatt-Tools and contributors; https://github.com/Ajatt-Tools
 # License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
 from types import SimpleNamespace
-from typing import cast
+from typing import Optional, cast
 
 from aqt import AnkiQt
 from aqt.qt import *
 
+from ..config import config
 from ..remote_search import CroProWebSearchArgs
 from .col_search_opts import ColSearchOptions
 from .remote_search_opts import RemoteSearchOptions
@@ -24,6 +25,9 @@ class CroProSearchBar(QWidget):
         super().__init__()
         self._search_term_edit = CroProLineEdit()
         self._search_button = CroProPushButton("Search")
+        # Starts a search when the user stops typing if search-as-you-type is enabled.
+        self._typing_timer = QTimer(self)
+        self._typing_timer.setSingleShot(True)
         self._setup_layout()
         self._connect_elements()
 
@@ -48,12 +52,34 @@ class CroProSearchBar(QWidget):
         self.setLayout(layout)
 
     def _connect_elements(self) -> None:
+        # Text that has been searched because the user stopped typing.
+        typed_text: Optional[str] = None
+
         def handle_search_requested() -> None:
+            self._typing_timer.stop()
             # noinspection PyUnresolvedReferences
             self.search_requested.emit(self.search_text())
 
+        def handle_editing_finished() -> None:
+            # Pressing Enter or leaving the field right after a search-as-you-type search doesn't repeat it.
+            nonlocal typed_text
+            was_searched, typed_text = typed_text == self.search_text(), None
+            if not was_searched:
+                handle_search_requested()
+
+        def handle_typing_stopped() -> None:
+            nonlocal typed_text
+            typed_text = self.search_text()
+            handle_search_requested()
+
+        def handle_text_edited() -> None:
+            if config.search_as_you_type:
+                self._typing_timer.start(config.search_as_you_type_delay_ms)
+
         qconnect(self._search_button.clicked, handle_search_requested)
-        qconnect(self._search_term_edit.editingFinished, handle_search_requested)
+        qconnect(self._search_term_edit.editingFinished, handle_editing_finished)
+        qconnect(self._search_term_edit.textEdited, handle_text_edited)
+        qconnect(self._typing_timer.timeout, handle_typing_stopped)
 
 
 class CroProSearchWidget(QWidget):
@@ -54,10 +54,28 @@ class SearchResultLabel(QLabel):
             text += f" Status code: {ex.response.status_code}"
         self._set_status_text(text, CroProSearchResult.error)
 
+    def set_opening_collection(self, name: str) -> None:
+        self._set_status_text(f"Opening {name}. The search will start when it's ready.", CroProSearchResult.warn)
+
+    def set_searching(self) -> None:
+        self._set_status_text("Searching...", CroProSearchResult.warn)
+
     def set_nothing_to_do(self) -> None:
         self._set_status_text("Search query is empty. Did nothing.", CroProSearchResult.warn)
 
-    def set_count(self, found_notes: int, displayed_notes: int, current_page_n: int, total_pages_count: int) -> None:
+    def set_count(
+        self,
+        found_notes: int,
+        displayed_notes: int,
+        current_page_n: int,
+        total_pages_count: int,
+        is_complete: bool = True,
+    ) -> None:
+        if not is_complete:
+            return self._set_status_text(
+                f"Searching... {found_notes} notes found so far. Page {current_page_n}/{total_pages_count}.",
+                CroProSearchResult.warn,
+            )
         if found_notes == 0:
             return self._set_status_text("No notes found", CroProSearchResult.error)
         elif displayed_notes >= found_notes:
@@ -0,0 +1,45 @@
+# Copyright: Ajatt-Tools and contributors; https://github.com/Ajatt-Tools
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+
+import pytest
+
+from cropro.ngram_index import decode_deltas, encode_deltas, ngrams_of, query_ngrams
+
+
+@pytest.mark.parametrize(
+    "note_ids",
+    [
+        [],
+        [1],
+        [0x7F, 0x80, 0x3FFF, 0x4000],
+        [1_300_000_000_000, 1_300_000_000_001, 1_700_000_000_000],
+    ],
+)
+def test_deltas_round_trip(note_ids: list[int]) -> None:
+    assert decode_deltas(encode_deltas(note_ids)).tolist() == note_ids
+
+
+def test_encode_deltas_appends() -> None:
+    encoded = encode_deltas([10, 200])
+    encoded += encode_deltas([5_000, 70_000], previous=200)
+    assert decode_deltas(encoded).tolist() == [10, 200, 5_000, 70_000]
+    assert encode_deltas([0x7F]) == bytearray([0x7F])
+    assert encode_deltas([0x80]) == bytearray([0x80, 0x01])
+
+
+def test_ngrams_of() -> None:
+    assert ngrams_of("猫が好き cat 犬") == {"猫", "が", "好", "き", "猫が", "が好", "好き", "犬"}
+    assert ngrams_of("no cjk here") == set()
+
+
+@pytest.mark.parametrize(
+    "term, expected",
+    [
+        ("猫", {"猫"}),
+        ("猫が好き", {"猫が", "が好", "好き"}),
+        ("猫 犬", {"猫", "犬"}),
+        ("cat", set()),
+    ],
+)
+def test_query_ngrams(term: str, expected: set[str]) -> None:
+    assert query_ngrams(term) == expected
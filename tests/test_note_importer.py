@@ -0,0 +1,76 @@
+# Copyright: Ajatt-Tools and contributors; https://github.com/Ajatt-Tools
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+
+import pathlib
+from collections.abc import Iterator
+
+import anki.lang
+import pytest
+from anki.collection import Collection
+from anki.notes import Note
+
+from cropro.note_importer import DuplicateIndex
+
+
+@pytest.fixture
+def col(tmp_path: pathlib.Path) -> Iterator[Collection]:
+    # Anki strips HTML with the help of its translations.
+    anki.lang.set_lang("en_US")
+    col = Collection(str(tmp_path / "collection.anki2"))
+    for front in ("猫です", "<b>犬</b>です"):
+        col.add_note(new_note(col, "Basic", front), col.decks.id("Default"))
+    yield col
+    col.close()
+
+
+def new_note(col: Collection, note_type_name: str, first_field: str, *other_fields: str) -> Note:
+    note = col.new_note(col.models.by_name(note_type_name))
+    note.fields = [first_field, *other_fields, *note.fields[len(other_fields) + 1 :]]
+    return note
+
+
+@pytest.mark.parametrize(
+    "note_type_name, first_field, expected",
+    [
+        ("Basic", "猫です", True),
+        ("Basic", "<i>猫です</i>", True),
+        ("Basic", "犬です", True),
+        ("Basic (and reversed card)", "猫です", False),
+        ("Basic", "鳥です", False),
+        ("Basic", "  ", True),
+        ("Basic", "<br>", True),
+        ("Basic", '<img src="鳥.jpg">', False),
+    ],
+)
+def test_is_duplicate_or_empty(col: Collection, note_type_name: str, first_field: str, expected: bool) -> None:
+    note = new_note(col, note_type_name, first_field)
+    assert DuplicateIndex(col).is_duplicate_or_empty(note) is expected
+    assert bool(note.fields_check()) is expected
+
+
+def test_duplicates_within_batch(col: Collection) -> None:
+    dupes = DuplicateIndex(col)
+    assert dupes.is_duplicate_or_empty(new_note(col, "Basic", "鳥です")) is False
+    assert dupes.is_duplicate_or_empty(new_note(col, "Basic", "<b>鳥です</b>")) is True
+    assert dupes.is_duplicate_or_empty(new_note(col, "Basic (and reversed card)", "鳥です")) is False
+
+
+@pytest.mark.parametrize(
+    "note_type_name, fields, expected",
+    [
+        ("Cloze", ["{{c1::猫}}です"], False),
+        ("Cloze", ["猫です"], True),
+        ("Cloze", ["{{c1::猫}}です", "{{c2::犬}}"], True),
+        ("Basic", ["{{c1::鳥}}です"], True),
+    ],
+)
+def test_cloze_deletions(col: Collection, note_type_name: str, fields: list[str], expected: bool) -> None:
+    note = new_note(col, note_type_name, *fields)
+    assert DuplicateIndex(col).is_duplicate_or_empty(note) is expected
+    assert bool(note.fields_check()) is expected
+
+
+def test_rejected_note_is_not_part_of_batch(col: Collection) -> None:
+    dupes = DuplicateIndex(col)
+    assert dupes.is_duplicate_or_empty(new_note(col, "Cloze", "{{c1::猫}}です", "{{c2::犬}}")) is True
+    assert dupes.is_duplicate_or_empty(new_note(col, "Cloze", "{{c1::猫}}です")) is False
@@ -0,0 +1,55 @@
+# Copyright: Ajatt-Tools and contributors; https://github.com/Ajatt-Tools
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+
+import pytest
+
+from cropro.config import CroProConfig
+from cropro.search_cache import MIB, SearchCacheKey, SearchResultCache
+
+
+def make_key(search_text: str) -> SearchCacheKey:
+    return SearchCacheKey("User 1", 0, search_text, sort_key="", filters="")
+
+
+def set_cache_mb(monkeypatch: pytest.MonkeyPatch, cache_mb: float) -> None:
+    monkeypatch.setattr(CroProConfig, "search_cache_mb", property(lambda self: cache_mb))
+
+
+def test_get_returns_put_note_ids(monkeypatch: pytest.MonkeyPatch) -> None:
+    set_cache_mb(monkeypatch, 1)
+    cache = SearchResultCache()
+    assert cache.get(make_key("猫"), col_mod=1) is None
+    cache.put(make_key("猫"), col_mod=1, note_ids=[3, 1, 2])
+    assert list(cache.get(make_key("猫"), col_mod=1)) == [3, 1, 2]
+
+
+def test_entry_expires_when_collection_changes(monkeypatch: pytest.MonkeyPatch) -> None:
+    set_cache_mb(monkeypatch, 1)
+    cache = SearchResultCache()
+    cache.put(make_key("猫"), col_mod=1, note_ids=[1, 2])
+    assert cache.get(make_key("猫"), col_mod=2) is None
+    assert cache.get(make_key("猫"), col_mod=1) is None
+
+
+def test_least_recently_used_entry_is_dropped(monkeypatch: pytest.MonkeyPatch) -> None:
+    # Room for two entries of 8192 note ids each.
+    set_cache_mb(monkeypatch, 2 * 8192 * 8 / MIB)
+    cache = SearchResultCache()
+    note_ids = list(range(8192))
+    cache.put(make_key("a"), 1, note_ids)
+    cache.put(make_key("b"), 1, note_ids)
+    assert cache.get(make_key("a"), 1) is not None
+    cache.put(make_key("c"), 1, note_ids)
+    assert cache.get(make_key("b"), 1) is None
+    assert cache.get(make_key("a"), 1) is not None
+    assert cache.get(make_key("c"), 1) is not None
+
+
+def test_disabled_or_too_large(monkeypatch: pytest.MonkeyPatch) -> None:
+    set_cache_mb(monkeypatch, 0)
+    cache = SearchResultCache()
+    cache.put(make_key("a"), 1, [1])
+    assert cache.get(make_key("a"), 1) is None
+    set_cache_mb(monkeypatch, 8 / MIB)
+    cache.put(make_key("a"), 1, [1, 2])
+    assert cache.get(make_key("a"), 1) is None
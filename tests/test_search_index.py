@@ -0,0 +1,81 @@
+# Copyright: Ajatt-Tools and contributors; https://github.com/Ajatt-Tools
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+
+import re
+
+import pytest
+
+from cropro.search_index import (
+    plain_search_terms,
+    regex_search_pattern,
+    required_literals,
+    to_match_expr,
+)
+
+
+@pytest.mark.parametrize(
+    "search_text, expected",
+    [
+        ("猫が好き", ["猫が好き"]),
+        ("cat  dog", ["cat", "dog"]),
+        ("deck:Mining cat", None),
+        ("-cat", None),
+        ("cat or dog", None),
+        ("c_t", None),
+        ("", None),
+    ],
+)
+def test_plain_search_terms(search_text: str, expected) -> None:
+    assert plain_search_terms(search_text) == expected
+
+
+@pytest.mark.parametrize(
+    "search_text, expected",
+    [
+        ("re:食べ(る|た)", "食べ(る|た)"),
+        ('"re:a b"', "a b"),
+        ('"re:say \\"hi\\""', 'say "hi"'),
+        ("re:a re:b", None),
+        ("食べる", None),
+    ],
+)
+def test_regex_search_pattern(search_text: str, expected) -> None:
+    assert regex_search_pattern(search_text) == expected
+
+
+@pytest.mark.parametrize(
+    "pattern, text, expected",
+    [
+        ("食べる", "ご飯を食べる", ["食べる"]),
+        ("食べ(る|た)", "食べた", ["食べ"]),
+        ("a|b", "b", []),
+        ("abc?d", "abd", ["ab", "d"]),
+        ("x{2,3}yz", "xxyz", ["yz"]),
+        ("[abc]def", "adef", ["def"]),
+        (r"\bword\b", "a word", ["word"]),
+        (r"\d+円", "100円", ["円"]),
+        (r"\.txt", "a.txt", [".txt"]),
+        (r"\猫が", "猫が", ["猫が"]),
+        (r"ab\tcd", "ab\tcd", ["ab", "cd"]),
+        # The digits of a character code aren't literal text.
+        (r"\x41bc", "Abc", ["bc"]),
+        (r"\u98dfべる", "食べる", ["べる"]),
+        (r"食べ\U0001F600る", "食べ😀る", ["食べ", "る"]),
+        (r"\N{DIGIT ONE}23", "123", ["23"]),
+        (r"a\0123b", "a\n3b", ["a", "3b"]),
+        (r"(a)\1xyz", "aaxyz", ["xyz"]),
+        (r"(a)\12xyz", None, ["xyz"]),
+    ],
+)
+def test_required_literals(pattern: str, text, expected: list[str]) -> None:
+    literals = required_literals(pattern)
+    assert literals == expected
+    if text is not None:
+        # Every text that matches the pattern must contain the literals.
+        assert re.search(pattern, text)
+        assert all(literal in text for literal in literals)
+
+
+def test_to_match_expr() -> None:
+    assert to_match_expr(["猫が", 'say "hi"']) == '{flds} : ("猫が" "say ""hi""")'
+    assert to_match_expr(["猫が"], column=None) == '"猫が"'